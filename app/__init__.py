@@ -93,6 +93,10 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     logger.debug('Main blueprint registered')
 
+    from app.cli import register_cli
+    register_cli(app)
+    logger.debug('CLI commands registered')
+
     logger.info('Application instance created successfully')
     return app
 
@@ -0,0 +1,137 @@
+import io
+import sys
+import asyncio
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from app.services.http_client import aclose_async_http_client
+
+__all__ = ['ChatStreamASGI', 'build_environ', 'create_asgi_app']
+
+logger = logging.getLogger('counsel_windsurf.asgi')
+
+# Endpoints served natively as coroutines; everything else goes through Flask
+ASYNC_ENDPOINTS = {'main.chat_stream'}
+
+def build_environ(scope, body: bytes) -> dict:
+    """Build a WSGI environ for an ASGI HTTP request whose body has been read."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+class ChatStreamASGI:
+    """
+    ASGI application serving the chat streaming endpoints as coroutines.
+
+    The LLM call is the only slow part of a chat request, so the streaming
+    endpoints validate the request inside a short Flask request context (on a
+    worker thread, since it touches the database) and then await the reply
+    with the async chat service. An open conversation therefore costs a
+    coroutine rather than a blocked thread. All other requests, and the
+    streaming endpoints' error responses, go through the regular Flask app.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    def _match(self, scope):
+        """Return (endpoint, view args) for an ASGI request, or (None, None)."""
+        adapter = self.flask_app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            return adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http':
+            endpoint, view_args = self._match(scope)
+            if endpoint in ASYNC_ENDPOINTS:
+                await self._chat_stream(scope, receive, send, view_args)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await aclose_async_http_client()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return bytes(body)
+
+    def _begin(self, environ, kind):
+        """Run the synchronous request validation inside a Flask request context."""
+        from app.main.routes import begin_chat_stream
+        with self.flask_app.request_context(environ):
+            state = begin_chat_stream(kind)
+            if isinstance(state, dict):
+                return state, None
+            response = self.flask_app.make_response(state)
+            return None, (response.status_code, response.headers.to_wsgi_list(), response.get_data())
+
+    async def _chat_stream(self, scope, receive, send, view_args):
+        from app.main.routes import SSE_HEADERS, finish_chat_stream, sse_event
+        body = await self._read_body(receive)
+        environ = build_environ(scope, body)
+        state, error = await asyncio.to_thread(self._begin, environ, view_args['kind'])
+
+        if error is not None:
+            status, headers, content = error
+            await send({'type': 'http.response.start', 'status': status,
+                        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]})
+            await send({'type': 'http.response.body', 'body': content})
+            return
+
+        headers = [(b'content-type', b'text/event-stream; charset=utf-8')]
+        headers.extend((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in SSE_HEADERS.items())
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        async for event, data in state['service'].achat_stream(state['user_message'], state['history']):
+            chunk = sse_event('token', {'text': data}) if event == 'token' else finish_chat_stream(state, data)
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+def create_asgi_app(flask_app):
+    """Wrap the Flask application for an ASGI server."""
+    logger.info("🚀 Serving chat streams as coroutines over ASGI")
+    return ChatStreamASGI(flask_app)
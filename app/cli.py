@@ -0,0 +1,99 @@
+import click
+import logging
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.services.ann_index import create_cross_user_index
+from app.services.backfill import EmbeddingBackfill
+from app.services.vector_index import KINDS
+from app.utils.paths import instance_path
+from app.utils.vectors import STORAGE_DTYPES, decode_embedding, dequantize
+
+logger = logging.getLogger('counsel_windsurf.cli')
+
+embeddings_cli = AppGroup('embeddings', help='Manage stored embeddings and similarity indexes.')
+
+@embeddings_cli.command('build-index')
+@click.option('--kind', type=click.Choice(['direction', 'reference', 'all']), default='all',
+              help='Which items to index.')
+@click.option('--nlist', type=int, default=None, help='Number of inverted lists (default: sqrt(n)).')
+def build_index(kind, nlist):
+    """Rebuild the cross-user ANN index from the stored embeddings."""
+    cross_user_index = create_cross_user_index()
+    kinds = ['direction', 'reference'] if kind == 'all' else [kind]
+    for name in kinds:
+        count = cross_user_index.build(name, nlist=nlist)
+        click.echo(f"Indexed {count} {name} embeddings")
+
+@embeddings_cli.command('compact-index')
+def compact_index():
+    """Fold pending delta segments into the main ANN index files."""
+    cross_user_index = create_cross_user_index()
+    for name in ('direction', 'reference'):
+        index = cross_user_index.index(name)
+        pending = index.delta_size()
+        index.compact()
+        click.echo(f"Compacted {pending} pending {name} updates")
+
+@embeddings_cli.command('backfill')
+@click.option('--kind', type=click.Choice(['direction', 'reference', 'all']), default='all',
+              help='Which items to embed.')
+@click.option('--chunk-size', type=int, default=256, show_default=True,
+              help='Rows fetched and committed per chunk.')
+@click.option('--batch-size', type=int, default=32, show_default=True,
+              help='Texts sent per embedding request.')
+@click.option('--parallelism', type=int, default=4, show_default=True,
+              help='Maximum concurrent embedding requests.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='Progress file used to resume an interrupted run.')
+@click.option('--restart', is_flag=True, help='Ignore any saved checkpoint and start from the beginning.')
+def backfill(kind, chunk_size, batch_size, parallelism, checkpoint, restart):
+    """Embed every direction and reference that has no embedding yet."""
+    from app.services.embedding_service import create_embedding_service
+    kinds = ['direction', 'reference'] if kind == 'all' else [kind]
+    runner = EmbeddingBackfill(
+        create_embedding_service(),
+        checkpoint_path=checkpoint or instance_path('backfill_checkpoint.json'),
+        chunk_size=chunk_size,
+        batch_size=batch_size,
+        parallelism=parallelism,
+        report=click.echo
+    )
+    totals = runner.run(kinds, restart=restart)
+    if any(total['embedded'] for total in totals.values()):
+        click.echo("Run 'flask embeddings build-index' to include the new vectors in the cross-user index")
+
+@embeddings_cli.command('convert')
+@click.option('--storage', type=click.Choice(list(STORAGE_DTYPES)), default=None,
+              help='Target format (default: EMBEDDING_STORAGE).')
+@click.option('--batch-size', type=int, default=500, show_default=True,
+              help='Rows rewritten per commit.')
+def convert(storage, batch_size):
+    """Re-encode stored embeddings in another storage format (float16 and int8 are lossy)."""
+    storage = storage or current_app.config['EMBEDDING_STORAGE']
+    for kind, model in KINDS.items():
+        converted, last_id = 0, 0
+        while True:
+            rows = db.session.query(
+                model.id, model.embedding, model.embedding_dtype, model.embedding_scale, model.embedding_model
+            ).filter(
+                model.id > last_id,
+                model.embedding.isnot(None)
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            mappings = []
+            for item_id, blob, dtype, scale, model_id in rows:
+                if (dtype or 'float32') == storage:
+                    continue
+                vector = dequantize(decode_embedding(blob, dtype), scale)
+                mappings.append(dict(model.embedding_values(vector, model=model_id, storage=storage), id=item_id))
+            db.session.bulk_update_mappings(model, mappings)
+            db.session.commit()
+            converted += len(mappings)
+            last_id = rows[-1][0]
+        click.echo(f"Converted {converted} {kind} embeddings to {storage}")
+
+def register_cli(app):
+    """Attach the application's CLI command groups."""
+    app.cli.add_command(embeddings_cli)
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SubmitField
+from wtforms import StringField, TextAreaField, SubmitField, HiddenField
 from wtforms.validators import DataRequired, Length
 
 class DirectionForm(FlaskForm):
@@ -16,6 +16,9 @@ class ChatMessageForm(FlaskForm):
     message = TextAreaField('How do you want to grow?', validators=[DataRequired()])
     submit = SubmitField('Send')
 
+class ChatStreamCommitForm(FlaskForm):
+    token = HiddenField('Token', validators=[DataRequired()])
+
 class PasswordChangeForm(FlaskForm):
     current_password = StringField('Current Password', validators=[DataRequired()])
     new_password = StringField('New Password', validators=[DataRequired(), Length(min=6)])
@@ -1,13 +1,22 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify, session
+from flask import render_template, flash, redirect, url_for, request, jsonify, session, abort, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.urls import url_parse
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from app import db
 from app.main import bp
-from app.models import Direction, Reference
-from app.main.forms import DirectionForm, ChatMessageForm, PasswordChangeForm
+from app.models import User, Direction, Reference
+from app.main.forms import DirectionForm, ChatMessageForm, ChatStreamCommitForm, PasswordChangeForm
 from app.services.chat_service import create_chat_service
 from app.services.embedding_service import create_embedding_service
 from app.services.profile_service import create_profile_service
+from app.services.vector_index import create_vector_index, KINDS
+from app.services.ann_index import create_cross_user_index
+from app.services.embedding_worker import EmbeddingWorker
+from app.services.profile_worker import ProfileWorker
+from app.services.health_monitor import HealthMonitor
+from app.services.resilience import policy_states
+from app.services.conversation_store import ConversationStore, ConversationChanged
+from app.services.dashboard import direction_page, reference_page
 import logging
 import json
 
@@ -16,13 +25,80 @@ growth_chat_service = create_chat_service("growth")  # Initialize the growth dir
 reference_chat_service = create_chat_service("idols")  # Initialize the reference chat service
 embedding_service = create_embedding_service()  # Initialize the embedding service
 profile_service = create_profile_service()
+vector_index = create_vector_index()  # Per-user in-memory similarity index
+cross_user_index = create_cross_user_index()  # Shared on-disk ANN index across users
+conversation_store = ConversationStore()  # Chats in progress; the session only keeps their ids
+
+# Session key holding the id of the open conversation of each chat flow
+CONVERSATION_KEYS = {'direction': 'direction_conversation_id', 'reference': 'reference_conversation_id'}
+# Transcripts older sessions kept in the cookie
+LEGACY_SESSION_KEYS = ('conversation_history', 'pending_direction',
+                       'reference_conversation_history', 'pending_reference')
+
+def current_conversation(kind):
+    """Return the current user's open conversation of a chat flow, or None."""
+    for key in LEGACY_SESSION_KEYS:
+        if key in session:
+            session.pop(key)
+    return conversation_store.get(session.get(CONVERSATION_KEYS[kind]), current_user.id, kind)
+
+def save_exchange(kind, conversation, user_message, result, expected_turns=None):
+    """
+    Append a chat result to the user's conversation, commit, and keep its id in the session.
+    
+    Raises:
+        ConversationChanged: If the conversation moved on since expected_turns
+    """
+    response, is_complete, full_response, short_summary = result
+    conversation = conversation_store.append(conversation, current_user.id, kind, user_message, response,
+                                             expected_turns=expected_turns)
+    if is_complete:
+        conversation_store.complete(conversation, response, short_summary, full_response)
+    db.session.commit()
+    session[CONVERSATION_KEYS[kind]] = conversation.id
+    return conversation
+
+def close_conversation(kind, conversation):
+    """Delete a conversation in the current transaction and forget it in the session; False if already gone."""
+    session.pop(CONVERSATION_KEYS[kind], None)
+    return conversation_store.delete(conversation)
+
+def index_embedding(kind, item, embedding):
+    """Add a freshly embedded item to the similarity indexes."""
+    if not getattr(item, 'is_latest', True):
+        return
+    vector_index.add(item.user_id, kind, item.id, embedding)
+    cross_user_index.add(kind, item.id, embedding)
+
+embedding_worker = EmbeddingWorker(embedding_service, on_embedded=index_embedding)  # Embeds items off the request path
+profile_worker = ProfileWorker(profile_service)  # Regenerates profiles off the request path, once per burst of changes
+
+def schedule_profile_refresh(debounce=True):
+    """Queue a profile regeneration if the current user's content has moved past their profile."""
+    if not current_user.profile_is_stale:
+        return
+    try:
+        profile_worker.schedule(current_user.id, debounce=debounce)
+    except Exception as e:
+        logger.warning(f"Could not schedule profile refresh: {str(e)}")
+        db.session.rollback()
+
+# Probes external services in the background so /health answers from memory
+health_monitor = HealthMonitor({
+    'groq_growth': lambda: growth_chat_service.health_check(timeout=health_monitor.probe_timeout),
+    'groq_reference': lambda: reference_chat_service.health_check(timeout=health_monitor.probe_timeout),
+    'huggingface': embedding_service.health_check,
+})
 
 @bp.route('/')
 @bp.route('/index')
 @login_required
 def index():
-    directions = Direction.query.filter_by(author=current_user, is_latest=True).order_by(Direction.timestamp.desc()).all()
-    return render_template('index.html', title='Home', directions=directions)
+    # Each list pages on its own cursor (?directions=, ?references=), newest first
+    page_size = current_app.config['DASHBOARD_PAGE_SIZE']
+    directions = direction_page(current_user.id, request.args.get('directions'), page_size)
+    references = reference_page(current_user.id, request.args.get('references'), page_size)
+    return render_template('index.html', title='Home', directions=directions, references=references)
 
 @bp.route('/create_direction', methods=['GET', 'POST'])
 @login_required
@@ -30,35 +106,25 @@ def create_direction():
     logger.debug("Accessing create direction page")
     form = ChatMessageForm()
     
-    # Get conversation history
-    conversation_history = session.get('conversation_history', '[]')
-    # If it's already a list, convert it to string
-    if isinstance(conversation_history, list):
-        conversation_history = json.dumps(conversation_history)
+    # Get the conversation in progress
+    conversation = current_conversation('direction')
+    messages = conversation_store.history(conversation)
     
     if form.validate_on_submit():
         try:
             user_message = form.message.data
-            # Parse the conversation history
-            messages = json.loads(conversation_history)
+            expected_turns = len(messages)
             
-            # Add user message to history
-            messages.append({"role": "user", "content": user_message})
+            # Get AI response; the service adds the new message after the history
+            result = growth_chat_service.chat(user_message, messages)
+            response, is_complete, full_response, short_summary = result
             
-            # Get AI response
-            response, is_complete, full_response, short_summary = growth_chat_service.chat(user_message, messages)
-            
-            # Add AI response to history
+            # Add the exchange to the stored conversation, along with the direction to confirm if complete
+            save_exchange('direction', conversation, user_message, result, expected_turns)
+            messages.append({"role": "user", "content": user_message})
             messages.append({"role": "assistant", "content": response})
-            session['conversation_history'] = json.dumps(messages)
             
             if is_complete:
-                # Store the direction data in session for confirmation
-                session['pending_direction'] = {
-                    'summary': response,
-                    'raw_response': full_response,
-                    'short_summary': short_summary
-                }
                 return render_template('chat_direction.html',
                                     title='New Growth Direction',
                                     form=form,
@@ -71,29 +137,26 @@ def create_direction():
             # Continue conversation
             return redirect(url_for('main.create_direction'))
             
+        except ConversationChanged:
+            db.session.rollback()
+            flash('This conversation was continued elsewhere. Please review it and try again.', 'error')
+            return redirect(url_for('main.create_direction'))
         except Exception as e:
             logger.error(f"Error processing chat message: {str(e)}", exc_info=True)
+            db.session.rollback()
             flash('Error processing chat message. Please try again.', 'error')
             return redirect(url_for('main.create_direction'))
     
-    # Load conversation history for template
-    try:
-        messages = json.loads(conversation_history)
-        # Check if there's a pending direction to confirm
-        pending = session.get('pending_direction')
-        if pending:
-            return render_template('chat_direction.html',
-                                title='New Growth Direction',
-                                form=form,
-                                conversation_history=messages,
-                                is_complete=True,
-                                direction_summary=pending['summary'],
-                                raw_response=pending['raw_response'],
-                                short_summary=pending['short_summary'])
-    except (json.JSONDecodeError, TypeError):
-        logger.error("Invalid conversation history in session, resetting")
-        messages = []
-        session['conversation_history'] = '[]'
+    # Check if there's a pending direction to confirm
+    if conversation is not None and conversation.is_complete:
+        return render_template('chat_direction.html',
+                            title='New Growth Direction',
+                            form=form,
+                            conversation_history=messages,
+                            is_complete=True,
+                            direction_summary=conversation.pending_summary,
+                            raw_response=conversation.pending_raw_response,
+                            short_summary=conversation.pending_title)
     
     return render_template('chat_direction.html', 
                          title='New Growth Direction',
@@ -103,43 +166,34 @@ def create_direction():
 @bp.route('/confirm_direction', methods=['POST'])
 @login_required
 def confirm_direction():
-    if 'pending_direction' not in session:
+    conversation = current_conversation('direction')
+    if conversation is None or not conversation.is_complete:
         flash('No pending direction to confirm.')
         return redirect(url_for('main.create_direction'))
     
     try:
-        pending = session['pending_direction']
         direction = Direction(
-            title=pending.get('short_summary', 'Growth Direction'),
-            description=pending['summary'],
-            raw_response=pending['raw_response'],
+            title=conversation.pending_title or 'Growth Direction',
+            description=conversation.pending_summary,
+            raw_response=conversation.pending_raw_response,
             author=current_user
         )
         
-        # Generate and store embedding
-        logger.info(f"Generating embedding for direction: {direction.title}")
-        embedding = embedding_service.create_embedding(direction.description)
-        if embedding is not None:
-            direction.set_embedding(embedding)
-            logger.info("Successfully generated and stored embedding for direction")
-        else:
-            logger.warning("Failed to generate embedding for direction")
-            
         logger.info(f"Creating confirmed direction with title: {direction.title}")
         db.session.add(direction)
+        db.session.flush()
+        # The embedding is generated in the background; the job is saved with the direction
+        embedding_worker.enqueue('direction', direction.id)
+        # The conversation is deleted in the same transaction, so a repeated confirmation saves nothing
+        if not close_conversation('direction', conversation):
+            db.session.rollback()
+            flash('No pending direction to confirm.')
+            return redirect(url_for('main.index'))
         db.session.commit()
+        embedding_worker.wake()
         logger.info(f"Direction saved to database with id: {direction.id}")
-            
-        # Clear conversation history and pending direction
-        session.pop('conversation_history', None)
-        session.pop('pending_direction', None)
         
-        # Check if we need to update the user's profile
-        if profile_service.should_update_profile(current_user):
-            try:
-                profile_service.generate_profile(current_user)
-            except Exception as e:
-                logger.warning(f"Could not generate profile: {str(e)}")
+        schedule_profile_refresh()
         
         flash('Your growth direction has been recorded!')
         return redirect(url_for('main.index'))
@@ -170,6 +224,9 @@ def delete_direction(id):
     try:
         db.session.delete(direction)
         db.session.commit()
+        schedule_profile_refresh()
+        vector_index.remove(current_user.id, 'direction', id)
+        cross_user_index.remove('direction', id)
         flash('Direction deleted successfully.', 'success')
     except Exception as e:
         logger.error(f"Error deleting direction: {str(e)}", exc_info=True)
@@ -203,7 +260,15 @@ def edit_direction(id):
             direction.is_latest = False
             
             db.session.add(new_direction)
+            db.session.flush()
+            # Embed the edited description in the background so the new version stays searchable
+            embedding_worker.enqueue('direction', new_direction.id)
             db.session.commit()
+            embedding_worker.wake()
+            schedule_profile_refresh()
+            
+            vector_index.remove(current_user.id, 'direction', direction.id)
+            cross_user_index.remove('direction', direction.id)
             
             flash('Your changes have been saved.')
             return redirect(url_for('main.direction', id=new_direction.id))
@@ -226,7 +291,8 @@ def edit_direction(id):
 @login_required
 def reset_conversation():
     logger.info("Resetting conversation history")
-    session.pop('conversation_history', None)
+    close_conversation('direction', current_conversation('direction'))
+    db.session.commit()
     flash('Conversation has been reset. You can start a new direction.')
     return redirect(url_for('main.create_direction'))
 
@@ -236,35 +302,25 @@ def create_reference():
     logger.debug("Accessing create reference page")
     form = ChatMessageForm()
     
-    # Get conversation history
-    conversation_history = session.get('reference_conversation_history', '[]')
-    # If it's already a list, convert it to string
-    if isinstance(conversation_history, list):
-        conversation_history = json.dumps(conversation_history)
+    # Get the conversation in progress
+    conversation = current_conversation('reference')
+    messages = conversation_store.history(conversation)
     
     if form.validate_on_submit():
         try:
             user_message = form.message.data
-            # Parse the conversation history
-            messages = json.loads(conversation_history)
-            
-            # Add user message to history
-            messages.append({"role": "user", "content": user_message})
+            expected_turns = len(messages)
             
-            # Get AI response using the reference chat service
-            response, is_complete, full_response, short_summary = reference_chat_service.chat(user_message, messages)
+            # Get AI response using the reference chat service; the service adds the new message after the history
+            result = reference_chat_service.chat(user_message, messages)
+            response, is_complete, full_response, short_summary = result
             
-            # Add AI response to history
+            # Add the exchange to the stored conversation, along with the reference to confirm if complete
+            save_exchange('reference', conversation, user_message, result, expected_turns)
+            messages.append({"role": "user", "content": user_message})
             messages.append({"role": "assistant", "content": response})
-            session['reference_conversation_history'] = json.dumps(messages)
             
             if is_complete:
-                # Store the reference data in session for confirmation
-                session['pending_reference'] = {
-                    'summary': response,
-                    'raw_response': full_response,
-                    'short_summary': short_summary
-                }
                 return render_template('chat_reference.html',
                                     title='New Reference',
                                     form=form,
@@ -277,29 +333,26 @@ def create_reference():
             # Continue conversation
             return redirect(url_for('main.create_reference'))
             
+        except ConversationChanged:
+            db.session.rollback()
+            flash('This conversation was continued elsewhere. Please review it and try again.', 'error')
+            return redirect(url_for('main.create_reference'))
         except Exception as e:
             logger.error(f"Error processing chat message: {str(e)}", exc_info=True)
+            db.session.rollback()
             flash('Error processing chat message. Please try again.', 'error')
             return redirect(url_for('main.create_reference'))
     
-    # Load conversation history for template
-    try:
-        messages = json.loads(conversation_history)
-        # Check if there's a pending reference to confirm
-        pending = session.get('pending_reference')
-        if pending:
-            return render_template('chat_reference.html',
-                                title='New Reference',
-                                form=form,
-                                conversation_history=messages,
-                                is_complete=True,
-                                reference_summary=pending['summary'],
-                                raw_response=pending['raw_response'],
-                                short_summary=pending['short_summary'])
-    except (json.JSONDecodeError, TypeError):
-        logger.error("Invalid conversation history in session, resetting")
-        messages = []
-        session['reference_conversation_history'] = '[]'
+    # Check if there's a pending reference to confirm
+    if conversation is not None and conversation.is_complete:
+        return render_template('chat_reference.html',
+                            title='New Reference',
+                            form=form,
+                            conversation_history=messages,
+                            is_complete=True,
+                            reference_summary=conversation.pending_summary,
+                            raw_response=conversation.pending_raw_response,
+                            short_summary=conversation.pending_title)
     
     return render_template('chat_reference.html', 
                          title='New Reference',
@@ -309,51 +362,154 @@ def create_reference():
 @bp.route('/reset_reference_conversation', methods=['POST'])
 @login_required
 def reset_reference_conversation():
-    session['reference_conversation_history'] = '[]'
-    if 'pending_reference' in session:
-        del session['pending_reference']
+    close_conversation('reference', current_conversation('reference'))
+    db.session.commit()
     return redirect(url_for('main.create_reference'))
 
+# Services and pages of the two chat flows, shared by the streaming endpoints
+CHAT_FLOWS = {
+    'direction': {
+        'service': growth_chat_service,
+        'page': 'main.create_direction',
+    },
+    'reference': {
+        'service': reference_chat_service,
+        'page': 'main.create_reference',
+    },
+}
+CHAT_STREAM_MAX_AGE = 600  # Seconds a finished stream's result stays valid
+
+def _chat_stream_serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='chat-stream')
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def begin_chat_stream(kind):
+    """
+    Validate a chat message posted for streaming.
+    
+    Returns the stream state (service, message, history and what is needed to
+    sign the result), or a Flask response to send instead. Shared by the WSGI
+    route below and the ASGI handler in app.asgi.
+    """
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    flow = CHAT_FLOWS[kind]
+    form = ChatMessageForm()
+    if not form.validate_on_submit():
+        return jsonify({'error': 'Invalid message'}), 400
+    
+    conversation = current_conversation(kind)
+    history = conversation_store.history(conversation)
+    return {
+        'kind': kind,
+        'service': flow['service'],
+        'user_message': form.message.data,
+        'history': history,
+        'conversation_id': conversation.id if conversation is not None else None,
+        'turns': len(history),
+        'user_id': current_user.id,
+        'serializer': _chat_stream_serializer(),
+    }
+
+def finish_chat_stream(state, result) -> str:
+    """Return the final 'done' event carrying the signed exchange to store for a stream's result."""
+    response, is_complete = result[0], result[1]
+    token = state['serializer'].dumps({
+        'kind': state['kind'],
+        'user_id': state['user_id'],
+        'conversation_id': state['conversation_id'],
+        'turns': state['turns'],
+        'user_message': state['user_message'],
+        'result': list(result)
+    })
+    return sse_event('done', {'message': response, 'is_complete': is_complete, 'token': token})
+
+@bp.route('/create_<any(direction, reference):kind>/stream', methods=['POST'])
+@login_required
+def chat_stream(kind):
+    """
+    Stream the assistant's reply to a chat message as server-sent events.
+    
+    The stream only reads the conversation. The final 'done' event carries
+    the new exchange as a signed token that the page posts back to
+    chat_stream_commit, which stores it (the ASGI handler has no database
+    session or cookie of its own once streaming).
+    """
+    state = begin_chat_stream(kind)
+    if not isinstance(state, dict):
+        return state
+    
+    def generate():
+        for event, data in state['service'].chat_stream(state['user_message'], state['history']):
+            if event == 'token':
+                yield sse_event('token', {'text': data})
+            else:
+                yield finish_chat_stream(state, data)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@bp.route('/create_<any(direction, reference):kind>/commit', methods=['POST'])
+@login_required
+def chat_stream_commit(kind):
+    """Store the exchange of a finished chat stream."""
+    flow = CHAT_FLOWS[kind]
+    form = ChatStreamCommitForm()
+    if not form.validate_on_submit():
+        return jsonify({'error': 'Invalid or expired stream token'}), 400
+    try:
+        state = _chat_stream_serializer().loads(form.token.data, max_age=CHAT_STREAM_MAX_AGE)
+    except BadSignature:
+        return jsonify({'error': 'Invalid or expired stream token'}), 400
+    if state['kind'] != kind or state['user_id'] != current_user.id:
+        return jsonify({'error': 'Invalid or expired stream token'}), 400
+    
+    # Ignore a stream that started before the conversation was reset or continued elsewhere
+    conversation = current_conversation(kind)
+    current_id = conversation.id if conversation is not None else None
+    try:
+        if current_id != state['conversation_id']:
+            raise ConversationChanged()
+        save_exchange(kind, conversation, state['user_message'], state['result'], expected_turns=state['turns'])
+    except ConversationChanged:
+        db.session.rollback()
+        return jsonify({'error': 'Conversation has changed', 'redirect': url_for(flow['page'])}), 409
+    return jsonify({'redirect': url_for(flow['page']), 'is_complete': bool(state['result'][1])})
+
 @bp.route('/confirm_reference', methods=['POST'])
 @login_required
 def confirm_reference():
-    if 'pending_reference' not in session:
+    conversation = current_conversation('reference')
+    if conversation is None or not conversation.is_complete:
         flash('No pending reference to confirm.')
         return redirect(url_for('main.create_reference'))
         
     try:
-        pending = session['pending_reference']
         reference = Reference(
-            title=pending.get('short_summary', 'Reference'),
-            description=pending['summary'],
-            raw_response=pending['raw_response'],
+            title=conversation.pending_title or 'Reference',
+            description=conversation.pending_summary,
+            raw_response=conversation.pending_raw_response,
             author=current_user
         )
         
-        # Generate and store embedding
-        logger.info(f"Generating embedding for reference: {reference.title}")
-        embedding = embedding_service.create_embedding(reference.description)
-        if embedding is not None:
-            reference.set_embedding(embedding)
-            logger.info("Successfully generated and stored embedding for reference")
-        else:
-            logger.warning("Failed to generate embedding for reference")
-        
         logger.info(f"Creating confirmed reference with title: {reference.title}")
         db.session.add(reference)
+        db.session.flush()
+        # The embedding is generated in the background; the job is saved with the reference
+        embedding_worker.enqueue('reference', reference.id)
+        # The conversation is deleted in the same transaction, so a repeated confirmation saves nothing
+        if not close_conversation('reference', conversation):
+            db.session.rollback()
+            flash('No pending reference to confirm.')
+            return redirect(url_for('main.index'))
         db.session.commit()
+        embedding_worker.wake()
         logger.info(f"Reference saved to database with id: {reference.id}")
         
-        # Clear the session data
-        del session['pending_reference']
-        session['reference_conversation_history'] = '[]'
-        
-        # Check if we need to update the user's profile
-        if profile_service.should_update_profile(current_user):
-            try:
-                profile_service.generate_profile(current_user)
-            except Exception as e:
-                logger.warning(f"Could not generate profile: {str(e)}")
+        schedule_profile_refresh()
         
         flash('Your reference has been saved!', 'success')
         return redirect(url_for('main.index'))
@@ -381,6 +537,9 @@ def delete_reference(id):
     try:
         db.session.delete(reference)
         db.session.commit()
+        schedule_profile_refresh()
+        vector_index.remove(current_user.id, 'reference', id)
+        cross_user_index.remove('reference', id)
         flash('Reference deleted.', 'success')
     except Exception as e:
         logger.error(f"Error deleting reference: {str(e)}", exc_info=True)
@@ -388,30 +547,90 @@ def delete_reference(id):
         
     return redirect(url_for('main.index'))
 
+@bp.route('/similar/<kind>/<int:id>')
+@login_required
+def similar(kind, id):
+    """Return the current user's directions and references most similar to an item."""
+    model = KINDS.get(kind)
+    if model is None:
+        abort(404)
+    item = model.query.get_or_404(id)
+    if item.author != current_user:
+        return jsonify({'error': 'You do not have permission to view this item.'}), 403
+    
+    k = max(1, min(request.args.get('k', 5, type=int), 50))
+    matches = vector_index.similar(current_user.id, kind, id, k=k)
+    
+    # Fetch titles for all matches with one query per kind
+    titles = {}
+    for match_kind in {match[0] for match in matches}:
+        match_model = KINDS[match_kind]
+        ids = [match_id for kind_name, match_id, _ in matches if kind_name == match_kind]
+        for match_id, title in db.session.query(match_model.id, match_model.title).filter(match_model.id.in_(ids)):
+            titles[(match_kind, match_id)] = title
+    
+    results = [
+        {
+            'kind': match_kind,
+            'id': match_id,
+            'title': titles.get((match_kind, match_id)),
+            'score': round(score, 4),
+            'url': url_for(f'main.{match_kind}', id=match_id)
+        }
+        for match_kind, match_id, score in matches
+        if (match_kind, match_id) in titles
+    ]
+    return jsonify({'kind': kind, 'id': id, 'similar': results})
+
+@bp.route('/discover/<int:id>')
+@login_required
+def discover(id):
+    """Return other users' growth directions closest to one of the current user's directions."""
+    direction = Direction.query.get_or_404(id)
+    if direction.author != current_user:
+        return jsonify({'error': 'You do not have permission to view this direction.'}), 403
+    
+    k = max(1, min(request.args.get('k', 10, type=int), 50))
+    # Over-fetch so the current user's own directions can be filtered out
+    matches = cross_user_index.search('direction', direction.get_embedding(), k=k * 3)
+    scores = dict(matches)
+    
+    rows = db.session.query(Direction.id, Direction.title, User.username).join(User).filter(
+        Direction.id.in_(list(scores)),
+        Direction.user_id != current_user.id,
+        Direction.is_latest.is_(True)
+    ).all()
+    results = sorted(
+        ({'id': row_id, 'title': title, 'username': username, 'score': round(scores[row_id], 4)}
+         for row_id, title, username in rows),
+        key=lambda result: result['score'],
+        reverse=True
+    )[:k]
+    return jsonify({'id': id, 'others': results})
+
 @bp.route('/health')
 def health_check():
-    """Check the health of all external services."""
-    status = {
-        'groq_growth': {'healthy': False, 'message': ''},
-        'groq_reference': {'healthy': False, 'message': ''},
-        'huggingface': {'healthy': False, 'message': ''},
-        'overall': False
-    }
+    """
+    Report the health of all external services.
+    
+    Results come from the background prober, so polling this endpoint does not
+    call Groq or HuggingFace. Add ?format=json for a machine-readable answer
+    (status 503 when a service is down).
+    """
+    results, age = health_monitor.snapshot()
+    unknown = {'healthy': False, 'message': 'Not checked yet', 'latency_ms': None}
+    status = {name: results.get(name, unknown) for name in health_monitor.probes}
+    status['checked_seconds_ago'] = round(age) if age is not None else None
     
-    # Check Groq API (Growth Direction Service)
-    logger.info("🔍 Checking Growth Direction Service...")
-    growth_healthy, growth_msg = growth_chat_service.health_check()
-    status['groq_growth'] = {'healthy': growth_healthy, 'message': growth_msg}
+    # Embedding cache effectiveness
+    status['embedding_cache'] = embedding_service.cache.stats()
     
-    # Check Groq API (Reference Service)
-    logger.info("🔍 Checking Reference Service...")
-    reference_healthy, reference_msg = reference_chat_service.health_check()
-    status['groq_reference'] = {'healthy': reference_healthy, 'message': reference_msg}
+    # LLM response cache effectiveness (None when LLM_CACHE_ENABLED is false)
+    llm_cache = growth_chat_service.cache
+    status['llm_cache'] = llm_cache.stats() if llm_cache is not None else None
     
-    # Check HuggingFace API
-    logger.info("🔍 Checking HuggingFace Service...")
-    hf_healthy, hf_msg = embedding_service.health_check()
-    status['huggingface'] = {'healthy': hf_healthy, 'message': hf_msg}
+    # Circuit breaker state of each upstream (open means calls currently fail fast)
+    status['circuits'] = policy_states()
     
     # Overall health is good only if all services are healthy
     status['overall'] = all([
@@ -420,17 +639,8 @@ def health_check():
         status['huggingface']['healthy']
     ])
     
-    # Log overall health status with emoji
-    if status['overall']:
-        logger.info("🌟 All services are healthy and running!")
-    else:
-        logger.error("❌ Some services are unhealthy!")
-        
-    # Log individual service status
-    logger.info(f"🤖 Growth Direction Service: {'✅' if status['groq_growth']['healthy'] else '❌'}")
-    logger.info(f"📚 Reference Service: {'✅' if status['groq_reference']['healthy'] else '❌'}")
-    logger.info(f"🧠 HuggingFace Service: {'✅' if status['huggingface']['healthy'] else '❌'}")
-    
+    if request.args.get('format') == 'json':
+        return jsonify(status), 200 if status['overall'] else 503
     return render_template('health.html', status=status)
 
 @bp.route('/profile', methods=['GET', 'POST'])
@@ -451,23 +661,30 @@ def profile():
         else:
             flash('Current password is incorrect.')
     
-    # Get or generate profile if needed
-    if profile_service.should_update_profile(current_user):
-        profile = profile_service.generate_profile(current_user)
-    else:
-        profile = profile_service.get_latest_profile(current_user)
+    # Show the stored profile right away; a stale one is regenerated in the background
+    refreshing = profile_service.should_update_profile(current_user)
+    if refreshing:
+        schedule_profile_refresh(debounce=False)
+    profile = profile_service.get_latest_profile(current_user)
     
-    return render_template('profile.html', profile=profile, form=form)
+    return render_template('profile.html', profile=profile, form=form, refreshing=refreshing)
+
+@bp.route('/profile/status')
+@login_required
+def profile_status():
+    """Whether the current user's profile is still being regenerated, for the profile page to poll."""
+    return jsonify({'refreshing': current_user.profile_is_stale})
 
 # Perform health check on startup
 @bp.before_app_first_request
 def startup_health_check():
     """Run health check when the application starts."""
     logger.info("🚀 Starting Campfire application...")
-    logger.info("🏥 Running initial health check...")
     
-    try:
-        health_check()
-        logger.info("✨ Initial health check completed")
-    except Exception as e:
-        logger.error(f"💥 Error during startup health check: {str(e)}")
+    # Resume any embedding and profile jobs left over from a previous run
+    embedding_worker.start(current_app._get_current_object())
+    profile_worker.start(current_app._get_current_object())
+    
+    # Probe services in the background; the first request does not wait for them
+    logger.info("🏥 Starting background health checks...")
+    health_monitor.start(current_app._get_current_object())
@@ -1,9 +1,9 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
 from flask_login import UserMixin
 from app import db, login_manager
-import numpy as np
-import json
+from app.utils.vectors import decode_embedding, dequantize, embedding_dimension, normalize, quantize_embedding
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,6 +13,21 @@ class User(UserMixin, db.Model):
     directions = db.relationship('Direction', backref='author', lazy='dynamic')
     references = db.relationship('Reference', backref='author', lazy='dynamic')
     profiles = db.relationship('UserProfile', backref='author', lazy='dynamic', order_by='UserProfile.timestamp.desc()')
+    # Activity watermarks, maintained by track_content_changes below
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped by every content change
+    last_content_change_at = db.Column(db.DateTime)
+    profile_version = db.Column(db.Integer)  # content_version the latest profile reflects; NULL without a profile
+    last_profile_at = db.Column(db.DateTime)
+
+    @property
+    def profile_is_stale(self):
+        """Whether directions or references changed since the latest profile (or there is none)."""
+        return self.profile_version is None or self.profile_version != self.content_version
+
+    def record_profile(self, content_version, timestamp=None):
+        """Note that a profile reflecting content_version was just saved."""
+        self.profile_version = content_version
+        self.last_profile_at = timestamp or datetime.utcnow()
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -20,13 +35,48 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-class Direction(db.Model):
+class EmbeddingMixin:
+    """Binary embedding storage shared by directions and references."""
+    embedding = db.Column(db.LargeBinary)  # Little-endian vector in the embedding_dtype format
+    embedding_dim = db.Column(db.Integer)
+    embedding_model = db.Column(db.String(128))
+    embedding_dtype = db.Column(db.String(16))  # float32 (also when NULL), float16 or int8
+    embedding_scale = db.Column(db.Float)  # Per-vector scale of int8 codes
+
+    @staticmethod
+    def embedding_values(embedding_array, model=None, storage=None):
+        """
+        Return the column values storing an embedding, normalized to unit length once here.
+
+        The storage format defaults to the EMBEDDING_STORAGE setting.
+        """
+        storage = storage or current_app.config.get('EMBEDDING_STORAGE', 'float32')
+        blob, scale = quantize_embedding(normalize(embedding_array), storage)
+        return {
+            'embedding': blob,
+            'embedding_dim': embedding_dimension(blob, storage),
+            'embedding_model': model,
+            'embedding_dtype': storage,
+            'embedding_scale': scale,
+        }
+
+    def _store_embedding(self, embedding_array, model=None):
+        """Store a numpy array as a unit-length blob along with its metadata."""
+        for column, value in self.embedding_values(embedding_array, model=model).items():
+            setattr(self, column, value)
+
+    def get_embedding(self):
+        """Retrieve embedding as a unit-length float32 numpy array (read-only when stored as float32)."""
+        if self.embedding:
+            return dequantize(decode_embedding(self.embedding, self.embedding_dtype), self.embedding_scale)
+        return None
+
+class Direction(EmbeddingMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    embedding = db.Column(db.Text)  # Store embedding as JSON string
     raw_response = db.Column(db.Text)  # Store raw Groq response
     
     # Version control fields
@@ -39,45 +89,99 @@ class Direction(db.Model):
         foreign_keys=[original_id]
     )
 
-    def set_embedding(self, embedding_array, raw_response=None):
-        """Store numpy array as JSON string and raw response"""
+    # Serves the dashboard's newest-first pages of a user's latest versions
+    __table_args__ = (db.Index('ix_direction_user_latest_timestamp', 'user_id', 'is_latest', 'timestamp'),)
+
+    def set_embedding(self, embedding_array, raw_response=None, model=None):
+        """Store numpy array as an embedding blob and raw response"""
         if embedding_array is not None:
-            self.embedding = json.dumps(embedding_array.tolist())
+            self._store_embedding(embedding_array, model=model)
         if raw_response is not None:
             self.raw_response = raw_response
 
-    def get_embedding(self):
-        """Retrieve embedding as numpy array"""
-        if self.embedding:
-            return np.array(json.loads(self.embedding))
-        return None
-
     def get_raw_response(self):
         """Retrieve the raw response from Groq"""
         return self.raw_response
 
-class Reference(db.Model):
+class Reference(EmbeddingMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140))
     description = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     raw_response = db.Column(db.Text)
-    embedding = db.Column(db.Text)  # Store embedding as JSON string
+    
+    __table_args__ = (db.Index('ix_reference_user_timestamp', 'user_id', 'timestamp'),)
     
     def __repr__(self):
         return f'<Reference {self.title}>'
     
-    def set_embedding(self, embedding_array):
-        """Store numpy array as JSON string."""
+    def set_embedding(self, embedding_array, model=None):
+        """Store numpy array as an embedding blob."""
         if embedding_array is not None:
-            self.embedding = json.dumps(embedding_array.tolist())
+            self._store_embedding(embedding_array, model=model)
+
+class EmbeddingJob(db.Model):
+    """Pending embedding work for a direction or reference, retried until it succeeds."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'direction' or 'reference'
+    item_id = db.Column(db.Integer, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow)
+    claimed_until = db.Column(db.DateTime)  # Lease held by the worker processing the job
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
-    def get_embedding(self):
-        """Get embedding as numpy array."""
-        if self.embedding:
-            return np.array(json.loads(self.embedding))
-        return None
+    __table_args__ = (db.UniqueConstraint('kind', 'item_id', name='uq_embedding_job_item'),)
+    
+    def __repr__(self):
+        return f'<EmbeddingJob {self.kind} {self.item_id} attempts={self.attempts}>'
+
+class ProfileJob(db.Model):
+    """Pending profile regeneration for a user; at most one per user, debounced."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow)
+    requested_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # First request of the current burst
+    claimed_until = db.Column(db.DateTime)  # Lease held by the worker regenerating the profile
+    last_error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<ProfileJob user={self.user_id} attempts={self.attempts}>'
+
+class Conversation(db.Model):
+    """A chat in progress that will become a direction or reference once confirmed."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'direction' or 'reference'
+    turn_count = db.Column(db.Integer, nullable=False, default=0)  # Position of the next turn
+    # Set when the counselor completes the conversation, until the user confirms it
+    pending_summary = db.Column(db.Text)
+    pending_title = db.Column(db.String(140))
+    pending_raw_response = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    turns = db.relationship('ConversationTurn', backref='conversation', lazy='dynamic',
+                            order_by='ConversationTurn.position')
+
+    @property
+    def is_complete(self):
+        return self.pending_summary is not None
+
+    def __repr__(self):
+        return f'<Conversation {self.kind} {self.id} turns={self.turn_count}>'
+
+class ConversationTurn(db.Model):
+    """One message of a conversation; turns are only ever appended."""
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(16), nullable=False)  # 'user' or 'assistant'
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('conversation_id', 'position', name='uq_conversation_turn_position'),)
 
 class UserProfile(db.Model):
     """Stores AI-generated user profiles based on their directions and references."""
@@ -85,10 +189,76 @@ class UserProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     description = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    # 0 for a profile built from all content, n for the nth incremental update since; NULL for the placeholder
+    updates_since_rebuild = db.Column(db.Integer)
     
     def __repr__(self):
         return f'<UserProfile {self.author.username} - {self.timestamp}>'
 
+class ContentChange(db.Model):
+    """A direction or reference added, edited or deleted since the user's profile last took it in."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'direction' or 'reference'
+    action = db.Column(db.String(20), nullable=False)  # 'added', 'edited' or 'deleted'
+    # Snapshot of the item, so deletions can still be described
+    title = db.Column(db.String(140))
+    description = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ContentChange {self.action} {self.kind} user={self.user_id}>'
+
+# Columns of directions and references whose changes make a profile stale
+CONTENT_COLUMNS = ('title', 'description', 'is_latest')
+
+def _owner_id(item):
+    return item.user_id if item.user_id is not None else getattr(item.author, 'id', None)
+
+@db.event.listens_for(db.session, 'before_flush')
+def track_content_changes(session, flush_context, instances):
+    """
+    Bump the owner's content_version when a direction or reference is added, edited or deleted,
+    and log what changed as a ContentChange for incremental profile updates.
+
+    Runs in the flush, so the watermark and the log commit with the change
+    itself. Embedding updates and deleting superseded versions do not count.
+    The increment is a SQL expression, so concurrent changes from different
+    workers are never lost.
+    """
+    owners = set()
+    changes = []
+    for item in session.new:
+        if isinstance(item, (Direction, Reference)):
+            # Editing a direction saves it as a new version
+            changes.append((item, 'edited' if getattr(item, 'original_id', None) else 'added'))
+    for item in session.deleted:
+        if isinstance(item, (Direction, Reference)) and getattr(item, 'is_latest', True) is not False:
+            changes.append((item, 'deleted'))
+    for item in session.dirty:
+        if isinstance(item, (Direction, Reference)):
+            state = db.inspect(item)
+            changed = [column for column in CONTENT_COLUMNS
+                       if column in state.attrs and state.attrs[column].history.has_changes()]
+            if 'title' in changed or 'description' in changed:
+                changes.append((item, 'edited'))
+            elif changed:
+                # Superseded by a new version, which is logged as the edit
+                owners.add(item.user_id)
+    now = datetime.utcnow()
+    for item, action in changes:
+        owner = _owner_id(item)
+        if owner is not None:
+            owners.add(owner)
+            session.add(ContentChange(user_id=owner, kind=item.__tablename__, action=action,
+                                      title=item.title, description=item.description, timestamp=now))
+    owners.discard(None)
+    for user_id in owners:
+        user = session.get(User, user_id)
+        if user is not None:
+            user.content_version = User.content_version + 1
+            user.last_content_change_at = now
+
 @login_manager.user_loader
 def load_user(id):
     return User.query.get(int(id))
@@ -0,0 +1,443 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import numpy as np
+from app import db
+from app.services.vector_index import KINDS
+from app.utils.paths import instance_path
+from app.utils.vectors import decode_embedding, dequantize
+from app.services.similarity import normalize, score_query, top_k
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; fall back to in-process locking
+    fcntl = None
+
+__all__ = ['IVFIndex', 'CrossUserIndex', 'create_cross_user_index']
+
+logger = logging.getLogger('counsel_windsurf.ann_index')
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = 'index.lock'
+DELTA_FILE = 'delta.bin'
+ASSIGN_BLOCK = 65536
+REFRESH_ATTEMPTS = 3
+
+def _unit_rows(vectors) -> np.ndarray:
+    """Return the rows of a matrix scaled to unit length as float32 (without copying if they already are)."""
+    return normalize(np.asarray(vectors, dtype=np.float32))
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the most similar centroid for every row."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10,
+                    sample_size: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """
+    Train spherical k-means centroids on unit vectors.
+
+    Args:
+        vectors (np.ndarray): Unit-length float32 rows
+        nlist (int): Number of inverted lists (clusters)
+        iterations (int): Lloyd iterations
+        sample_size (int): Rows to train on; defaults to 64 per list
+        seed (int): Random seed for sampling and initialisation
+
+    Returns:
+        np.ndarray: (nlist, d) unit-length float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or 64 * nlist)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        # Re-seed empty clusters with random sample rows
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over unit vectors.
+
+    The index lives in a directory. Each generation is a set of ``.npy`` files
+    (centroids, vectors grouped by list, their ids and list offsets) that are
+    opened memory-mapped, so every worker process shares the same pages.
+    Writes go to an append-only delta segment next to them; ``compact`` folds
+    the delta into a new generation using the existing centroids. The previous
+    generation is kept until the next one is written, so a reader that has
+    just read the old manifest can still open its files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._manifest_mtime = None
+        self.manifest = None
+        self.centroids = None
+        self.vectors = None
+        self.ids = None
+        self.offsets = None
+        self._record_dtype = None
+        self._delta_offset = 0
+        self._delta = {}  # item id -> unit vector, or None for a deletion
+
+    # -- on-disk layout -------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers across processes with an exclusive flock."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILE), 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _generation_dir(self, generation: int) -> str:
+        return os.path.join(self.path, f'gen-{generation:06d}')
+
+    def _generations(self) -> List[int]:
+        """Return the generation numbers present on disk."""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[4:]) for name in names if name.startswith('gen-') and name[4:].isdigit())
+
+    def _delta_path(self) -> str:
+        return os.path.join(self._generation_dir(self.manifest['generation']), DELTA_FILE)
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _write_generation(self, centroids: np.ndarray, ids: np.ndarray, vectors: np.ndarray):
+        """Write a new generation and atomically point the manifest at it. Caller holds the file lock."""
+        current = self._read_manifest()
+        generation = (current['generation'] + 1) if current else 1
+        target = self._generation_dir(generation)
+        os.makedirs(target, exist_ok=True)
+
+        labels = _assign(vectors, centroids) if len(vectors) else np.empty(0, dtype=np.int64)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+
+        np.save(os.path.join(target, 'centroids.npy'), centroids.astype(np.float32))
+        # Copy rows in blocks so a large index never needs a second full copy in memory
+        grouped = np.lib.format.open_memmap(os.path.join(target, 'vectors.npy'), mode='w+',
+                                            dtype=np.float32, shape=(len(ids), centroids.shape[1]))
+        for start in range(0, len(order), ASSIGN_BLOCK):
+            grouped[start:start + ASSIGN_BLOCK] = vectors[order[start:start + ASSIGN_BLOCK]]
+        grouped.flush()
+        del grouped
+        np.save(os.path.join(target, 'ids.npy'), ids[order].astype(np.int64))
+        np.save(os.path.join(target, 'offsets.npy'), offsets)
+        open(os.path.join(target, DELTA_FILE), 'wb').close()
+
+        manifest = {
+            'generation': generation,
+            'dim': int(centroids.shape[1]),
+            'nlist': int(len(centroids)),
+            'count': int(len(ids)),
+        }
+        tmp_path = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp_path, 'w') as handle:
+            json.dump(manifest, handle)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+        # Keep the generation just replaced for readers that read the old manifest but have not opened
+        # its files yet; readers that already mapped older generations keep their open file handles
+        for old in self._generations():
+            if old < generation - 1:
+                shutil.rmtree(self._generation_dir(old), ignore_errors=True)
+        logger.info(f"Wrote ANN generation {generation} with {len(ids)} vectors in {len(centroids)} lists")
+
+    def _refresh(self) -> bool:
+        """Map the current generation and read any new delta records. Returns False if no index exists."""
+        for attempt in range(REFRESH_ATTEMPTS):
+            try:
+                mtime = os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._manifest_mtime:
+                break
+            manifest = self._read_manifest()
+            if manifest is None:
+                return False
+            target = self._generation_dir(manifest['generation'])
+            try:
+                centroids = np.load(os.path.join(target, 'centroids.npy'), mmap_mode='r')
+                vectors = np.load(os.path.join(target, 'vectors.npy'), mmap_mode='r')
+                ids = np.load(os.path.join(target, 'ids.npy'), mmap_mode='r')
+                offsets = np.load(os.path.join(target, 'offsets.npy'))
+            except FileNotFoundError:
+                # Compacted twice since the manifest was read; read the newer one
+                if attempt == REFRESH_ATTEMPTS - 1:
+                    raise
+                continue
+            self.centroids, self.vectors, self.ids, self.offsets = centroids, vectors, ids, offsets
+            self.manifest = manifest
+            self._manifest_mtime = mtime
+            self._record_dtype = np.dtype([('id', '<i8'), ('live', '<i8'), ('vector', '<f4', (manifest['dim'],))])
+            self._delta_offset = 0
+            self._delta = {}
+            break
+
+        # Only whole records are read, so a concurrent append is never seen half-written
+        try:
+            size = os.path.getsize(self._delta_path())
+        except FileNotFoundError:
+            size = 0
+        count = (size - self._delta_offset) // self._record_dtype.itemsize
+        if count > 0:
+            records = np.fromfile(self._delta_path(), dtype=self._record_dtype,
+                                  count=count, offset=self._delta_offset)
+            for record in records:
+                self._delta[int(record['id'])] = record['vector'].copy() if record['live'] else None
+            self._delta_offset += count * self._record_dtype.itemsize
+        return True
+
+    # -- public API -----------------------------------------------------------
+
+    @classmethod
+    def build(cls, path: str, ids, vectors, nlist: Optional[int] = None,
+              iterations: int = 10, seed: int = 0) -> 'IVFIndex':
+        """Train centroids on the vectors and write them as a fresh generation."""
+        index = cls(path)
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = _unit_rows(vectors)
+        if nlist is None:
+            nlist = int(np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors)))
+        centroids = train_centroids(vectors, nlist, iterations=iterations, seed=seed)
+        with index._file_lock():
+            index._write_generation(centroids, ids, vectors)
+        return index
+
+    def exists(self) -> bool:
+        with self._lock:
+            return self._refresh()
+
+    def append(self, item_id: int, vector=None):
+        """Record an insert (or a deletion when vector is None) in the delta segment."""
+        with self._lock, self._file_lock():
+            if not self._refresh():
+                return
+            record = np.zeros(1, dtype=self._record_dtype)
+            record['id'] = item_id
+            if vector is not None:
+                unit = _unit_rows(np.asarray(vector).reshape(1, -1))
+                if unit.shape[1] != self.manifest['dim']:
+                    logger.warning(f"Ignoring vector of dimension {unit.shape[1]} for item {item_id}")
+                    return
+                record['live'] = 1
+                record['vector'] = unit[0]
+            with open(self._delta_path(), 'ab') as handle:
+                handle.write(record.tobytes())
+
+    def compact(self):
+        """Fold the delta segment into a new generation, reusing the trained centroids."""
+        with self._lock, self._file_lock():
+            if not self._refresh() or not self._delta:
+                return
+            deleted = np.fromiter(self._delta.keys(), dtype=np.int64)
+            keep = ~np.isin(self.ids, deleted)
+            added = [(item_id, vector) for item_id, vector in self._delta.items() if vector is not None]
+            ids = np.concatenate([np.asarray(self.ids)[keep],
+                                  np.array([item_id for item_id, _ in added], dtype=np.int64)])
+            vectors = np.asarray(self.vectors)[keep]
+            if added:
+                vectors = np.vstack([vectors, np.stack([vector for _, vector in added])])
+            self._write_generation(np.asarray(self.centroids), ids, vectors)
+            self._manifest_mtime = None
+
+    def delta_size(self) -> int:
+        with self._lock:
+            return len(self._delta) if self._refresh() else 0
+
+    def __len__(self):
+        with self._lock:
+            return self.manifest['count'] if self._refresh() else 0
+
+    def search(self, vector, k: int = 10, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """Return up to k (item id, cosine score) pairs for the closest indexed vectors."""
+        with self._lock:
+            if not self._refresh():
+                return []
+            query = _unit_rows(np.asarray(vector).reshape(1, -1))[0]
+            if query.size != self.manifest['dim']:
+                return []
+
+            nprobe = min(nprobe, len(self.centroids))
+            probes = np.argpartition(-score_query(query, self.centroids), nprobe - 1)[:nprobe]
+            id_parts, score_parts = [], []
+            for probe in probes:
+                start, end = self.offsets[probe], self.offsets[probe + 1]
+                if start < end:
+                    id_parts.append(self.ids[start:end])
+                    score_parts.append(score_query(query, self.vectors[start:end]))
+
+            # Vectors in the delta replace (or delete) their main-segment copies
+            masked = set(self._delta)
+            candidates = {}
+            if id_parts:
+                ids = np.concatenate(id_parts)
+                scores = np.concatenate(score_parts)
+                take = min(len(ids), k + len(masked))
+                for row in np.argpartition(-scores, take - 1)[:take]:
+                    item_id = int(ids[row])
+                    if item_id not in masked:
+                        candidates[item_id] = float(scores[row])
+            for item_id, delta_vector in self._delta.items():
+                if delta_vector is not None:
+                    candidates[item_id] = float(delta_vector @ query)
+
+            return sorted(candidates.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class CrossUserIndex:
+    """
+    ANN indexes over every user's embeddings, one per item kind.
+
+    Until `flask embeddings build-index` has built a kind's index, new vectors
+    are not recorded and search() falls back to an exact scan of the stored
+    embeddings; both log a warning once per kind.
+    """
+
+    def __init__(self, root: str, nprobe: int = 8, compact_threshold: float = 0.1):
+        self.root = root
+        self.nprobe = nprobe
+        self.compact_threshold = compact_threshold
+        self._indexes = {}
+        self._missing_warned = set()
+        self._lock = threading.Lock()
+
+    def index(self, kind: str) -> IVFIndex:
+        with self._lock:
+            if kind not in self._indexes:
+                self._indexes[kind] = IVFIndex(os.path.join(self.root, kind))
+            return self._indexes[kind]
+
+    def _stored_vectors(self, kind: str, batch_size: int = 1000):
+        """Yield (ids, vectors) batches of every stored embedding of a kind, in id order."""
+        model = KINDS[kind]
+        query = db.session.query(
+            model.id, model.embedding, model.embedding_dtype, model.embedding_scale
+        ).filter(model.embedding.isnot(None))
+        if hasattr(model, 'is_latest'):
+            query = query.filter(model.is_latest.is_(True))
+
+        last_id = 0
+        while True:
+            rows = query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                return
+            yield ([item_id for item_id, _, _, _ in rows],
+                   [dequantize(decode_embedding(blob, dtype), scale) for _, blob, dtype, scale in rows])
+            last_id = rows[-1][0]
+
+    def _warn_missing(self, kind: str, consequence: str):
+        if kind not in self._missing_warned:
+            self._missing_warned.add(kind)
+            logger.warning(f"No {kind} ANN index has been built, so {consequence}; "
+                           f"run `flask embeddings build-index` to create it")
+
+    def build(self, kind: str, batch_size: int = 1000, nlist: Optional[int] = None) -> int:
+        """Build the index for a kind from every stored embedding. Returns the number of vectors."""
+        ids, vectors = [], []
+        for batch_ids, batch_vectors in self._stored_vectors(kind, batch_size):
+            ids.extend(batch_ids)
+            vectors.extend(batch_vectors)
+
+        if not ids:
+            logger.warning(f"No {kind} embeddings to index")
+            return 0
+        dim = vectors[0].size
+        keep = [i for i, vector in enumerate(vectors) if vector.size == dim]
+        IVFIndex.build(self.index(kind).path, [ids[i] for i in keep],
+                       np.stack([vectors[i] for i in keep]), nlist=nlist)
+        return len(keep)
+
+    def add(self, kind: str, item_id: int, embedding):
+        """Append a new or changed vector, compacting once the delta grows too large."""
+        if embedding is None:
+            return
+        index = self.index(kind)
+        try:
+            if not index.exists():
+                self._warn_missing(kind, "new vectors are not indexed and searches scan every embedding")
+                return
+            index.append(item_id, embedding)
+            if index.delta_size() > max(1000, self.compact_threshold * len(index)):
+                index.compact()
+        except Exception as e:
+            logger.error(f"Error updating ANN index for {kind} {item_id}: {str(e)}")
+
+    def remove(self, kind: str, item_id: int):
+        index = self.index(kind)
+        try:
+            if not index.exists():
+                self._warn_missing(kind, "new vectors are not indexed and searches scan every embedding")
+                return
+            index.append(item_id, None)
+        except Exception as e:
+            logger.error(f"Error removing {kind} {item_id} from ANN index: {str(e)}")
+
+    def search(self, kind: str, embedding, k: int = 10) -> List[Tuple[int, float]]:
+        if embedding is None:
+            return []
+        index = self.index(kind)
+        if not index.exists():
+            self._warn_missing(kind, "searches scan every embedding")
+            return self.exact_search(kind, embedding, k=k)
+        try:
+            return index.search(embedding, k=k, nprobe=self.nprobe)
+        except OSError as e:
+            # e.g. several compactions raced this refresh; the exact scan is slower but always correct
+            logger.warning(f"Could not read the {kind} ANN index ({str(e)}), scanning every embedding")
+            return self.exact_search(kind, embedding, k=k)
+
+    def exact_search(self, kind: str, embedding, k: int = 10, batch_size: int = 1000) -> List[Tuple[int, float]]:
+        """Return the k (item id, cosine score) pairs closest to the embedding by scoring every stored vector."""
+        query = _unit_rows(np.asarray(embedding).reshape(1, -1))[0]
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for ids, vectors in self._stored_vectors(kind, batch_size):
+            keep = [i for i, vector in enumerate(vectors) if vector.size == query.size]
+            if not keep:
+                continue
+            scores = score_query(query, _unit_rows(np.stack([vectors[i] for i in keep])))
+            best_ids = np.concatenate([best_ids, np.asarray(ids, dtype=np.int64)[keep]])
+            best_scores = np.concatenate([best_scores, scores])
+            rows, best_scores = top_k(best_scores, k)
+            best_ids = best_ids[rows]
+        return [(int(item_id), float(score)) for item_id, score in zip(best_ids, best_scores)]
+
+def create_cross_user_index():
+    """Create a CrossUserIndex rooted at ANN_INDEX_DIR."""
+    root = os.getenv('ANN_INDEX_DIR') or os.path.dirname(instance_path('ann', MANIFEST))
+    return CrossUserIndex(root, nprobe=int(os.getenv('ANN_NPROBE', '8')))
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import numpy as np
+from app import db
+from app.services.vector_index import KINDS
+
+__all__ = ['EmbeddingBackfill']
+
+logger = logging.getLogger('counsel_windsurf.backfill')
+
+
+class EmbeddingBackfill:
+    """
+    Fills in missing Direction and Reference embeddings.
+
+    Rows are streamed in keyset-paginated chunks. Each chunk is split into
+    batches that are embedded concurrently, then written back with one bulk
+    update and one commit. The last id written for each kind is checkpointed
+    to a JSON file, so an interrupted run resumes where it stopped; the file is
+    removed once a run completes.
+    """
+
+    def __init__(self, embedding_service, checkpoint_path: str, chunk_size: int = 256,
+                 batch_size: int = 32, parallelism: int = 4, report: Optional[Callable[[str], None]] = None):
+        self.embedding_service = embedding_service
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.parallelism = parallelism
+        self.report = report or logger.info
+
+    def _load_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_path) as handle:
+                return json.load(handle)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_checkpoint(self, checkpoint: dict):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as handle:
+            json.dump(checkpoint, handle)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _pending_rows(self, model, last_id: int):
+        query = db.session.query(model.id, model.description).filter(
+            model.id > last_id,
+            model.embedding.is_(None)
+        )
+        if hasattr(model, 'is_latest'):
+            # Superseded versions are never searched, so they are not worth embedding
+            query = query.filter(model.is_latest.is_(True))
+        return query.order_by(model.id).limit(self.chunk_size).all()
+
+    def _embed_chunk(self, executor, texts):
+        """Embed a chunk as concurrent batches and return the (n, d) result."""
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results = executor.map(
+            lambda batch: self.embedding_service.create_embeddings(batch, batch_size=self.batch_size),
+            batches
+        )
+        return np.vstack(list(results))
+
+    def run(self, kinds=('direction', 'reference'), restart: bool = False) -> dict:
+        """Backfill the given kinds. Returns per-kind counts of embedded and failed rows."""
+        checkpoint = {} if restart else self._load_checkpoint()
+        if checkpoint:
+            self.report(f"Resuming from checkpoint {checkpoint}")
+        totals = {}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix='backfill') as executor:
+            for kind in kinds:
+                model = KINDS[kind]
+                embedded = failed = 0
+                last_id = checkpoint.get(kind, 0)
+                kind_started = time.perf_counter()
+
+                while True:
+                    rows = self._pending_rows(model, last_id)
+                    if not rows:
+                        break
+                    embeddings = self._embed_chunk(executor, [description or '' for _, description in rows])
+
+                    mappings = []
+                    for (item_id, _), embedding in zip(rows, embeddings):
+                        if not np.all(np.isfinite(embedding)):
+                            failed += 1
+                            continue
+                        values = model.embedding_values(embedding, model=self.embedding_service.model_name)
+                        mappings.append(dict(values, id=item_id))
+                    db.session.bulk_update_mappings(model, mappings)
+                    db.session.commit()
+                    embedded += len(mappings)
+
+                    last_id = rows[-1][0]
+                    checkpoint[kind] = last_id
+                    self._save_checkpoint(checkpoint)
+
+                    elapsed = time.perf_counter() - kind_started
+                    self.report(f"{kind}: {embedded} embedded, {failed} failed, up to id {last_id} "
+                                f"({(embedded + failed) / elapsed:.1f} rows/sec)")
+
+                totals[kind] = {'embedded': embedded, 'failed': failed}
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        processed = sum(total['embedded'] + total['failed'] for total in totals.values())
+        elapsed = time.perf_counter() - started
+        self.report(f"Backfill finished: {processed} rows in {elapsed:.1f}s "
+                    f"({processed / elapsed if elapsed else 0:.1f} rows/sec)")
+        return totals
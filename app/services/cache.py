@@ -0,0 +1,152 @@
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+__all__ = ['TieredCache']
+
+logger = logging.getLogger('counsel_windsurf.cache')
+
+
+class TieredCache:
+    """
+    Two-tier bytes cache: a bounded in-process LRU in front of a SQLite file.
+
+    The SQLite tier is shared by every worker process on the host. Entries are
+    scoped by a version string; opening the cache with a different version
+    than the one recorded in the file discards the stored entries.
+
+    With a ttl (seconds), entries older than it are treated as missing. With
+    max_disk_items, the oldest entries beyond that count (and expired ones)
+    are pruned from the SQLite tier every PRUNE_EVERY writes.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, version: str, max_items: int = 1024,
+                 ttl: Optional[float] = None, max_disk_items: Optional[int] = None):
+        self.path = path
+        self.version = version
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_items = max_disk_items
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._init_disk()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection to the SQLite tier."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _init_disk(self):
+        connection = self._connection()
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)')
+            row = connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                if row is not None:
+                    logger.info(f"Cache version changed ({row[0]} -> {self.version}), discarding {self.path}")
+                connection.execute('DELETE FROM entries')
+                connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (self.version,))
+
+    def _fresh(self, created_at: float) -> bool:
+        return self.ttl is None or time.time() - created_at < self.ttl
+
+    def _remember(self, key: str, value: bytes, created_at: float):
+        """Insert into the memory tier, evicting the least recently used entries. Caller holds the lock."""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[bytes]:
+        """Return the cached value for key, or None. Polling callers pass count_miss=False to keep stats honest."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._fresh(entry[1]):
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            row = self._connection().execute('SELECT value, created_at FROM entries WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading cache {self.path}: {str(e)}")
+            row = None
+
+        with self._lock:
+            if row is None or not self._fresh(row[1]):
+                if count_miss:
+                    self.counters['misses'] += 1
+                return None
+            self.counters['disk_hits'] += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def set(self, key: str, value: bytes):
+        """Store value under key in both tiers."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)',
+                                   (key, value, created_at))
+            if prune:
+                self.prune()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing cache {self.path}: {str(e)}")
+
+    def prune(self) -> int:
+        """Delete expired entries and the oldest ones beyond max_disk_items from the SQLite tier."""
+        connection = self._connection()
+        removed = 0
+        with connection:
+            if self.ttl is not None:
+                removed += connection.execute('DELETE FROM entries WHERE created_at < ?',
+                                              (time.time() - self.ttl,)).rowcount
+            if self.max_disk_items is not None:
+                removed += connection.execute(
+                    'DELETE FROM entries WHERE key IN '
+                    '(SELECT key FROM entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_disk_items,)
+                ).rowcount
+        if removed:
+            logger.debug(f"Pruned {removed} entries from {self.path}")
+        return removed
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM entries')
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and the hit rate."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_items'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
@@ -1,23 +1,88 @@
+import os
 import httpx
+import asyncio
 import logging
-from typing import List, Tuple, Optional
+from typing import AsyncIterator, Iterator, List, Tuple, Optional
 import json
 from abc import ABC, abstractmethod
 from app.utils import get_groq_api_key
+from app.services.http_client import get_async_http_client, get_http_client
+from app.services.llm_cache import get_llm_cache
+from app.services.context_window import estimate_message_tokens, get_context_window
+from app.services.resilience import RateLimitError, UpstreamError, get_policy
+from app.services.single_flight import get_single_flight
+from app.services.model_routing import CONTEXT_SUMMARY, DIALOGUE, PROFILE, SUMMARY, get_model_router
 
 logger = logging.getLogger('counsel_windsurf.chat_service')
 
+DEFAULT_GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+class CompletionTokenFilter:
+    """
+    Passes streamed text through while hiding the completion token.
+    
+    Text that could still turn out to be the start of the token is held back
+    until the next chunk decides it, so a token split across chunk boundaries
+    is never shown. Whitespace right after the token is dropped, matching the
+    stripped summary chat() returns.
+    """
+    
+    def __init__(self, token: str):
+        self.token = token
+        self.pending = ""
+        self.seen = False
+        self.after_token = False  # Still skipping whitespace that follows the token
+    
+    def feed(self, text: str) -> str:
+        """Add a chunk and return the text that is safe to show."""
+        if self.seen:
+            if self.after_token:
+                text = text.lstrip()
+                self.after_token = not text
+            return text
+        
+        self.pending += text
+        index = self.pending.find(self.token)
+        if index >= 0:
+            self.seen = self.after_token = True
+            visible, after = self.pending[:index], self.pending[index + len(self.token):]
+            self.pending = ""
+            return visible + self.feed(after)
+        
+        # Hold back the longest suffix that is a prefix of the token
+        for size in range(min(len(self.token) - 1, len(self.pending)), 0, -1):
+            if self.token.startswith(self.pending[-size:]):
+                visible, self.pending = self.pending[:-size], self.pending[-size:]
+                return visible
+        visible, self.pending = self.pending, ""
+        return visible
+    
+    def flush(self) -> str:
+        """Return any held-back text once the stream has ended."""
+        if self.seen:
+            return ""
+        visible, self.pending = self.pending, ""
+        return visible
+
 class BaseChatService(ABC):
     """Base class for all chat services."""
     
+    dialogue_task = DIALOGUE  # Task whose model profile chat() requests use
+    
     def __init__(self):
         self.api_key = get_groq_api_key()
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.model = "mixtral-8x7b-32768"
+        # GROQ_BASE_URL points the service at any OpenAI-compatible API, e.g. a local stand-in
+        self.base_url = os.getenv('GROQ_BASE_URL', DEFAULT_GROQ_BASE_URL).rstrip('/') + "/chat/completions"
+        self.router = get_model_router()  # Model, max_tokens and temperature per task
+        self.model = self.router.profile(self.dialogue_task).model
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.cache = get_llm_cache()  # Exact-match response cache; None when disabled
+        self.context = get_context_window()  # Keeps long conversations under the prompt token ceiling
+        self.resilience = get_policy('groq')  # Retries, quota and circuit breaker shared by all Groq calls
+        self.flights = get_single_flight()  # Coalesces identical concurrent cached calls
     
     @property
     @abstractmethod
@@ -31,117 +96,421 @@ class BaseChatService(ABC):
         """Return the completion token that marks the end of the conversation."""
         pass
 
-    def generate_short_summary(self, full_text: str) -> str:
+    def _summary_payload(self, full_text: str) -> dict:
+        messages = [
+            {"role": "system", "content": "You are a concise summarizer. Create a clear, impactful summary using 5 or fewer words."},
+            {"role": "user", "content": f"Please summarize this in 5 or fewer words: {full_text}"}
+        ]
+        return self.router.profile(SUMMARY).payload(messages)
+
+    @staticmethod
+    def _quota_cost(request_payload: dict) -> int:
+        """Prompt tokens a request is charged against the tokens-per-minute bucket."""
+        return estimate_message_tokens(request_payload['messages'])
+
+    def _post_completion(self, request_payload: dict, cache) -> Tuple[Optional[str], Optional[httpx.Response]]:
+        response = self.resilience.send(
+            lambda: get_http_client().post(self.base_url, headers=self.headers, json=request_payload),
+            cost=self._quota_cost(request_payload)
+        )
+        if response.status_code != 200:
+            return None, response
+        content = response.json()['choices'][0]['message']['content']
+        if cache is not None:
+            cache.set(request_payload, content)
+        return content, None
+
+    async def _apost_completion(self, request_payload: dict, cache) -> Tuple[Optional[str], Optional[httpx.Response]]:
+        response = await self.resilience.asend(
+            lambda: get_async_http_client().post(self.base_url, headers=self.headers, json=request_payload),
+            cost=self._quota_cost(request_payload)
+        )
+        if response.status_code != 200:
+            return None, response
+        content = response.json()['choices'][0]['message']['content']
+        if cache is not None:
+            await asyncio.to_thread(cache.set, request_payload, content)
+        return content, None
+
+    def _cached_completion(self, request_payload: dict) -> Optional[Tuple[str, None]]:
+        """Result another worker stored for the request, in _complete's (content, None) form."""
+        content = self.cache.get(request_payload, count_miss=False)
+        return (content, None) if content is not None else None
+
+    def _complete(self, request_payload: dict, use_cache: bool) -> Tuple[Optional[str], Optional[httpx.Response]]:
+        """
+        Run a (non-streaming) chat completion, consulting the response cache first if use_cache.
+        
+        Returns:
+            tuple: (content, None) on success, or (None, response) when the API returned an error
+        
+        Raises:
+            UpstreamError: If the call was rate limited or Groq stayed unavailable after retries
+        """
+        cache = self.cache if use_cache else None
+        if cache is None:
+            return self._post_completion(request_payload, None)
+        content = cache.get(request_payload)
+        if content is not None:
+            return content, None
+        # Identical concurrent requests (in any worker) share one API call
+        return self.flights.do(
+            f"llm:{cache.key(request_payload)}",
+            lambda: self._post_completion(request_payload, cache),
+            recheck=lambda: self._cached_completion(request_payload)
+        )
+
+    async def _acomplete(self, request_payload: dict, use_cache: bool) -> Tuple[Optional[str], Optional[httpx.Response]]:
+        """
+        Async variant of _complete.
+
+        The cache and the single-flight leases are SQLite files shared with
+        other workers, so their lookups run in a thread rather than blocking
+        the event loop while another process holds a lock.
+        """
+        cache = self.cache if use_cache else None
+        if cache is None:
+            return await self._apost_completion(request_payload, None)
+        content = await asyncio.to_thread(cache.get, request_payload)
+        if content is not None:
+            return content, None
+        return await self.flights.ado(
+            f"llm:{cache.key(request_payload)}",
+            lambda: self._apost_completion(request_payload, cache),
+            recheck=lambda: self._cached_completion(request_payload)
+        )
+
+    @staticmethod
+    def _read_summary(content: Optional[str], error: Optional[httpx.Response]) -> str:
+        if error is None:
+            short_summary = content.strip()
+            logger.info(f"Generated short summary: {short_summary}")
+            return short_summary
+        logger.error(f"Failed to generate short summary: {error.text}")
+        return "Summary"  # Fallback
+
+    def generate_short_summary(self, full_text: str, use_cache: bool = True) -> str:
         """Generate a short (less than 5 words) summary."""
         try:
-            messages = [
-                {"role": "system", "content": "You are a concise summarizer. Create a clear, impactful summary using 5 or fewer words."},
-                {"role": "user", "content": f"Please summarize this in 5 or fewer words: {full_text}"}
-            ]
-            
-            request_payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 50
-            }
-            
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=request_payload
-                )
-                
-                if response.status_code == 200:
-                    response_data = response.json()
-                    short_summary = response_data['choices'][0]['message']['content'].strip()
-                    logger.info(f"Generated short summary: {short_summary}")
-                    return short_summary
-                else:
-                    logger.error(f"Failed to generate short summary: {response.text}")
-                    return "Summary"  # Fallback
+            return self._read_summary(*self._complete(self._summary_payload(full_text), use_cache))
                     
         except Exception as e:
             logger.error(f"Error generating short summary: {str(e)}")
             return "Summary"  # Fallback
 
-    def chat(self, user_input: str, conversation_history: List[dict] = None) -> Tuple[str, bool, str, str]:
-        """Process user input and return AI response with summary if complete."""
+    async def agenerate_short_summary(self, full_text: str, use_cache: bool = True) -> str:
+        """Async variant of generate_short_summary."""
+        try:
+            return self._read_summary(*await self._acomplete(self._summary_payload(full_text), use_cache))
+                    
+        except Exception as e:
+            logger.error(f"Error generating short summary: {str(e)}")
+            return "Summary"  # Fallback
+
+    def _fold_payload(self, summary: str, turns: List[dict]) -> dict:
+        """Request that folds turns which left the context window into the rolling summary."""
+        transcript = "\n".join(
+            f"{'User' if msg['role'] == 'user' else 'Counselor'}: {msg['content']}" for msg in turns
+        )
+        messages = [
+            {"role": "system", "content": "You maintain a concise running summary of a counselling conversation. "
+                                          "Keep the user's goals, what they said about themselves and any open questions. "
+                                          "Respond with the updated summary only."},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none yet)'}\n\nNew turns:\n{transcript}"}
+        ]
+        return self.router.profile(CONTEXT_SUMMARY).payload(messages, max_tokens=self.context.summary_tokens)
+
+    def _fold_failed(self, error) -> None:
+        detail = error.text if isinstance(error, httpx.Response) else str(error)
+        logger.error(f"Failed to update conversation summary, sending the recent turns only: {detail}")
+
+    def _context(self, user_input: str, conversation_history: List[dict]) -> Tuple[str, List[dict]]:
+        """Return (summary, recent turns) for a request that fits the context window."""
+        plan = self.context.plan(self.system_prompt, conversation_history, user_input)
+        summary = plan.summary
+        for digest, turns in plan.folds:
+            try:
+                content, error = self._complete(self._fold_payload(summary, turns), use_cache=False)
+            except Exception as e:
+                error = e
+            if error is not None:
+                self._fold_failed(error)
+                break
+            summary = content.strip()
+            self.context.remember(digest, summary)
+        return summary, conversation_history[plan.boundary:]
+
+    async def _acontext(self, user_input: str, conversation_history: List[dict]) -> Tuple[str, List[dict]]:
+        """Async variant of _context; the summary cache is read and written in a thread."""
+        plan = await asyncio.to_thread(self.context.plan, self.system_prompt, conversation_history, user_input)
+        summary = plan.summary
+        for digest, turns in plan.folds:
+            try:
+                content, error = await self._acomplete(self._fold_payload(summary, turns), use_cache=False)
+            except Exception as e:
+                error = e
+            if error is not None:
+                self._fold_failed(error)
+                break
+            summary = content.strip()
+            await asyncio.to_thread(self.context.remember, digest, summary)
+        return summary, conversation_history[plan.boundary:]
+
+    def _chat_payload(self, user_input: str, recent_history: List[dict], summary: str = '',
+                      stream: bool = False) -> dict:
+        """Prepare the request for the API and log the conversation context it carries."""
+        messages = self.context.messages(self.system_prompt, summary, recent_history, user_input)
+        
+        logger.info(f"=== Conversation Context (~{estimate_message_tokens(messages)} tokens) ===")
+        for msg in messages:
+            logger.info(f"{msg['role'].upper()}: {msg['content']}")
+        logger.info("=========================")
+        
+        payload = self.router.profile(self.dialogue_task).payload(messages)
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _split_completion(self, assistant_message: str, user_input: str,
+                          conversation_history: List[dict]) -> Tuple[str, bool, str]:
+        """Return (response, is_complete, full_conversation) for a complete assistant message."""
+        # Format the full conversation including the latest exchange
+        updated_messages = conversation_history + [
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": assistant_message}
+        ]
+        full_conversation = "\n\n".join([
+            f"{'You' if msg['role'] == 'user' else 'AI Counselor'}: {msg['content']}"
+            for msg in updated_messages
+        ])
+        
+        # Check if conversation is complete
+        is_complete = self.completion_token in assistant_message
+        if is_complete:
+            processed_message = assistant_message.split(self.completion_token)[1].strip()
+        else:
+            processed_message = assistant_message
+        return processed_message, is_complete, full_conversation
+
+    def _finish(self, assistant_message: str, user_input: str,
+                conversation_history: List[dict]) -> Tuple[str, bool, str, str]:
+        """Turn a complete assistant message into the (response, is_complete, full_conversation, short_summary) result."""
+        processed_message, is_complete, full_conversation = self._split_completion(
+            assistant_message, user_input, conversation_history)
+        short_summary = self.generate_short_summary(processed_message) if is_complete else None
+        return processed_message, is_complete, full_conversation, short_summary
+
+    async def _afinish(self, assistant_message: str, user_input: str,
+                       conversation_history: List[dict]) -> Tuple[str, bool, str, str]:
+        processed_message, is_complete, full_conversation = self._split_completion(
+            assistant_message, user_input, conversation_history)
+        short_summary = await self.agenerate_short_summary(processed_message) if is_complete else None
+        return processed_message, is_complete, full_conversation, short_summary
+
+    @staticmethod
+    def _stream_delta(line: str) -> Optional[str]:
+        """
+        Parse one server-sent event line of a streamed completion.
+        
+        Returns the content delta ('' for lines without one) or None at the end of the stream.
+        """
+        if not line.startswith('data:'):
+            return ''
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            return None
+        return json.loads(data)['choices'][0].get('delta', {}).get('content') or ''
+
+    @staticmethod
+    def _error_result(message: str) -> Tuple[str, bool, str, str]:
+        return f"I apologize, but I encountered {message}. Please try again.", False, "", ""
+
+    @classmethod
+    def _upstream_error_result(cls, error: UpstreamError) -> Tuple[str, bool, str, str]:
+        logger.warning(f"⚠️ Groq call gave up: {str(error)}")
+        if isinstance(error, RateLimitError):
+            return cls._error_result("too many requests right now")
+        return cls._error_result("a problem reaching the AI service")
+
+    def chat(self, user_input: str, conversation_history: List[dict] = None,
+             use_cache: bool = False, raise_errors: bool = False) -> Tuple[str, bool, str, str]:
+        """
+        Process user input and return AI response with summary if complete.
+        
+        Dialogue replies are not cached by default; pass use_cache=True for
+        one-shot prompts such as profile generation that are often repeated.
+        Rate limits and outages become an apology reply unless raise_errors is
+        set, in which case the RateLimitError or UpstreamUnavailableError is raised.
+        """
         if conversation_history is None:
             conversation_history = []
             
         try:
-            # Prepare messages for the API
-            messages = [{"role": "system", "content": self.system_prompt}]
-            messages.extend(conversation_history)
-            messages.append({"role": "user", "content": user_input})
-            
-            # Log the full conversation context
-            logger.info("=== Conversation Context ===")
-            for msg in messages:
-                logger.info(f"{msg['role'].upper()}: {msg['content']}")
-            logger.info("=========================")
-            
-            request_payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1024
-            }
-            
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=request_payload
-                )
+            summary, recent = self._context(user_input, conversation_history)
+            assistant_message, error = self._complete(self._chat_payload(user_input, recent, summary), use_cache)
                 
-                if response.status_code == 200:
-                    response_data = response.json()
-                    assistant_message = response_data['choices'][0]['message']['content']
-                    
-                    # Format the full conversation including the latest exchange
-                    updated_messages = conversation_history + [
-                        {"role": "user", "content": user_input},
-                        {"role": "assistant", "content": assistant_message}
-                    ]
-                    full_conversation = "\n\n".join([
-                        f"{'You' if msg['role'] == 'user' else 'AI Counselor'}: {msg['content']}"
-                        for msg in updated_messages
-                    ])
+            if error is None:
+                return self._finish(assistant_message, user_input, conversation_history)
                     
-                    # Check if conversation is complete
-                    is_complete = self.completion_token in assistant_message
-                    if is_complete:
-                        processed_message = assistant_message.split(self.completion_token)[1].strip()
-                        short_summary = self.generate_short_summary(processed_message)
-                    else:
-                        processed_message = assistant_message
-                        short_summary = None
+            else:
+                logger.error(f"Error response from Groq API (Status {error.status_code}): {error.text}")
+                return self._error_result(f"an error (Status {error.status_code})")
                     
-                    return processed_message, is_complete, full_conversation, short_summary
+        except UpstreamError as e:
+            if raise_errors:
+                raise
+            return self._upstream_error_result(e)
+        except Exception as e:
+            logger.error(f"Unexpected error in chat: {str(e)}", exc_info=True)
+            return self._error_result(f"an unexpected error: {str(e)}")
+
+    async def achat(self, user_input: str, conversation_history: List[dict] = None,
+                    use_cache: bool = False, raise_errors: bool = False) -> Tuple[str, bool, str, str]:
+        """Async variant of chat() that waits on the API without holding a thread."""
+        if conversation_history is None:
+            conversation_history = []
+            
+        try:
+            summary, recent = await self._acontext(user_input, conversation_history)
+            assistant_message, error = await self._acomplete(self._chat_payload(user_input, recent, summary),
+                                                             use_cache)
+                
+            if error is None:
+                return await self._afinish(assistant_message, user_input, conversation_history)
                     
-                else:
-                    error_body = response.text
-                    logger.error(f"Error response from Groq API (Status {response.status_code}): {error_body}")
-                    return f"I apologize, but I encountered an error (Status {response.status_code}). Please try again.", False, "", ""
+            else:
+                logger.error(f"Error response from Groq API (Status {error.status_code}): {error.text}")
+                return self._error_result(f"an error (Status {error.status_code})")
                     
+        except UpstreamError as e:
+            if raise_errors:
+                raise
+            return self._upstream_error_result(e)
         except Exception as e:
             logger.error(f"Unexpected error in chat: {str(e)}", exc_info=True)
-            return f"I apologize, but I encountered an unexpected error: {str(e)}. Please try again.", False, "", ""
+            return self._error_result(f"an unexpected error: {str(e)}")
 
-    def health_check(self):
-        """Check if the Groq API is accessible and responding."""
+    def chat_stream(self, user_input: str, conversation_history: List[dict] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Stream the AI response as it is generated.
+        
+        Yields ('token', text) events carrying the visible text as it arrives;
+        the completion token is never part of them, even when Groq splits it
+        across chunks. The last event is ('done', result), where result is the
+        same tuple chat() returns.
+        """
+        if conversation_history is None:
+            conversation_history = []
+            
         try:
-            # Try a simple chat completion as a health check
-            response = self.chat("health check", [])
-            if response and isinstance(response, tuple) and len(response) > 0:
-                logger.info(" Groq API health check passed")
-                return True, "Groq API is healthy"
-            else:
-                logger.error(" Groq API health check failed - invalid response")
-                return False, "Groq API returned invalid response"
+            parts = []
+            token_filter = CompletionTokenFilter(self.completion_token)
+            summary, recent = self._context(user_input, conversation_history)
+            request_payload = self._chat_payload(user_input, recent, summary, stream=True)
+            client = get_http_client()
+            request = client.build_request('POST', self.base_url, headers=self.headers, json=request_payload)
+            response = self.resilience.send(lambda: client.send(request, stream=True),
+                                            cost=self._quota_cost(request_payload))
+            try:
+                if response.status_code != 200:
+                    error_body = response.read().decode('utf-8', errors='replace')
+                    logger.error(f"Error response from Groq API (Status {response.status_code}): {error_body}")
+                    yield 'done', self._error_result(f"an error (Status {response.status_code})")
+                    return
+                
+                for line in response.iter_lines():
+                    delta = self._stream_delta(line)
+                    if delta is None:
+                        break
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    visible = token_filter.feed(delta)
+                    if visible:
+                        yield 'token', visible
+            finally:
+                response.close()
+            
+            remainder = token_filter.flush()
+            if remainder:
+                yield 'token', remainder
+            yield 'done', self._finish(''.join(parts), user_input, conversation_history)
+            
+        except UpstreamError as e:
+            yield 'done', self._upstream_error_result(e)
+        except Exception as e:
+            logger.error(f"Unexpected error in chat stream: {str(e)}", exc_info=True)
+            yield 'done', self._error_result(f"an unexpected error: {str(e)}")
+
+    async def achat_stream(self, user_input: str, conversation_history: List[dict] = None) -> AsyncIterator[Tuple[str, object]]:
+        """Async variant of chat_stream()."""
+        if conversation_history is None:
+            conversation_history = []
+            
+        try:
+            parts = []
+            token_filter = CompletionTokenFilter(self.completion_token)
+            summary, recent = await self._acontext(user_input, conversation_history)
+            request_payload = self._chat_payload(user_input, recent, summary, stream=True)
+            client = get_async_http_client()
+            request = client.build_request('POST', self.base_url, headers=self.headers, json=request_payload)
+            response = await self.resilience.asend(lambda: client.send(request, stream=True),
+                                                   cost=self._quota_cost(request_payload))
+            try:
+                if response.status_code != 200:
+                    error_body = (await response.aread()).decode('utf-8', errors='replace')
+                    logger.error(f"Error response from Groq API (Status {response.status_code}): {error_body}")
+                    yield 'done', self._error_result(f"an error (Status {response.status_code})")
+                    return
+                
+                async for line in response.aiter_lines():
+                    delta = self._stream_delta(line)
+                    if delta is None:
+                        break
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    visible = token_filter.feed(delta)
+                    if visible:
+                        yield 'token', visible
+            finally:
+                await response.aclose()
+            
+            remainder = token_filter.flush()
+            if remainder:
+                yield 'token', remainder
+            yield 'done', await self._afinish(''.join(parts), user_input, conversation_history)
+            
+        except UpstreamError as e:
+            yield 'done', self._upstream_error_result(e)
+        except Exception as e:
+            logger.error(f"Unexpected error in chat stream: {str(e)}", exc_info=True)
+            yield 'done', self._error_result(f"an unexpected error: {str(e)}")
+
+    @property
+    def models_url(self) -> str:
+        """Models endpoint of the same OpenAI-compatible API as base_url."""
+        return self.base_url.rsplit('/chat/completions', 1)[0] + '/models'
+
+    def health_check(self, timeout: float = None):
+        """
+        Check if the Groq API is accessible and serves every routed model.
+        
+        Retrieves each model's entry from the models endpoint, which checks the
+        API key and model availability without spending completion tokens.
+        """
+        try:
+            for model in self.router.models:
+                response = get_http_client().get(
+                    f"{self.models_url}/{model}",
+                    headers=self.headers,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                )
+                if response.status_code != 200:
+                    logger.error(f" Groq API health check failed for {model} (Status {response.status_code}): {response.text}")
+                    return False, f"Groq API returned status {response.status_code} for {model}"
+            logger.info(" Groq API health check passed")
+            return True, "Groq API is healthy"
         except Exception as e:
             logger.error(f" Groq API health check failed with error: {str(e)}")
             return False, f"Groq API error: {str(e)}"
@@ -182,6 +551,8 @@ class IdolsChatService(BaseChatService):
 class ProfileChatService(BaseChatService):
     """Chat service for generating user profiles based on their growth journey."""
     
+    dialogue_task = PROFILE
+    
     @property
     def system_prompt(self) -> str:
         return f"""You are a growth counselor creating insightful user profiles based on their growth journey.
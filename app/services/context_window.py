@@ -0,0 +1,157 @@
+import os
+import math
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Tuple
+from app.services.cache import TieredCache
+from app.utils.paths import instance_path
+
+__all__ = ['estimate_tokens', 'estimate_message_tokens', 'ContextPlan', 'ContextWindow',
+           'create_context_window', 'get_context_window']
+
+logger = logging.getLogger('counsel_windsurf.context_window')
+
+# Bump to discard every stored summary, e.g. after changing the summarization prompt
+CACHE_VERSION = 'context-v1'
+CHARS_PER_TOKEN = 4  # Rough average for English text with the Llama/Mixtral tokenizers
+MESSAGE_OVERHEAD = 4  # Role and separator tokens the chat template adds around each message
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def estimate_message_tokens(messages: List[dict]) -> int:
+    """Estimate the prompt tokens of a list of chat messages."""
+    return sum(estimate_tokens(message['content']) + MESSAGE_OVERHEAD for message in messages)
+
+def _chain_digest(previous: str, message: dict) -> str:
+    return hashlib.sha256(f"{previous}\x00{message['role']}\x00{message['content']}".encode('utf-8')).hexdigest()
+
+
+class ContextPlan:
+    """
+    How one chat request fits the token budget.
+
+    history[:boundary] is represented by a rolling summary and history[boundary:]
+    is sent verbatim. The summary of the first `start` messages is `summary`
+    (cached); folds lists the (digest, turns) chunks that still have to be
+    folded into it, in order, to reach the boundary.
+    """
+
+    def __init__(self, boundary: int, start: int, summary: str, folds: List[Tuple[str, List[dict]]]):
+        self.boundary = boundary
+        self.start = start
+        self.summary = summary
+        self.folds = folds
+
+
+class ContextWindow:
+    """
+    Keeps chat requests under a prompt token ceiling however long the conversation gets.
+
+    The most recent turns that fit the budget are sent verbatim. Older turns
+    are folded, `step` messages at a time, into a rolling summary. Each
+    summary is cached under a digest of the conversation prefix it covers, so
+    every turn only summarizes the messages that newly left the window, and
+    every worker sharing the cache file reuses the others' summaries.
+    """
+
+    def __init__(self, max_tokens: int = 6000, summary_tokens: int = 256, step: int = 4,
+                 store: Optional[TieredCache] = None):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.step = max(step, 1)
+        self.store = store
+
+    def _boundary(self, system_prompt: str, history: List[dict], user_input: str) -> int:
+        """Return how many leading history messages must be summarized to fit the budget."""
+        fixed = estimate_message_tokens([{'content': system_prompt}, {'content': user_input}])
+        if fixed + estimate_message_tokens(history) <= self.max_tokens:
+            return 0
+
+        # Keep the newest messages that fit next to the summary
+        budget = self.max_tokens - fixed - self.summary_tokens - estimate_tokens(SUMMARY_PREFIX) - MESSAGE_OVERHEAD
+        kept = len(history)
+        while kept > 0:
+            cost = estimate_message_tokens(history[kept - 1:kept])
+            if cost > budget:
+                break
+            budget -= cost
+            kept -= 1
+        if budget < 0:
+            logger.warning("⚠️ System prompt and message alone exceed the context budget")
+        # Summarize whole steps so summaries line up with cached prefixes
+        return min(math.ceil(kept / self.step) * self.step, len(history))
+
+    def plan(self, system_prompt: str, history: List[dict], user_input: str) -> ContextPlan:
+        """Work out which turns to send and which cached summary to extend."""
+        boundary = self._boundary(system_prompt, history, user_input)
+        if boundary == 0:
+            return ContextPlan(0, 0, '', [])
+
+        # Digest of each summarizable prefix, so conversations that share a prefix share its summary
+        digests = []
+        digest = ''
+        for position, message in enumerate(history[:boundary], start=1):
+            digest = _chain_digest(digest, message)
+            if position % self.step == 0 or position == boundary:
+                digests.append((position, digest))
+
+        start, summary = 0, ''
+        if self.store is not None:
+            for position, digest in reversed(digests):
+                cached = self.store.get(digest)
+                if cached is not None:
+                    start, summary = position, cached.decode('utf-8')
+                    break
+
+        folds = []
+        previous = start
+        for position, digest in digests:
+            if position > start:
+                folds.append((digest, history[previous:position]))
+                previous = position
+        return ContextPlan(boundary, start, summary, folds)
+
+    def remember(self, digest: str, summary: str):
+        """Cache the summary of the conversation prefix identified by digest."""
+        if self.store is not None:
+            self.store.set(digest, summary.encode('utf-8'))
+
+    @staticmethod
+    def messages(system_prompt: str, summary: str, recent: List[dict], user_input: str) -> List[dict]:
+        """Assemble the request messages: system prompt, summary, recent turns and the new message."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+        messages.extend(recent)
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+def create_context_window() -> ContextWindow:
+    """
+    Create a ContextWindow from CONTEXT_MAX_TOKENS, CONTEXT_SUMMARY_TOKENS, CONTEXT_SUMMARY_STEP
+    and CONTEXT_SUMMARY_PATH.
+    """
+    path = os.getenv('CONTEXT_SUMMARY_PATH') or instance_path('context_summaries.sqlite3')
+    window = ContextWindow(
+        max_tokens=int(os.getenv('CONTEXT_MAX_TOKENS', '6000')),
+        summary_tokens=int(os.getenv('CONTEXT_SUMMARY_TOKENS', '256')),
+        step=int(os.getenv('CONTEXT_SUMMARY_STEP', '4')),
+        store=TieredCache(path, version=CACHE_VERSION, max_items=1024, ttl=7 * 86400, max_disk_items=20000)
+    )
+    logger.info(f"📏 Chat context limited to ~{window.max_tokens} prompt tokens")
+    return window
+
+_window = None
+_window_lock = threading.Lock()
+
+def get_context_window() -> ContextWindow:
+    """Return the process-wide ContextWindow shared by every chat service, creating it on first use."""
+    global _window
+    with _window_lock:
+        if _window is None:
+            _window = create_context_window()
+        return _window
@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import List, Optional
+from app import db
+from app.models import Conversation, ConversationTurn
+
+__all__ = ['ConversationStore', 'ConversationChanged']
+
+
+class ConversationChanged(Exception):
+    """The conversation moved on (another reply, a reset or a confirmation) since it was read."""
+
+
+class ConversationStore:
+    """
+    Server-side storage of chat conversations in progress.
+
+    The browser session only holds the id of the user's open conversation per
+    flow. Each exchange appends two ConversationTurn rows and bumps the
+    conversation's turn_count, which doubles as a version: an append based on
+    an older count fails with ConversationChanged instead of interleaving
+    replies. Conversations are deleted once confirmed or reset, since the
+    saved direction or reference keeps the transcript.
+    """
+
+    def get(self, conversation_id: Optional[int], user_id: int, kind: str) -> Optional[Conversation]:
+        """Return the user's open conversation of this kind with the given id, if it still exists."""
+        if conversation_id is None:
+            return None
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None or conversation.user_id != user_id or conversation.kind != kind:
+            return None
+        return conversation
+
+    def history(self, conversation: Optional[Conversation]) -> List[dict]:
+        """Return the conversation's messages in order, in the chat services' format."""
+        if conversation is None or not conversation.turn_count:
+            return []
+        rows = db.session.query(ConversationTurn.role, ConversationTurn.content).filter(
+            ConversationTurn.conversation_id == conversation.id
+        ).order_by(ConversationTurn.position)
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, conversation: Optional[Conversation], user_id: int, kind: str,
+               user_message: str, response: str, expected_turns: Optional[int] = None) -> Conversation:
+        """
+        Add an exchange to the current session, starting a conversation if there is none.
+
+        expected_turns is the turn_count the reply was generated against;
+        the caller commits.
+
+        Raises:
+            ConversationChanged: If the conversation has gained turns or been deleted since
+        """
+        now = datetime.utcnow()
+        if conversation is None:
+            if expected_turns:
+                raise ConversationChanged()
+            position = 0
+            conversation = Conversation(user_id=user_id, kind=kind, turn_count=0, created_at=now)
+            db.session.add(conversation)
+            db.session.flush()
+        else:
+            # Compare-and-set on turn_count, so concurrent replies cannot both be appended
+            position = conversation.turn_count if expected_turns is None else expected_turns
+            updated = Conversation.query.filter_by(
+                id=conversation.id, turn_count=position
+            ).update({'turn_count': position + 2, 'updated_at': now}, synchronize_session=False)
+            if updated != 1:
+                raise ConversationChanged()
+        db.session.add_all([
+            ConversationTurn(conversation_id=conversation.id, position=position, role="user",
+                             content=user_message, created_at=now),
+            ConversationTurn(conversation_id=conversation.id, position=position + 1, role="assistant",
+                             content=response, created_at=now),
+        ])
+        conversation.turn_count = position + 2
+        conversation.updated_at = now
+        return conversation
+
+    def complete(self, conversation: Conversation, summary: str, title: str, raw_response: str):
+        """Record the counselor's summary for the user to confirm."""
+        conversation.pending_summary = summary
+        conversation.pending_title = title
+        conversation.pending_raw_response = raw_response
+
+    def delete(self, conversation: Optional[Conversation]) -> bool:
+        """
+        Delete a conversation and its turns in the current session.
+
+        Returns False if it was already gone, e.g. confirmed by a concurrent request.
+        """
+        if conversation is None:
+            return False
+        ConversationTurn.query.filter_by(conversation_id=conversation.id).delete(synchronize_session=False)
+        deleted = Conversation.query.filter_by(id=conversation.id).delete(synchronize_session=False)
+        db.session.expunge(conversation)
+        return deleted == 1
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
+from app.models import Direction, Reference
+
+__all__ = ['DashboardPage', 'encode_cursor', 'decode_cursor', 'direction_page', 'reference_page']
+
+CURSOR_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+class DashboardPage:
+    """One page of a dashboard list, newest first; next_cursor is None on the last page."""
+
+    def __init__(self, items: List, next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+def encode_cursor(item) -> str:
+    """Position just after item in (timestamp, id) descending order, for a URL."""
+    return f"{item.timestamp.strftime(CURSOR_TIME_FORMAT)}-{item.id}"
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Parse a cursor from encode_cursor; None (the first page) if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        timestamp, item_id = cursor.split('-', 1)
+        return datetime.strptime(timestamp, CURSOR_TIME_FORMAT), int(item_id)
+    except ValueError:
+        return None
+
+def _page(query, model, cursor: Optional[str], page_size: int) -> DashboardPage:
+    """
+    Fetch the page after cursor with keyset pagination on (timestamp, id).
+
+    The composite (user_id, ..., timestamp) indexes end in the rowid, so the
+    rows come straight off the index in order and each page costs the same
+    however many rows precede it. One extra row tells whether there is a next page.
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(model.timestamp, model.id) < position)
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(page_size + 1).all()
+    items = rows[:page_size]
+    return DashboardPage(items, encode_cursor(items[-1]) if len(rows) > page_size else None)
+
+def direction_page(user_id: int, cursor: Optional[str] = None, page_size: int = 20) -> DashboardPage:
+    """Latest versions of the user's directions, loading only the columns the dashboard shows."""
+    query = Direction.query.options(
+        load_only(Direction.id, Direction.title, Direction.description, Direction.timestamp)
+    ).filter_by(user_id=user_id, is_latest=True)
+    return _page(query, Direction, cursor, page_size)
+
+def reference_page(user_id: int, cursor: Optional[str] = None, page_size: int = 20) -> DashboardPage:
+    """The user's references, loading only the columns the dashboard shows."""
+    query = Reference.query.options(
+        load_only(Reference.id, Reference.title, Reference.description, Reference.timestamp)
+    ).filter_by(user_id=user_id)
+    return _page(query, Reference, cursor, page_size)
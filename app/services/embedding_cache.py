@@ -0,0 +1,55 @@
+import os
+import hashlib
+import logging
+from typing import Optional
+import numpy as np
+from app.services.cache import TieredCache
+from app.utils.paths import instance_path
+from app.utils.vectors import encode_embedding, decode_embedding
+
+__all__ = ['EmbeddingCache', 'create_embedding_cache', 'normalize_text']
+
+logger = logging.getLogger('counsel_windsurf.embedding_cache')
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a text share a cache entry."""
+    return ' '.join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed on sha256(model id + normalized text).
+
+    The SQLite tier keeps at most max_disk_items entries; the oldest are pruned first.
+    """
+
+    def __init__(self, model_id: str, path: str, max_items: int = 4096,
+                 max_disk_items: Optional[int] = 50000):
+        self.model_id = model_id
+        # Keying the store on the model id discards stored vectors when the model changes
+        self.store = TieredCache(path, version=model_id, max_items=max_items, max_disk_items=max_disk_items)
+        logger.info(f"Initialized embedding cache at {path}")
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalize_text(text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, text: str, count_miss: bool = True) -> Optional[np.ndarray]:
+        blob = self.store.get(self.key(text), count_miss=count_miss)
+        return decode_embedding(blob) if blob is not None else None
+
+    def set(self, text: str, embedding):
+        self.store.set(self.key(text), encode_embedding(embedding))
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+def create_embedding_cache(model_id: str) -> EmbeddingCache:
+    """Create an EmbeddingCache for a model using EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_ITEMS and EMBEDDING_CACHE_MAX_DISK_ITEMS."""
+    path = os.getenv('EMBEDDING_CACHE_PATH') or instance_path('embedding_cache.sqlite3')
+    max_items = int(os.getenv('EMBEDDING_CACHE_ITEMS', '4096'))
+    max_disk_items = int(os.getenv('EMBEDDING_CACHE_MAX_DISK_ITEMS', '50000'))
+    return EmbeddingCache(model_id, path, max_items=max_items, max_disk_items=max_disk_items)
@@ -0,0 +1,228 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import List
+import numpy as np
+from app.services.http_client import get_async_http_client, get_http_client
+from app.services.resilience import get_policy
+
+__all__ = [
+    'EmbeddingProvider',
+    'EmbeddingProviderError',
+    'HuggingFaceEmbeddingProvider',
+    'LocalEmbeddingProvider',
+    'HashingEmbeddingProvider',
+    'create_embedding_provider',
+]
+
+logger = logging.getLogger('counsel_windsurf.embedding_providers')
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_HUGGINGFACE_BASE_URL = "https://api-inference.huggingface.co"
+
+
+class EmbeddingProviderError(Exception):
+    """Raised when a provider cannot embed a batch of texts."""
+
+
+class EmbeddingProvider(ABC):
+    """Turns batches of texts into embedding vectors."""
+
+    #: Human readable name used in logs and health messages
+    name = "Embedding provider"
+
+    @property
+    @abstractmethod
+    def model_id(self) -> str:
+        """Identifier of the model; vectors from different ids are not comparable."""
+        pass
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Length of the vectors this provider returns."""
+        pass
+
+    @property
+    def cache_namespace(self) -> str:
+        """Scope for cached vectors; a change discards everything cached under the old one."""
+        return self.model_id
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return an (n, d) float32 matrix for the texts or raise EmbeddingProviderError."""
+        pass
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """Async variant of embed; runs it in a worker thread unless a provider has native async I/O."""
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class HuggingFaceEmbeddingProvider(EmbeddingProvider):
+    """Calls the hosted HuggingFace feature-extraction pipeline over HTTP."""
+
+    name = "HuggingFace API"
+
+    def __init__(self, api_key=None, model_name=DEFAULT_MODEL):
+        self.api_key = api_key or os.getenv('HUGGINGFACE_API_KEY')
+        if not self.api_key:
+            logger.error("HUGGINGFACE_API_KEY not found in environment variables")
+            raise ValueError("HUGGINGFACE_API_KEY must be set in environment variables")
+        logger.info("Initializing HuggingFace API configuration")
+
+        self.model_name = model_name
+        base_url = os.getenv('HUGGINGFACE_BASE_URL', DEFAULT_HUGGINGFACE_BASE_URL).rstrip('/')
+        self.api_url = f"{base_url}/pipeline/feature-extraction/{self.model_name}"
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.resilience = get_policy('huggingface')  # Retries and circuit breaker shared by all HuggingFace calls
+
+    @property
+    def model_id(self) -> str:
+        return self.model_name
+
+    @property
+    def cache_namespace(self) -> str:
+        # The URL identifies the deployed model, so changing it invalidates cached vectors
+        return self.api_url
+
+    @property
+    def dimension(self) -> int:
+        return 384
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.resilience.send(lambda: get_http_client().post(
+            self.api_url,
+            headers=self.headers,
+            json={"inputs": list(texts), "options": {"wait_for_model": True}}
+        ))
+        return self._read_vectors(response, texts)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        response = await self.resilience.asend(lambda: get_async_http_client().post(
+            self.api_url,
+            headers=self.headers,
+            json={"inputs": list(texts), "options": {"wait_for_model": True}}
+        ))
+        return self._read_vectors(response, texts)
+
+    @staticmethod
+    def _read_vectors(response, texts: List[str]) -> np.ndarray:
+        if response.status_code != 200:
+            raise EmbeddingProviderError(f"Error from HuggingFace API (Status {response.status_code}): {response.text}")
+        vectors = np.asarray(response.json(), dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise EmbeddingProviderError(f"Unexpected embedding shape {vectors.shape} for {len(texts)} inputs")
+        return vectors
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Runs a sentence-transformers model in-process on the CPU.
+
+    The model is loaded once per process on first use and shared by every
+    instance. Requires the optional ``sentence-transformers`` package.
+    """
+
+    name = "Local embedding model"
+    _models = {}
+    _load_lock = threading.Lock()
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=32, device='cpu'):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+
+    def _model(self):
+        with self._load_lock:
+            key = (self.model_name, self.device)
+            if key not in self._models:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise EmbeddingProviderError(
+                        "The local embedding provider requires the sentence-transformers package"
+                    ) from e
+                logger.info(f"Loading local embedding model {self.model_name} on {self.device}")
+                self._models[key] = SentenceTransformer(self.model_name, device=self.device)
+            return self._models[key]
+
+    @property
+    def model_id(self) -> str:
+        return self.model_name
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"local:{self.model_name}"
+
+    @property
+    def dimension(self) -> int:
+        return self._model().get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model().encode(list(texts), batch_size=self.batch_size,
+                                       convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic hashing-vectorizer embeddings for tests and offline use.
+
+    Word unigrams and character trigrams are hashed into a fixed number of
+    signed buckets and the result is L2-normalized. Texts that share words
+    score as similar, which is enough to exercise ranking without a model.
+    """
+
+    name = "Hashing embedder"
+    _token_pattern = re.compile(r"\w+")
+
+    def __init__(self, dimension=384):
+        self._dimension = dimension
+
+    @property
+    def model_id(self) -> str:
+        return f"hashing:{self._dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _features(self, text: str) -> List[str]:
+        words = self._token_pattern.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                vectors[row, value % self._dimension] += 1.0 if (value >> 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+PROVIDERS = {
+    'huggingface': HuggingFaceEmbeddingProvider,
+    'local': LocalEmbeddingProvider,
+    'hashing': HashingEmbeddingProvider,
+}
+
+def create_embedding_provider(provider_type: str = None) -> EmbeddingProvider:
+    """Create the provider named by provider_type or the EMBEDDING_PROVIDER variable (default huggingface)."""
+    provider_type = provider_type or os.getenv('EMBEDDING_PROVIDER', 'huggingface')
+    provider_class = PROVIDERS.get(provider_type)
+    if not provider_class:
+        raise ValueError(f"Unknown embedding provider: {provider_type}")
+    return provider_class()
@@ -1,88 +1,182 @@
-import os
-import httpx
+import hashlib
 import numpy as np
-import json
 import logging
+from app.services.embedding_cache import create_embedding_cache
+from app.services.similarity import cosine
+from app.services.single_flight import get_single_flight
+from app.services.embedding_providers import HuggingFaceEmbeddingProvider, create_embedding_provider
 
 __all__ = ['EmbeddingService', 'create_embedding_service']
 
 logger = logging.getLogger('counsel_windsurf.embedding_service')
 
 class EmbeddingService:
-    def __init__(self, api_key=None):
-        self.api_key = api_key or os.getenv('HUGGINGFACE_API_KEY')
-        if not self.api_key:
-            logger.error("HUGGINGFACE_API_KEY not found in environment variables")
-            raise ValueError("HUGGINGFACE_API_KEY must be set in environment variables")
-        logger.info("Initializing HuggingFace API configuration")
-        
-        self.api_url = "https://api-inference.huggingface.co/pipeline/feature-extraction/sentence-transformers/all-MiniLM-L6-v2"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-    def create_embedding(self, text):
-        """Create an embedding for the given text using HuggingFace's sentence-transformers API."""
+    def __init__(self, api_key=None, provider=None):
+        self.provider = provider or HuggingFaceEmbeddingProvider(api_key=api_key)
+        self.model_name = self.provider.model_id
+        self.cache = create_embedding_cache(self.provider.cache_namespace)
+        self.flights = get_single_flight()  # Coalesces identical concurrent provider calls
+        logger.info(f"Using {self.provider.name} ({self.model_name}) for embeddings")
+
+    @property
+    def dimension(self):
+        return self.provider.dimension
+
+    def _embed_one(self, text):
+        embedding = self.provider.embed([text])[0]
+        self.cache.set(text, embedding)
+        logger.info("Successfully created embedding")
+        return embedding
+
+    async def _aembed_one(self, text):
+        embedding = (await self.provider.aembed([text]))[0]
+        self.cache.set(text, embedding)
+        logger.info("Successfully created embedding")
+        return embedding
+
+    def create_embedding(self, text, use_cache=True):
+        """Create an embedding for the given text using the configured provider."""
         try:
+            if use_cache:
+                embedding = self.cache.get(text)
+                if embedding is not None:
+                    logger.debug("Embedding served from cache")
+                    return embedding
+            
             logger.debug(f"Creating embedding for text: {text[:100]}...")
             
-            # Make request to HuggingFace API
-            response = httpx.post(
-                self.api_url,
-                headers=self.headers,
-                json={"inputs": text, "options": {"wait_for_model": True}}
+            if not use_cache:
+                return self._embed_one(text)
+            # Concurrent requests for the same text (in any worker) share one provider call
+            return self.flights.do(
+                f"embedding:{self.cache.key(text)}",
+                lambda: self._embed_one(text),
+                recheck=lambda: self.cache.get(text, count_miss=False)
             )
-                
-            if response.status_code == 200:
-                # HuggingFace returns the embedding directly as a list of floats
-                embedding = np.array(response.json())
-                logger.info("Successfully created embedding")
-                return embedding
-            else:
-                logger.error(f"Error from HuggingFace API: {response.text}")
-                return None
                     
         except Exception as e:
             logger.error(f"Error creating embedding: {str(e)}")
             return None
 
+    async def acreate_embedding(self, text, use_cache=True):
+        """Async variant of create_embedding for use from coroutines."""
+        try:
+            if use_cache:
+                embedding = self.cache.get(text)
+                if embedding is not None:
+                    logger.debug("Embedding served from cache")
+                    return embedding
+            
+            logger.debug(f"Creating embedding for text: {text[:100]}...")
+            
+            if not use_cache:
+                return await self._aembed_one(text)
+            return await self.flights.ado(
+                f"embedding:{self.cache.key(text)}",
+                lambda: self._aembed_one(text),
+                recheck=lambda: self.cache.get(text, count_miss=False)
+            )
+                    
+        except Exception as e:
+            logger.error(f"Error creating embedding: {str(e)}")
+            return None
+
+    def _embed_batch(self, batch):
+        vectors = self.provider.embed(batch)
+        for text, vector in zip(batch, vectors):
+            self.cache.set(text, vector)
+        return vectors
+
+    def _cached_batch(self, batch):
+        """Return the batch's vectors if all of them are cached, else None."""
+        vectors = []
+        for text in batch:
+            vector = self.cache.get(text, count_miss=False)
+            if vector is None:
+                return None
+            vectors.append(vector)
+        return vectors
+
+    def create_embeddings(self, texts, batch_size=32):
+        """
+        Create embeddings for many texts, sending each chunk of batch_size texts to the provider at once.
+
+        Args:
+            texts (list[str]): Texts to embed
+            batch_size (int): Maximum number of inputs per provider call
+
+        Returns:
+            np.ndarray: An (n, d) float32 matrix aligned with texts. Rows for
+                texts that could not be embedded are filled with NaN.
+        """
+        rows = [None] * len(texts)
+        # Only texts that are neither cached nor empty are sent; the pipeline rejects empty inputs
+        pending = []
+        for position, text in enumerate(texts):
+            if text and text.strip():
+                rows[position] = self.cache.get(text)
+                if rows[position] is None:
+                    pending.append(position)
+
+        for start in range(0, len(pending), batch_size):
+            positions = pending[start:start + batch_size]
+            batch = [texts[position] for position in positions]
+            try:
+                # An overlapping run (e.g. a second backfill) sending the same batch shares this call
+                vectors = self.flights.do(
+                    'embedding-batch:' + hashlib.sha256('\0'.join(self.cache.key(text) for text in batch).encode()).hexdigest(),
+                    lambda: self._embed_batch(batch),
+                    recheck=lambda: self._cached_batch(batch)
+                )
+                for position, vector in zip(positions, vectors):
+                    rows[position] = vector
+                continue
+            except Exception as e:
+                logger.error(f"Error creating embeddings for batch at {start}: {str(e)}")
+
+            # Retry the chunk one input at a time so a single bad item doesn't fail the rest
+            logger.warning(f"Batch at {start} failed, retrying {len(positions)} inputs individually")
+            for position in positions:
+                rows[position] = self.create_embedding(texts[position], use_cache=False)
+
+        dim = next((row.size for row in rows if row is not None), self.dimension)
+        embeddings = np.full((len(texts), dim), np.nan, dtype=np.float32)
+        for position, row in enumerate(rows):
+            if row is not None and row.size == dim:
+                embeddings[position] = row
+        failed = int(np.isnan(embeddings).any(axis=1).sum())
+        logger.info(f"Created {len(texts) - failed} of {len(texts)} embeddings "
+                    f"({len(texts) - len(pending)} cached, {len(pending)} requested in batches of {batch_size})")
+        return embeddings
+
     def compute_similarity(self, embedding1, embedding2):
         """Compute cosine similarity between two embeddings."""
         try:
             if embedding1 is None or embedding2 is None:
                 return 0.0
-            
-            # Compute cosine similarity
-            dot_product = np.dot(embedding1, embedding2)
-            norm1 = np.linalg.norm(embedding1)
-            norm2 = np.linalg.norm(embedding2)
-            
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-                
-            similarity = dot_product / (norm1 * norm2)
-            return float(similarity)
+            return cosine(embedding1, embedding2)
             
         except Exception as e:
             logger.error(f"Error computing similarity: {str(e)}")
             return 0.0
 
     def health_check(self):
-        """Check if the HuggingFace API is accessible and responding."""
+        """Check if the embedding provider is accessible and responding."""
+        name = self.provider.name
         try:
             # Try to create a simple embedding as a health check
-            test_embedding = self.create_embedding("health check")
+            # Bypass the cache so the check really reaches the provider
+            test_embedding = self.create_embedding("health check", use_cache=False)
             if test_embedding is not None:
-                logger.info("")
-                return True, "HuggingFace API is healthy"
+                logger.info(f" {name} health check passed")
+                return True, f"{name} is healthy"
             else:
-                logger.error("")
-                return False, "HuggingFace API failed to generate embedding"
+                logger.error(f" {name} health check failed")
+                return False, f"{name} failed to generate embedding"
         except Exception as e:
-            logger.error(f" HuggingFace API health check failed with error: {str(e)}")
-            return False, f"HuggingFace API error: {str(e)}"
+            logger.error(f" {name} health check failed with error: {str(e)}")
+            return False, f"{name} error: {str(e)}"
 
 def create_embedding_service():
-    """Create and return an instance of EmbeddingService."""
-    return EmbeddingService()
+    """Create an EmbeddingService backed by the provider named in EMBEDDING_PROVIDER."""
+    return EmbeddingService(provider=create_embedding_provider())
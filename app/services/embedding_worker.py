@@ -0,0 +1,68 @@
+import logging
+from typing import Callable, Optional
+import numpy as np
+from app import db
+from app.models import EmbeddingJob
+from app.services.job_worker import JobWorker
+from app.services.vector_index import KINDS
+
+__all__ = ['EmbeddingWorker']
+
+logger = logging.getLogger('counsel_windsurf.embedding_worker')
+
+
+class EmbeddingWorker(JobWorker):
+    """
+    Computes embeddings off the request path.
+
+    Routes record an EmbeddingJob in the same transaction as the item they
+    save. The JobWorker poller claims due jobs with a short lease and runs
+    them on a bounded thread pool; failures are retried with jittered
+    exponential backoff.
+    """
+
+    model = EmbeddingJob
+    name = 'embedding'
+    logger = logger
+    config_prefix = 'EMBEDDING'
+
+    def __init__(self, embedding_service, on_embedded: Optional[Callable] = None,
+                 workers: int = 2, max_attempts: int = 8, poll_interval: float = 5.0,
+                 base_delay: float = 2.0, max_delay: float = 600.0, lease_seconds: int = 120):
+        super().__init__(workers=workers, max_attempts=max_attempts, poll_interval=poll_interval,
+                         base_delay=base_delay, max_delay=max_delay, lease_seconds=lease_seconds)
+        self.embedding_service = embedding_service
+        self.on_embedded = on_embedded
+
+    def enqueue(self, kind: str, item_id: int):
+        """Add a job for the item to the current session; it runs once the caller commits."""
+        if db.session.query(EmbeddingJob.id).filter_by(kind=kind, item_id=item_id).first() is None:
+            db.session.add(EmbeddingJob(kind=kind, item_id=item_id))
+
+    def _process(self, job_id: int):
+        job = EmbeddingJob.query.get(job_id)
+        if job is None:
+            return
+        item = KINDS[job.kind].query.get(job.item_id)
+        if item is None or item.embedding is not None:
+            # Deleted meanwhile, or already embedded by a backfill
+            db.session.delete(job)
+            db.session.commit()
+            return
+
+        embedding = self.embedding_service.create_embedding(item.description or '')
+        if embedding is not None and np.all(np.isfinite(embedding)):
+            item.set_embedding(embedding, model=self.embedding_service.model_name)
+            db.session.delete(job)
+            db.session.commit()
+            logger.info(f"Stored embedding for {job.kind} {job.item_id} after {job.attempts + 1} attempt(s)")
+            if self.on_embedded is not None:
+                try:
+                    self.on_embedded(job.kind, item, embedding)
+                except Exception as e:
+                    logger.error(f"Error indexing {job.kind} {job.item_id}: {str(e)}")
+            return
+
+        self._retry_later(job, "Embedding provider returned no embedding",
+                          f"embedding for {job.kind} {job.item_id}")
+        db.session.commit()
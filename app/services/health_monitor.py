@@ -0,0 +1,119 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+__all__ = ['HealthMonitor']
+
+logger = logging.getLogger('counsel_windsurf.health_monitor')
+
+Probe = Callable[[], Tuple[bool, str]]
+
+
+class HealthMonitor:
+    """
+    Probes external services in the background and serves the last results from memory.
+
+    Probes run concurrently, each bounded by probe_timeout, every interval
+    seconds on a daemon thread. snapshot() never waits on the network once a
+    first round has completed; if the results are older than ttl (the prober
+    is stuck or was never started) it starts a refresh and reports the stale
+    results in the meantime.
+    """
+
+    def __init__(self, probes: Dict[str, Probe], interval: float = 60.0, ttl: float = 180.0,
+                 probe_timeout: float = 5.0):
+        self.probes = probes
+        self.interval = interval
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self._results: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=len(probes), thread_name_prefix='health-probe')
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._first_round = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self, app=None):
+        """Start the background prober (idempotent), using the HEALTH_* settings of app if given."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            if app is not None:
+                self.interval = app.config.get('HEALTH_CHECK_INTERVAL', self.interval)
+                self.ttl = app.config.get('HEALTH_CHECK_TTL', self.ttl)
+                self.probe_timeout = app.config.get('HEALTH_PROBE_TIMEOUT', self.probe_timeout)
+            self._thread = threading.Thread(target=self._loop, name='health-prober', daemon=True)
+            self._thread.start()
+        logger.info(f"🏥 Started health prober (every {self.interval:.0f}s)")
+
+    def stop(self):
+        self._stopping.set()
+        self._executor.shutdown(wait=False)
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            self.refresh()
+            self._stopping.wait(self.interval)
+
+    def _run_probe(self, name: str, probe: Probe) -> dict:
+        started = time.perf_counter()
+        try:
+            healthy, message = probe()
+        except Exception as e:
+            healthy, message = False, f"error: {str(e)}"
+        return {
+            'healthy': healthy,
+            'message': message,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    def refresh(self) -> Dict[str, dict]:
+        """Run every probe concurrently and store the results; concurrent callers share one round."""
+        if not self._refreshing.acquire(blocking=False):
+            self._first_round.wait(self.probe_timeout * 2)
+            return self.results()
+        try:
+            started = time.perf_counter()
+            futures = {name: self._executor.submit(self._run_probe, name, probe) for name, probe in self.probes.items()}
+            deadline = time.monotonic() + self.probe_timeout
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+                except FutureTimeoutError:
+                    results[name] = {'healthy': False, 'message': f"no answer within {self.probe_timeout:.0f}s",
+                                     'latency_ms': None}
+            with self._lock:
+                self._results = results
+                self._checked_at = time.time()
+            self._first_round.set()
+            healthy = sum(1 for result in results.values() if result['healthy'])
+            logger.info(f"🏥 Health probes: {healthy}/{len(results)} healthy "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+            return results
+        finally:
+            self._refreshing.release()
+
+    def results(self) -> Dict[str, dict]:
+        with self._lock:
+            return dict(self._results)
+
+    def snapshot(self) -> Tuple[Dict[str, dict], Optional[float]]:
+        """
+        Return (results, age in seconds) from memory.
+
+        Waits for the first round only if none has completed yet. Stale results
+        trigger a refresh in the background rather than on the caller's thread.
+        """
+        if not self._first_round.is_set():
+            self.refresh()
+        with self._lock:
+            results, checked_at = dict(self._results), self._checked_at
+        age = time.time() - checked_at if checked_at is not None else None
+        if age is None or age > self.ttl:
+            threading.Thread(target=self.refresh, name='health-refresh', daemon=True).start()
+        return results, age
@@ -0,0 +1,107 @@
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Optional
+import httpx
+
+__all__ = ['get_http_client', 'close_http_client', 'get_async_http_client', 'aclose_async_http_client', 'http2_available']
+
+logger = logging.getLogger('counsel_windsurf.http_client')
+
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+# AsyncClient connections belong to the event loop that opened them, so each loop gets its own
+_async_clients = weakref.WeakKeyDictionary()
+
+def http2_available() -> bool:
+    """Return True if the optional h2 package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _client_settings() -> dict:
+    """Return the client options from the HTTP_* environment settings."""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', '20')),
+        max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE', '10')),
+        keepalive_expiry=float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+    )
+    timeout = httpx.Timeout(
+        connect=float(os.getenv('HTTP_CONNECT_TIMEOUT', '5')),
+        read=float(os.getenv('HTTP_READ_TIMEOUT', '30')),
+        write=float(os.getenv('HTTP_WRITE_TIMEOUT', '10')),
+        pool=float(os.getenv('HTTP_POOL_TIMEOUT', '5'))
+    )
+    http2 = os.getenv('HTTP2_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    if http2 and not http2_available():
+        logger.warning("⚠️ HTTP/2 requested but the h2 package is not installed; using HTTP/1.1 keep-alive")
+        http2 = False
+    return {'http2': http2, 'limits': limits, 'timeout': timeout}
+
+def _build_client() -> httpx.Client:
+    settings = _client_settings()
+    logger.info(f"🌐 Created shared HTTP client (http2={settings['http2']}, "
+                f"max_connections={settings['limits'].max_connections})")
+    return httpx.Client(**settings)
+
+def get_http_client() -> httpx.Client:
+    """
+    Return the process-wide pooled HTTP client, creating it on first use.
+
+    httpx.Client is thread-safe, so every service and worker thread shares one
+    connection pool and reuses warm TCP/TLS connections to the same host.
+    """
+    global _client
+    client = _client
+    if client is None or client.is_closed:
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = _build_client()
+            client = _client
+    return client
+
+def close_http_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Return the pooled AsyncClient of the running event loop, creating it on first use.
+
+    Uses the same HTTP_* settings as get_http_client. Must be called from a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        settings = _client_settings()
+        client = httpx.AsyncClient(**settings)
+        _async_clients[loop] = client
+        logger.info(f"🌐 Created async HTTP client (http2={settings['http2']}, "
+                    f"max_connections={settings['limits'].max_connections})")
+    return client
+
+async def aclose_async_http_client():
+    """Close the running event loop's AsyncClient, e.g. on ASGI lifespan shutdown."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+def _reset_after_fork():
+    # Sockets must not be shared with the parent, so the child starts a fresh pool
+    global _client, _lock
+    _client = None
+    _lock = threading.Lock()
+    _async_clients.clear()
+
+atexit.register(close_http_client)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,161 @@
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+
+__all__ = ['JobWorker']
+
+
+class JobWorker(ABC):
+    """
+    Runs jobs stored in the database off the request path.
+
+    A poller thread claims due rows of `model` (which needs run_after,
+    claimed_until, attempts and last_error columns) with a lease and hands
+    them to a bounded thread pool. Subclasses implement _process(job_id) and
+    call _retry_later() when a job fails; it is retried with jittered
+    exponential backoff until max_attempts. Jobs live in the database, so
+    anything left over when a process stops is picked up again once its lease
+    expires.
+
+    Subclasses set `model`, `name` (thread names and log messages), `logger`
+    and `config_prefix`, under which start() reads the <PREFIX>_WORKERS,
+    <PREFIX>_JOB_MAX_ATTEMPTS and <PREFIX>_JOB_POLL_SECONDS settings.
+    """
+
+    model = None
+    name = 'job'
+    logger = logging.getLogger('counsel_windsurf.job_worker')
+    config_prefix = None
+
+    def __init__(self, workers: int = 1, max_attempts: int = 5, poll_interval: float = 5.0,
+                 base_delay: float = 2.0, max_delay: float = 600.0, lease_seconds: int = 120):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = timedelta(seconds=lease_seconds)
+        self.app = None
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        """Ask the poller to look for due jobs now rather than at its next interval."""
+        self._wake.set()
+
+    def _configure(self, config):
+        """Read the worker's settings from the application config."""
+        if self.config_prefix:
+            self.workers = config.get(f'{self.config_prefix}_WORKERS', self.workers)
+            self.max_attempts = config.get(f'{self.config_prefix}_JOB_MAX_ATTEMPTS', self.max_attempts)
+            self.poll_interval = config.get(f'{self.config_prefix}_JOB_POLL_SECONDS', self.poll_interval)
+
+    def start(self, app):
+        """Start the poller and worker pool for the given application (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.app = app
+            self._configure(app.config)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'{self.name}-worker')
+            self._thread = threading.Thread(target=self._poll_loop, name=f'{self.name}-poller', daemon=True)
+            self._thread.start()
+        self.logger.info(f"Started {self.name} worker with {self.workers} threads")
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _poll_loop(self):
+        while not self._stopping.is_set():
+            claimed = 0
+            try:
+                claimed = self._claim_due_jobs()
+            except Exception as e:
+                self.logger.error(f"Error polling {self.name} jobs: {str(e)}", exc_info=True)
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim_due_jobs(self) -> int:
+        """Lease as many due jobs as there are idle workers and submit them. Returns the number claimed."""
+        with self._lock:
+            capacity = self.workers - self._in_flight
+        if capacity <= 0:
+            return 0
+
+        model = self.model
+        with self.app.app_context():
+            now = datetime.utcnow()
+            available = (model.claimed_until.is_(None)) | (model.claimed_until < now)
+            candidates = db.session.query(model.id).filter(
+                model.run_after <= now, available
+            ).order_by(model.run_after).limit(capacity).all()
+
+            claimed = []
+            for (job_id,) in candidates:
+                # The conditional update makes the claim atomic across worker processes
+                updated = model.query.filter(model.id == job_id, available).update(
+                    {model.claimed_until: now + self.lease}, synchronize_session=False
+                )
+                if updated:
+                    claimed.append(job_id)
+            db.session.commit()
+            db.session.remove()
+
+        for job_id in claimed:
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._run_job, job_id)
+        return len(claimed)
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+    def _run_job(self, job_id: int):
+        try:
+            with self.app.app_context():
+                try:
+                    self._process(job_id)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            self.logger.error(f"Unexpected error in {self.name} job {job_id}: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _retry_later(self, job, error: str, description: str):
+        """
+        Record a failed attempt of a claimed job: back off, or delete it after max_attempts.
+
+        The caller commits. description names the work in log messages, e.g.
+        "embedding for direction 3".
+        """
+        job.attempts += 1
+        job.claimed_until = None
+        job.last_error = error
+        if job.attempts >= self.max_attempts:
+            self.logger.error(f"Giving up on {description} after {job.attempts} attempts")
+            db.session.delete(job)
+        else:
+            job.run_after = datetime.utcnow() + self._backoff(job.attempts)
+            self.logger.warning(f"{description[:1].upper()}{description[1:]} failed (attempt {job.attempts}), "
+                                f"retrying after {job.run_after:%H:%M:%S}")
+
+    @abstractmethod
+    def _process(self, job_id: int):
+        """Run one claimed job inside an application context."""
+        pass
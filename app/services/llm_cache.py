@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Optional
+from app.services.cache import TieredCache
+from app.utils.paths import instance_path
+
+__all__ = ['LLMCache', 'create_llm_cache', 'get_llm_cache']
+
+logger = logging.getLogger('counsel_windsurf.llm_cache')
+
+# Bump to discard every stored response, e.g. after changing how responses are post-processed
+CACHE_VERSION = 'llm-v1'
+# Request fields that determine the response; anything else (e.g. stream) does not change it
+KEY_FIELDS = ('model', 'messages', 'temperature', 'max_tokens')
+
+
+class LLMCache:
+    """
+    Exact-match cache of chat completions keyed on the request that produced them.
+
+    The key is sha256 over the model, messages, temperature and max_tokens of
+    the request, so any change to the prompt or the sampling settings misses.
+    The hit rate is logged every LOG_EVERY lookups and reported by stats().
+    """
+
+    LOG_EVERY = 100
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400, max_items: int = 1024,
+                 max_disk_items: Optional[int] = 50000):
+        self.store = TieredCache(path, version=CACHE_VERSION, max_items=max_items,
+                                 ttl=ttl, max_disk_items=max_disk_items)
+        self._lookups = 0
+        self._lock = threading.Lock()
+        logger.info(f"Initialized LLM response cache at {path} (ttl={ttl}s)")
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        request = {field: payload.get(field) for field in KEY_FIELDS}
+        encoded = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, payload: dict, count_miss: bool = True) -> Optional[str]:
+        """Return the cached response content for a request, or None."""
+        value = self.store.get(self.key(payload), count_miss=count_miss)
+        if value is None and not count_miss:
+            return None
+        with self._lock:
+            self._lookups += 1
+            report = self._lookups % self.LOG_EVERY == 0
+        if report:
+            stats = self.stats()
+            logger.info(f"📊 LLM cache hit rate {stats['hit_rate']:.1%} over {self._lookups} lookups "
+                        f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses)")
+        if value is not None:
+            logger.debug("LLM response served from cache")
+            return value.decode('utf-8')
+        return None
+
+    def set(self, payload: dict, content: str):
+        self.store.set(self.key(payload), content.encode('utf-8'))
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+def create_llm_cache() -> Optional[LLMCache]:
+    """
+    Create an LLMCache from LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_ITEMS and LLM_CACHE_MAX_DISK_ITEMS.
+
+    Returns None when LLM_CACHE_ENABLED is false.
+    """
+    if os.getenv('LLM_CACHE_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        logger.info("LLM response cache disabled")
+        return None
+    path = os.getenv('LLM_CACHE_PATH') or instance_path('llm_cache.sqlite3')
+    return LLMCache(
+        path,
+        ttl=float(os.getenv('LLM_CACHE_TTL', '86400')),
+        max_items=int(os.getenv('LLM_CACHE_ITEMS', '1024')),
+        max_disk_items=int(os.getenv('LLM_CACHE_MAX_DISK_ITEMS', '50000'))
+    )
+
+_cache = None
+_cache_created = False
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Return the process-wide LLMCache shared by every chat service, creating it on first use."""
+    global _cache, _cache_created
+    with _cache_lock:
+        if not _cache_created:
+            _cache = create_llm_cache()
+            _cache_created = True
+        return _cache
@@ -0,0 +1,117 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+
+__all__ = ['DIALOGUE', 'PROFILE', 'SUMMARY', 'CONTEXT_SUMMARY', 'TaskProfile', 'ModelRouter',
+           'create_model_router', 'get_model_router']
+
+logger = logging.getLogger('counsel_windsurf.model_routing')
+
+DEFAULT_MODEL = "mixtral-8x7b-32768"
+DEFAULT_FAST_MODEL = "llama-3.1-8b-instant"
+
+# Tasks a chat service sends to Groq
+DIALOGUE = 'dialogue'  # The counselling conversation
+PROFILE = 'profile'  # Profile refresh after new directions or references
+SUMMARY = 'summary'  # Five-word titles of confirmed directions and references
+CONTEXT_SUMMARY = 'context_summary'  # Rolling summary of turns that left the context window
+
+# task: (tier, max_tokens, temperature); a max_tokens of None is left to the caller
+TASK_DEFAULTS = {
+    DIALOGUE: ('large', 1024, 0.7),
+    PROFILE: ('large', 1024, 0.7),  # The fast tier is opt-in: GROQ_PROFILE_MODEL=fast
+    SUMMARY: ('fast', 16, 0.3),
+    CONTEXT_SUMMARY: ('fast', None, 0.0),  # Sized by the context window (CONTEXT_SUMMARY_TOKENS)
+}
+
+
+class TaskProfile:
+    """The model and sampling settings one kind of request is sent with."""
+
+    def __init__(self, task: str, model: str, max_tokens: Optional[int], temperature: float):
+        self.task = task
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    def payload(self, messages: List[dict], max_tokens: Optional[int] = None) -> dict:
+        """Chat-completions request body for messages (max_tokens fills in an unset limit)."""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens if self.max_tokens is not None else max_tokens
+        }
+
+    def __repr__(self):
+        return f"TaskProfile({self.task!r}, {self.model!r}, max_tokens={self.max_tokens}, temperature={self.temperature})"
+
+
+class ModelRouter:
+    """
+    Maps each task to a TaskProfile.
+
+    Titles and rolling summaries are short, well-specified generations that a
+    small model answers at a fraction of the latency and quota. The dialogue
+    and profile refreshes, which users read as written, stay on the large
+    model unless configured otherwise.
+    """
+
+    def __init__(self, profiles: Dict[str, TaskProfile]):
+        self.profiles = profiles
+
+    def profile(self, task: str) -> TaskProfile:
+        try:
+            return self.profiles[task]
+        except KeyError:
+            raise ValueError(f"Unknown chat task: {task}")
+
+    @property
+    def models(self) -> List[str]:
+        """Distinct models used by any task, dialogue model first."""
+        models = [self.profiles[DIALOGUE].model]
+        for profile in self.profiles.values():
+            if profile.model not in models:
+                models.append(profile.model)
+        return models
+
+def create_model_router() -> ModelRouter:
+    """
+    Create a ModelRouter from the environment.
+
+    GROQ_MODEL and GROQ_FAST_MODEL name the large and fast tiers. Each task
+    can be changed with GROQ_<TASK>_MODEL (a tier name, 'large' or 'fast', or a
+    model id), GROQ_<TASK>_MAX_TOKENS and GROQ_<TASK>_TEMPERATURE, e.g.
+    GROQ_PROFILE_MODEL=fast. Setting GROQ_FAST_MODEL to GROQ_MODEL sends
+    everything to the large model.
+    """
+    tiers = {
+        'large': os.getenv('GROQ_MODEL', DEFAULT_MODEL),
+        'fast': os.getenv('GROQ_FAST_MODEL', DEFAULT_FAST_MODEL),
+    }
+    profiles = {}
+    for task, (tier, max_tokens, temperature) in TASK_DEFAULTS.items():
+        prefix = f"GROQ_{task.upper()}_"
+        model = os.getenv(prefix + 'MODEL', tier)
+        max_tokens = os.getenv(prefix + 'MAX_TOKENS', max_tokens)
+        profiles[task] = TaskProfile(
+            task,
+            tiers.get(model, model),
+            int(max_tokens) if max_tokens is not None else None,
+            float(os.getenv(prefix + 'TEMPERATURE', temperature))
+        )
+    router = ModelRouter(profiles)
+    logger.info("🧭 Model routes: " + ", ".join(f"{task} → {profile.model}" for task, profile in profiles.items()))
+    return router
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide ModelRouter, creating it on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = create_model_router()
+        return _router
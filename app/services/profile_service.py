@@ -1,40 +1,110 @@
+import os
 import logging
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 from app import db
-from app.models import User, Direction, Reference, UserProfile
+from app.models import User, Direction, Reference, UserProfile, ContentChange
 from app.services.chat_service import create_chat_service
+from app.services.context_window import estimate_tokens
+from app.services.resilience import RateLimitError, UpstreamUnavailableError
 
 logger = logging.getLogger('counsel_windsurf.profile_service')
 
+MIN_ITEM_TOKENS = 8  # Lower bound of one listed item, which bounds the rows a prompt can use
+KIND_LABELS = {'direction': 'growth direction', 'reference': 'reference'}
+PROFILE_ASPECTS = (
+    "\n1. Their main areas of growth and interest"
+    "\n2. Key patterns or themes in their journey"
+    "\n3. What seems to motivate or inspire them"
+    "\nMake it personal and encouraging, but keep it under 200 words."
+)
+
 class ProfileService:
-    def __init__(self):
+    """
+    Generates user profiles, incrementally where possible.
+
+    A regeneration normally sends the previous profile plus the ContentChange
+    log since it, so its prompt does not grow with the account. The profile is
+    rebuilt from the user's current directions and references instead every
+    rebuild_every updates, to correct drift, and whenever there is no
+    incremental profile to update or the changes do not fit prompt_tokens.
+    Both prompts stay under prompt_tokens; a rebuild keeps the newest items.
+    """
+    
+    def __init__(self, prompt_tokens: int = 1500, item_chars: int = 400, rebuild_every: int = 10):
         self.chat_service = create_chat_service("profile")
+        self.prompt_tokens = prompt_tokens
+        self.item_chars = item_chars
+        self.rebuild_every = rebuild_every
         logger.info("🧑‍🤝‍🧑 Initialized Profile Service")
     
+    def _item(self, title, description=None):
+        """One item of a prompt, its description shortened to item_chars."""
+        title = title or "Untitled"
+        description = (description or '').strip()
+        if len(description) > self.item_chars:
+            description = description[:self.item_chars].rsplit(' ', 1)[0] + "..."
+        return f"{title}: {description}" if description else title
+    
     def _generate_profile_prompt(self, user):
-        """Generate a prompt for the LLM based on user's directions and references."""
-        directions = Direction.query.filter_by(author=user).order_by(Direction.timestamp.desc()).all()
-        references = Reference.query.filter_by(author=user).order_by(Reference.timestamp.desc()).all()
-        
-        prompt = f"Create a concise profile summary for a person based on their growth directions and references. Here's their data:\n\n"
+        """Generate a prompt for the LLM from the user's latest directions and references, newest first."""
+        header = "Create a concise profile summary for a person based on their growth directions and references. Here's their data:\n\n"
+        footer = "\nBased on this information, provide a concise profile summary that captures:" + PROFILE_ASPECTS
+        budget = self.prompt_tokens - estimate_tokens(header + footer)
+        limit = max(budget // MIN_ITEM_TOKENS, 1)
         
-        if directions:
-            prompt += "Growth Directions:\n"
-            for direction in directions:
-                prompt += f"- {direction.title}: {direction.description}\n"
+        columns = ('title', 'description', 'timestamp')
+        directions = Direction.query.options(load_only(*columns)).filter_by(user_id=user.id, is_latest=True)\
+            .order_by(Direction.timestamp.desc()).limit(limit).all()
+        references = Reference.query.options(load_only(*columns)).filter_by(user_id=user.id)\
+            .order_by(Reference.timestamp.desc()).limit(limit).all()
         
-        if references:
-            prompt += "\nReferences:\n"
-            for reference in references:
-                prompt += f"- {reference.title}: {reference.description}\n"
+        # Spend the budget on the newest items of either kind
+        lines = {Direction: [], Reference: []}
+        for item in sorted(directions + references, key=lambda item: item.timestamp, reverse=True):
+            line = f"- {self._item(item.title, item.description)}\n"
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            lines[type(item)].append(line)
         
-        prompt += "\nBased on this information, provide a concise profile summary that captures:"
-        prompt += "\n1. Their main areas of growth and interest"
-        prompt += "\n2. Key patterns or themes in their journey"
-        prompt += "\n3. What seems to motivate or inspire them"
-        prompt += "\nMake it personal and encouraging, but keep it under 200 words."
+        prompt = header
+        if lines[Direction]:
+            prompt += "Growth Directions:\n" + ''.join(lines[Direction])
+        if lines[Reference]:
+            prompt += "\nReferences:\n" + ''.join(lines[Reference])
+        return prompt + footer
+    
+    def _update_prompt(self, previous, changes):
+        """Prompt updating the previous profile with the logged changes, or None if they do not fit the budget."""
+        prompt = "Here is the profile summary of a person, based on their growth directions and references:\n\n"
+        prompt += f"{previous.description}\n\nSince then they made these changes:\n"
+        for change in changes:
+            description = None if change.action == 'deleted' else change.description
+            prompt += f"- {change.action.capitalize()} {KIND_LABELS.get(change.kind, change.kind)}: {self._item(change.title, description)}\n"
+        prompt += "\nUpdate the profile to reflect these changes, keeping what still holds and dropping what no longer does."
+        prompt += " It should capture:" + PROFILE_ASPECTS
+        return prompt if estimate_tokens(prompt) <= self.prompt_tokens else None
+    
+    def _build_prompt(self, user, previous):
+        """
+        Choose between an incremental update and a rebuild of the user's profile.
         
-        return prompt
+        Returns:
+            (prompt, updates_since_rebuild of the new profile, id of the last change it covers or None)
+        """
+        last_change_id = db.session.query(func.max(ContentChange.id)).filter(ContentChange.user_id == user.id).scalar()
+        updates = previous.updates_since_rebuild if previous is not None else None
+        # Stale without logged changes means content the log never saw, so rebuild as well
+        if updates is not None and updates < self.rebuild_every and last_change_id is not None:
+            max_changes = self.prompt_tokens // MIN_ITEM_TOKENS
+            changes = ContentChange.query.filter(ContentChange.user_id == user.id, ContentChange.id <= last_change_id)\
+                .order_by(ContentChange.id).limit(max_changes + 1).all()
+            prompt = self._update_prompt(previous, changes) if len(changes) <= max_changes else None
+            if prompt is not None:
+                return prompt, updates + 1, last_change_id
+        return self._generate_profile_prompt(user), 0, last_change_id
     
     def generate_profile(self, user):
         """Generate a new profile for the user based on their directions and references."""
@@ -46,11 +116,16 @@ class ProfileService:
             if existing_profile:
                 # If we have a recent profile and hit rate limit, return existing
                 try:
-                    # Generate the prompt
-                    prompt = self._generate_profile_prompt(user)
+                    # Content the profile is built from; later changes leave it stale
+                    content_version = user.content_version
+                    
+                    # Update the existing profile with the changes since, or rebuild it
+                    prompt, updates_since_rebuild, last_change_id = self._build_prompt(user, existing_profile)
+                    logger.info(f"🧮 {'Updating' if updates_since_rebuild else 'Rebuilding'} profile for user "
+                                f"{user.username} with a ~{estimate_tokens(prompt)} token prompt")
                     
                     # Get response from LLM
-                    response, is_complete, _, _ = self.chat_service.chat(prompt, [])
+                    response, is_complete, _, _ = self.chat_service.chat(prompt, [], use_cache=True, raise_errors=True)
                     
                     if not is_complete:
                         logger.error(f"❌ Failed to generate complete profile for user: {user.username}")
@@ -60,8 +135,14 @@ class ProfileService:
                     profile = UserProfile(
                         author=user,
                         description=response,
-                        timestamp=datetime.utcnow()
+                        timestamp=datetime.utcnow(),
+                        updates_since_rebuild=updates_since_rebuild
                     )
+                    user.record_profile(content_version, profile.timestamp)
+                    if last_change_id is not None:
+                        # The profile now covers these changes
+                        ContentChange.query.filter(ContentChange.user_id == user.id, ContentChange.id <= last_change_id)\
+                            .delete(synchronize_session=False)
                     
                     # Save to database
                     db.session.add(profile)
@@ -70,11 +151,12 @@ class ProfileService:
                     logger.info(f"✅ Successfully generated new profile for user: {user.username}")
                     return profile
                     
-                except Exception as e:
-                    if "rate limit exceeded" in str(e).lower():
-                        logger.warning(f"⚠️ Rate limit hit, using existing profile for user: {user.username}")
-                        return existing_profile
-                    raise
+                except RateLimitError:
+                    logger.warning(f"⚠️ Rate limit hit, using existing profile for user: {user.username}")
+                    return existing_profile
+                except UpstreamUnavailableError as e:
+                    logger.warning(f"⚠️ Groq unavailable ({str(e)}), using existing profile for user: {user.username}")
+                    return existing_profile
             else:
                 # For new users without a profile, use a simple template
                 profile = UserProfile(
@@ -82,6 +164,7 @@ class ProfileService:
                     description="Start your growth journey by adding directions and references. Your profile will be automatically generated as you share more about your aspirations and inspirations.",
                     timestamp=datetime.utcnow()
                 )
+                user.record_profile(user.content_version, profile.timestamp)
                 db.session.add(profile)
                 db.session.commit()
                 return profile
@@ -97,22 +180,18 @@ class ProfileService:
         return UserProfile.query.filter_by(author=user).order_by(UserProfile.timestamp.desc()).first()
     
     def should_update_profile(self, user):
-        """Check if user's profile should be updated based on recent changes."""
-        latest_profile = self.get_latest_profile(user)
-        if not latest_profile:
-            return True
-            
-        # Check if there are any directions or references newer than the latest profile
-        latest_direction = Direction.query.filter_by(author=user).order_by(Direction.timestamp.desc()).first()
-        latest_reference = Reference.query.filter_by(author=user).order_by(Reference.timestamp.desc()).first()
+        """
+        Check if user's profile should be updated based on recent changes.
         
-        if latest_direction and latest_direction.timestamp > latest_profile.timestamp:
-            return True
-        if latest_reference and latest_reference.timestamp > latest_profile.timestamp:
-            return True
-            
-        return False
+        Compares the user's maintained watermarks, so it needs no queries and
+        also notices edits and deletions.
+        """
+        return user.profile_is_stale
 
 def create_profile_service():
-    """Create and return an instance of ProfileService."""
-    return ProfileService()
+    """Create a ProfileService from PROFILE_PROMPT_TOKENS, PROFILE_ITEM_CHARS and PROFILE_REBUILD_EVERY."""
+    return ProfileService(
+        prompt_tokens=int(os.getenv('PROFILE_PROMPT_TOKENS', '1500')),
+        item_chars=int(os.getenv('PROFILE_ITEM_CHARS', '400')),
+        rebuild_every=int(os.getenv('PROFILE_REBUILD_EVERY', '10'))
+    )
@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import ProfileJob, User
+from app.services.job_worker import JobWorker
+
+__all__ = ['ProfileWorker']
+
+logger = logging.getLogger('counsel_windsurf.profile_worker')
+
+
+class ProfileWorker(JobWorker):
+    """
+    Regenerates user profiles off the request path.
+
+    Routes call schedule() when a user's content_version has moved past their
+    profile. Each user has at most one ProfileJob row, so at most one
+    regeneration per user is queued or in flight. Every request pushes the
+    job's run_after back by the debounce delay, capped at max_debounce after
+    the first request of the burst, so a series of confirmations leads to one
+    regeneration. Runs that leave the profile stale without new changes are
+    retried with backoff.
+    """
+
+    model = ProfileJob
+    name = 'profile'
+    logger = logger
+    config_prefix = 'PROFILE'
+
+    def __init__(self, profile_service, workers: int = 1, debounce_seconds: float = 10.0,
+                 max_debounce_seconds: float = 60.0, max_attempts: int = 5, poll_interval: float = 5.0,
+                 base_delay: float = 30.0, max_delay: float = 900.0, lease_seconds: int = 300):
+        super().__init__(workers=workers, max_attempts=max_attempts, poll_interval=poll_interval,
+                         base_delay=base_delay, max_delay=max_delay, lease_seconds=lease_seconds)
+        self.profile_service = profile_service
+        self.debounce = timedelta(seconds=debounce_seconds)
+        self.max_debounce = timedelta(seconds=max_debounce_seconds)
+
+    def schedule(self, user_id: int, debounce: bool = True):
+        """
+        Ask for the user's profile to be regenerated once their changes settle.
+
+        With debounce=False (someone is looking at the profile) the job is due
+        now instead, unless it is backing off after failed runs. Runs in its
+        own transaction, so call it after committing the change. A change
+        missed here (e.g. the process stopped first) is picked up the next time
+        the profile page sees the stale watermark.
+        """
+        for _ in range(2):
+            now = datetime.utcnow()
+            due = now + self.debounce if debounce else now
+            job = ProfileJob.query.filter_by(user_id=user_id).first()
+            if job is None:
+                db.session.add(ProfileJob(user_id=user_id, attempts=0, run_after=due, requested_at=now))
+            elif debounce:
+                if job.attempts:
+                    # A new change supersedes the backoff of a failed run
+                    job.attempts = 0
+                    job.requested_at = now
+                job.run_after = min(due, job.requested_at + self.max_debounce)
+            elif not job.attempts:
+                job.run_after = min(due, job.run_after)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                # Another request created the user's job first; update that one instead
+                db.session.rollback()
+        else:
+            logger.warning(f"Could not schedule a profile refresh for user {user_id}")
+            return
+        if not debounce:
+            self.wake()
+
+    def _configure(self, config):
+        super()._configure(config)
+        self.debounce = timedelta(seconds=config.get('PROFILE_DEBOUNCE_SECONDS', self.debounce.total_seconds()))
+        self.max_debounce = timedelta(seconds=config.get('PROFILE_MAX_DEBOUNCE_SECONDS',
+                                                         self.max_debounce.total_seconds()))
+
+    def _process(self, job_id: int):
+        job = db.session.get(ProfileJob, job_id)
+        if job is None:
+            return
+        user = db.session.get(User, job.user_id)
+        if user is None or not user.profile_is_stale:
+            # Deleted meanwhile, or already refreshed
+            db.session.delete(job)
+            db.session.commit()
+            return
+
+        content_version = user.content_version
+        self.profile_service.generate_profile(user)
+
+        # generate_profile commits or rolls back, so these are reloaded
+        job = db.session.get(ProfileJob, job_id)
+        if job is None:
+            return
+        if not user.profile_is_stale:
+            db.session.delete(job)
+            logger.info(f"Refreshed profile of user {user.id} after {job.attempts + 1} attempt(s)")
+        elif user.content_version != content_version:
+            # Changed while generating; the changes since then start a new burst
+            now = datetime.utcnow()
+            job.claimed_until = None
+            job.attempts = 0
+            job.requested_at = now
+            job.run_after = now + self.debounce
+        else:
+            self._retry_later(job, "Profile generation did not produce a new profile",
+                              f"profile refresh for user {user.id}")
+        db.session.commit()
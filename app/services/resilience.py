@@ -0,0 +1,382 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+
+__all__ = ['UpstreamError', 'UpstreamUnavailableError', 'RateLimitError', 'CircuitOpenError',
+           'TokenBucket', 'CircuitBreaker', 'ResiliencePolicy', 'get_policy', 'policy_states']
+
+logger = logging.getLogger('counsel_windsurf.resilience')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """An upstream API call failed after the resilience policy gave up on it."""
+
+    def __init__(self, upstream: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class UpstreamUnavailableError(UpstreamError):
+    """The upstream kept failing (5xx, timeouts or connection errors)."""
+
+
+class RateLimitError(UpstreamError):
+    """The call would exceed our quota, locally or as reported by the upstream."""
+
+    def __init__(self, upstream: str, message: str, retry_after: Optional[float] = None,
+                 status_code: Optional[int] = None):
+        super().__init__(upstream, message, status_code)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """The upstream's circuit breaker is open, so the call was not attempted."""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After or rate-limit reset header into seconds.
+
+    Accepts plain seconds ("7"), Go-style durations as Groq sends them
+    ("2m59.56s", "120ms") and HTTP dates.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        scale = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter refilled continuously at `per_minute` units per minute.
+
+    reserve() books capacity ahead of time and returns how long the caller has
+    to wait for it, so concurrent callers queue fairly without holding the lock
+    while they sleep. Requests that would wait longer than max_wait are
+    refused instead, so a burst turns into fast errors rather than a queue.
+    """
+
+    def __init__(self, name: str, per_minute: float, max_wait: float = 5.0):
+        self.name = name
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.max_wait = max_wait
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Book cost units and return the seconds to wait before using them; raise RateLimitError if too long."""
+        cost = min(cost, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max((cost - self._level) / self.rate, self._blocked_until - now, 0.0)
+            if wait > self.max_wait:
+                raise RateLimitError(self.name, f"local {self.name} quota exhausted, retry in {wait:.1f}s",
+                                     retry_after=wait)
+            self._level -= cost
+            return wait
+
+    def refund(self, cost: float = 1.0):
+        """Return booked units that were not used."""
+        with self._lock:
+            self._level = min(self.capacity, self._level + min(cost, self.capacity))
+
+    def pause(self, seconds: float):
+        """Admit nothing for the given time, e.g. until the upstream says our quota resets."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while an upstream is down.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    raise CircuitOpenError without touching the network. After reset_timeout
+    one trial call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            retry_after = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, f"circuit open, retry in {retry_after:.0f}s")
+
+    def release(self):
+        """Give back a half-open trial slot whose call was never made."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"✅ {self.name} circuit closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"⚡ {self.name} circuit opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class ResiliencePolicy:
+    """
+    Retry, rate limiting and circuit breaking for every call to one upstream.
+
+    send() runs a request function under the policy: it waits for the token
+    buckets, fails fast while the circuit is open, and retries 429 and 5xx
+    responses and transport errors with jittered exponential backoff, or after
+    the upstream's Retry-After when it gives one. Responses with other
+    statuses are returned as they are, and other exceptions raised by the
+    request function propagate. The x-ratelimit-* headers Groq sends
+    pause the matching bucket until the quota resets.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, requests: Optional[TokenBucket] = None,
+                 tokens: Optional[TokenBucket] = None, max_retries: int = 2, base_delay: float = 0.5,
+                 max_delay: float = 8.0):
+        self.name = name
+        self.breaker = breaker
+        self.requests = requests
+        self.tokens = tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _admit(self, cost: float) -> float:
+        """Check the circuit and book quota; return the seconds to wait before sending."""
+        self.breaker.allow()
+        wait = 0.0
+        try:
+            if self.requests is not None:
+                wait = self.requests.reserve()
+            if self.tokens is not None and cost:
+                try:
+                    wait = max(wait, self.tokens.reserve(cost))
+                except RateLimitError:
+                    if self.requests is not None:
+                        self.requests.refund()
+                    raise
+            return wait
+        except RateLimitError:
+            # The call never happens, so it must not hold a half-open trial slot
+            self.breaker.release()
+            raise
+
+    def _observe_headers(self, headers: httpx.Headers):
+        for bucket, kind in ((self.requests, 'requests'), (self.tokens, 'tokens')):
+            if bucket is None or headers.get(f'x-ratelimit-remaining-{kind}') != '0':
+                continue
+            reset = parse_duration(headers.get(f'x-ratelimit-reset-{kind}'))
+            if reset:
+                logger.warning(f"⏳ {self.name} {kind} quota used up, pausing for {reset:.1f}s")
+                bucket.pause(reset)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> Optional[float]:
+        """
+        Return the delay before retrying a failed attempt, or None to give up.
+
+        Gives up when retries are exhausted or the upstream asks us to wait
+        longer than max_delay, so callers fail fast instead of hanging.
+        """
+        if attempt >= self.max_retries:
+            return None
+        retry_after = parse_duration(response.headers.get('retry-after')) if response is not None else None
+        if retry_after is None:
+            return self._backoff(attempt)
+        return retry_after if retry_after <= self.max_delay else None
+
+    def _failure(self, response: Optional[httpx.Response], error: Optional[Exception]) -> UpstreamError:
+        if response is not None and response.status_code == 429:
+            retry_after = parse_duration(response.headers.get('retry-after'))
+            return RateLimitError(self.name, "rate limit exceeded", retry_after=retry_after, status_code=429)
+        if response is not None:
+            return UpstreamUnavailableError(self.name, f"status {response.status_code}",
+                                            status_code=response.status_code)
+        return UpstreamUnavailableError(self.name, str(error) or type(error).__name__)
+
+    def _outcome(self, response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+        """Record an attempt with the breaker; return True if it should be retried."""
+        if response is not None:
+            self._observe_headers(response.headers)
+            if response.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return False
+            if response.status_code == 429:
+                # Throttling says nothing about the upstream's health, but other callers should hold off too
+                self.breaker.record_success()
+                retry_after = parse_duration(response.headers.get('retry-after'))
+                if retry_after and self.requests is not None:
+                    self.requests.pause(retry_after)
+                return True
+        self.breaker.record_failure()
+        return True
+
+    def send(self, request: Callable[[], httpx.Response], cost: float = 0) -> httpx.Response:
+        """Run request() under the policy and return its response; raise UpstreamError if it gives up."""
+        attempt = 0
+        while True:
+            wait = self._admit(cost)
+            response, error = None, None
+            try:
+                if wait:
+                    time.sleep(wait)
+                response = request()
+            except httpx.TransportError as e:
+                error = e
+            except Exception:
+                # Not retried, but it must still count against the circuit and free a half-open trial slot
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled or interrupted before the outcome was known
+                self.breaker.release()
+                raise
+            if not self._outcome(response, error):
+                return response
+            if response is not None:
+                response.close()
+            delay = self._retry_delay(attempt, response)
+            if delay is None:
+                raise self._failure(response, error)
+            logger.warning(f"🔁 {self.name} call failed ({response.status_code if response is not None else error}), "
+                           f"retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    async def asend(self, request: Callable[[], Awaitable[httpx.Response]], cost: float = 0) -> httpx.Response:
+        """Async variant of send()."""
+        attempt = 0
+        while True:
+            wait = self._admit(cost)
+            response, error = None, None
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                response = await request()
+            except httpx.TransportError as e:
+                error = e
+            except Exception:
+                # Not retried, but it must still count against the circuit and free a half-open trial slot
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled or interrupted before the outcome was known
+                self.breaker.release()
+                raise
+            if not self._outcome(response, error):
+                return response
+            if response is not None:
+                await response.aclose()
+            delay = self._retry_delay(attempt, response)
+            if delay is None:
+                raise self._failure(response, error)
+            logger.warning(f"🔁 {self.name} call failed ({response.status_code if response is not None else error}), "
+                           f"retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def state(self) -> dict:
+        return {'circuit': self.breaker.state}
+
+
+def _bucket(name: str, variable: str, default: str, max_wait: float) -> Optional[TokenBucket]:
+    per_minute = float(os.getenv(variable, default))
+    return TokenBucket(name, per_minute, max_wait) if per_minute > 0 else None
+
+def _create_policy(name: str) -> ResiliencePolicy:
+    """Build the policy of an upstream from the UPSTREAM_* and per-upstream quota settings."""
+    max_wait = float(os.getenv('RATE_LIMIT_MAX_WAIT', '5'))
+    if name == 'groq':
+        requests = _bucket('groq', 'GROQ_REQUESTS_PER_MINUTE', '30', max_wait)
+        tokens = _bucket('groq', 'GROQ_TOKENS_PER_MINUTE', '6000', max_wait)
+    else:
+        requests = _bucket(name, f'{name.upper()}_REQUESTS_PER_MINUTE', '0', max_wait)
+        tokens = None
+    return ResiliencePolicy(
+        name,
+        CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+        ),
+        requests=requests,
+        tokens=tokens,
+        max_retries=int(os.getenv('UPSTREAM_MAX_RETRIES', '2')),
+        max_delay=float(os.getenv('UPSTREAM_MAX_RETRY_DELAY', '8'))
+    )
+
+_policies: Dict[str, ResiliencePolicy] = {}
+_policies_lock = threading.Lock()
+
+def get_policy(name: str) -> ResiliencePolicy:
+    """Return the process-wide policy of an upstream ('groq', 'huggingface'), creating it on first use."""
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = _policies[name] = _create_policy(name)
+        return policy
+
+def policy_states() -> Dict[str, dict]:
+    """Return the circuit state of every upstream used so far, e.g. for /health."""
+    with _policies_lock:
+        return {name: policy.state() for name, policy in _policies.items()}
@@ -0,0 +1,84 @@
+# Vectorized cosine-similarity kernels. They all expect unit-length float32
+# vectors, so cosine similarity is a dot product and ranking N candidates is
+# one BLAS call. Stored embeddings are normalized once, when they are saved.
+# Matrices may also be held quantized (float16, or int8 codes with per-row
+# scales); they are scored block by block so no full float32 copy is made.
+from typing import Tuple
+import numpy as np
+from app.utils.vectors import normalize
+
+__all__ = ['normalize', 'cosine', 'score_query', 'score_matrix', 'top_k', 'top_k_matrix']
+
+# Rows converted to float32 at a time when scoring a quantized matrix
+QUANTIZED_BLOCK = 1024
+
+def cosine(vector1, vector2) -> float:
+    """Cosine similarity of two arbitrary (not necessarily normalized) vectors."""
+    return float(np.dot(normalize(vector1), normalize(vector2)))
+
+def score_query(query: np.ndarray, matrix: np.ndarray, scales=None) -> np.ndarray:
+    """
+    Score one unit float32 query against every unit row of a matrix.
+
+    Args:
+        query (np.ndarray): Unit-length float32 vector
+        matrix (np.ndarray): float32, float16 or int8 rows
+        scales (np.ndarray): Per-row int8 scales, if the matrix holds int8 codes
+
+    Returns:
+        np.ndarray: (n,) float32 scores
+    """
+    if matrix.dtype == np.float32:
+        scores = matrix @ query
+    else:
+        # numpy has no fast low-precision matmul, so widen one block at a time
+        scores = np.empty(len(matrix), dtype=np.float32)
+        buffer = np.empty((min(len(matrix), QUANTIZED_BLOCK), matrix.shape[1]), dtype=np.float32)
+        for start in range(0, len(matrix), QUANTIZED_BLOCK):
+            block = matrix[start:start + QUANTIZED_BLOCK]
+            np.copyto(buffer[:len(block)], block, casting='unsafe')
+            scores[start:start + len(block)] = buffer[:len(block)] @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+def score_matrix(queries: np.ndarray, matrix: np.ndarray, block_size: int = 4096) -> np.ndarray:
+    """Score every query row against every matrix row in blocks of queries. Returns an (m, n) array."""
+    scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+    for start in range(0, len(queries), block_size):
+        scores[start:start + block_size] = queries[start:start + block_size] @ matrix.T
+    return scores
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k highest scores.
+
+    Returns:
+        tuple: (indices, scores) ordered from best to worst
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return ranked, scores[ranked]
+
+def top_k_matrix(queries: np.ndarray, matrix: np.ndarray, k: int,
+                 block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k matrix rows for every query row without materializing the full score matrix.
+
+    Returns:
+        tuple: (indices, scores), each of shape (m, k), ordered from best to worst
+    """
+    k = min(k, len(matrix))
+    indices = np.empty((len(queries), k), dtype=np.int64)
+    best = np.empty((len(queries), k), dtype=np.float32)
+    for start in range(0, len(queries), block_size):
+        scores = queries[start:start + block_size] @ matrix.T
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        indices[start:start + len(scores)] = np.take_along_axis(candidates, order, axis=1)
+        best[start:start + len(scores)] = np.take_along_axis(candidate_scores, order, axis=1)
+    return indices, best
@@ -0,0 +1,270 @@
+import os
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.utils.paths import instance_path
+
+__all__ = ['SingleFlight', 'get_single_flight']
+
+logger = logging.getLogger('counsel_windsurf.single_flight')
+
+
+class _Call:
+    """An in-process call that followers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls so only one of them reaches the upstream.
+
+    Callers pass a fingerprint of the request. Within a process, the first
+    caller runs the call and later callers with the same key wait for its
+    result (or its exception). Across worker processes, the leader also takes
+    a lease row in a shared SQLite file; a process that finds the lease held
+    polls `recheck` (typically a lookup in the shared on-disk cache the
+    leader writes to) until the result appears, and runs the call itself if
+    the lease is released or expires without one.
+    """
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: float = 30.0, poll_interval: float = 0.05):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {'calls': 0, 'coalesced': 0, 'cross_process': 0}
+        if path is not None:
+            with self._connection() as connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not be shared with a forked child, so key it on the process too
+        connection, pid = getattr(self._local, 'connection', (None, None))
+        if connection is None or pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = (connection, os.getpid())
+        return connection
+
+    # Cross-process leases
+
+    def _acquire(self, key: str) -> Optional[str]:
+        """Take the lease on key; return the owner token, or None if another process holds it."""
+        owner = uuid.uuid4().hex
+        if self.path is None:
+            return owner
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute('DELETE FROM leases WHERE key = ? AND expires_at < ?', (key, now))
+            cursor = connection.execute('INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                                        (key, owner, now + self.lease_seconds))
+            return owner if cursor.rowcount == 1 else None
+
+    def _held(self, key: str) -> bool:
+        row = self._connection().execute('SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?',
+                                         (key, time.time())).fetchone()
+        return row is not None
+
+    def _release(self, key: str, owner: str):
+        if self.path is None:
+            return
+        with self._connection() as connection:
+            connection.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, owner))
+
+    def _lead(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]]):
+        """Run fn once per key across processes; return its result or the other process's via recheck."""
+        while True:
+            owner = self._acquire(key)
+            if owner is not None:
+                break
+            self.counters['cross_process'] += 1
+            delay = self.poll_interval
+            while self._held(key):
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                if recheck is not None:
+                    value = recheck()
+                    if value is not None:
+                        return value
+            # The other process finished (or gave up); use its result if it left one
+            if recheck is not None:
+                value = recheck()
+                if value is not None:
+                    return value
+        try:
+            # Another process may have stored the result between the caller's cache check and the lease
+            if recheck is not None:
+                value = recheck()
+                if value is not None:
+                    return value
+            return fn()
+        finally:
+            self._release(key, owner)
+
+    async def _aacquire(self, key: str) -> Optional[str]:
+        """_acquire in a thread; a lease taken after the caller was cancelled is released again."""
+        if self.path is None:
+            return self._acquire(key)
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self._acquire, key))
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            async def release_abandoned():
+                try:
+                    owner = await acquiring
+                except Exception:
+                    return
+                if owner is not None:
+                    await asyncio.to_thread(self._release, key, owner)
+            asyncio.ensure_future(release_abandoned())
+            raise
+
+    async def _alead(self, key: str, fn: Callable[[], Awaitable[Any]], recheck: Optional[Callable[[], Any]]):
+        """
+        Async variant of _lead.
+
+        The lease file and recheck are SQLite lookups that can wait on another
+        process's lock, so they run in a thread instead of stalling the loop.
+        """
+        while True:
+            owner = await self._aacquire(key)
+            if owner is not None:
+                break
+            self.counters['cross_process'] += 1
+            delay = self.poll_interval
+            while await asyncio.to_thread(self._held, key):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                if recheck is not None:
+                    value = await asyncio.to_thread(recheck)
+                    if value is not None:
+                        return value
+            if recheck is not None:
+                value = await asyncio.to_thread(recheck)
+                if value is not None:
+                    return value
+        try:
+            # Another process may have stored the result between the caller's cache check and the lease
+            if recheck is not None:
+                value = await asyncio.to_thread(recheck)
+                if value is not None:
+                    return value
+            return await fn()
+        finally:
+            if self.path is not None:
+                await asyncio.to_thread(self._release, key, owner)
+
+    # Public API
+
+    def do(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None):
+        """
+        Return fn()'s result, sharing one execution among concurrent callers with the same key.
+
+        Args:
+            key (str): Fingerprint of the request
+            fn (callable): Makes the call
+            recheck (callable): Optional lookup returning the result stored by
+                another process, or None if it is not there yet
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, recheck)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.followers:
+                logger.debug(f"Shared one upstream call with {call.followers} concurrent callers")
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]], recheck: Optional[Callable[[], Any]] = None):
+        """
+        Async variant of do() for coroutines of one event loop; fn returns an awaitable.
+
+        If the leader is cancelled, its followers do not share the cancellation:
+        the first of them to resume becomes the new leader.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        self.counters['calls'] += 1
+        coalesced = False
+        while True:
+            future = self._async_calls.get(loop_key)
+            if future is None:
+                break
+            if not coalesced:
+                coalesced = True
+                self.counters['coalesced'] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # This caller was cancelled, not the leader
+                    raise
+
+        future = self._async_calls[loop_key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._alead(key, fn, recheck)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieve the exception so asyncio does not log it as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[loop_key]
+
+    def stats(self) -> dict:
+        return dict(self.counters)
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """
+    Return the process-wide SingleFlight, creating it on first use.
+
+    Leases live in SINGLE_FLIGHT_PATH (default instance/single_flight.sqlite3);
+    set SINGLE_FLIGHT_CROSS_PROCESS=false to coalesce within each process only.
+    """
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            path = None
+            if os.getenv('SINGLE_FLIGHT_CROSS_PROCESS', 'true').lower() in ('1', 'true', 'yes'):
+                path = os.getenv('SINGLE_FLIGHT_PATH') or instance_path('single_flight.sqlite3')
+            _single_flight = SingleFlight(path, lease_seconds=float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', '30')))
+        return _single_flight
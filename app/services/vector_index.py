@@ -0,0 +1,263 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from app import db
+from app.models import User, Direction, Reference
+from app.services.similarity import normalize, score_query, top_k
+from app.utils.vectors import STORAGE_DTYPES, decode_embedding, dequantize, quantize
+
+__all__ = ['VectorIndex', 'create_vector_index']
+
+logger = logging.getLogger('counsel_windsurf.vector_index')
+
+# Kinds of items held in the index, in the order used for their row codes
+KINDS = {
+    'direction': Direction,
+    'reference': Reference,
+}
+_KIND_NAMES = list(KINDS)
+_KIND_CODES = {kind: code for code, kind in enumerate(_KIND_NAMES)}
+
+def _normalize(vector) -> Optional[np.ndarray]:
+    """Return the vector as unit-length float32, or None if it is zero or not finite."""
+    vector = normalize(np.asarray(vector, dtype=np.float32).ravel())
+    if not np.all(np.isfinite(vector)) or not vector.any():
+        return None
+    return vector
+
+
+class _UserMatrix:
+    """All embeddings of one user stacked into a single pre-normalized matrix."""
+
+    def __init__(self, dim: int, capacity: int = 16, storage: str = 'float32'):
+        self.dim = dim
+        self.version = None  # User.content_version the matrix was loaded at
+        self.pending = 0  # Latest items that had no embedding yet when it was loaded
+        self.loaded_at = time.monotonic()
+        self.size = 0
+        self.storage = storage
+        self.matrix = np.empty((capacity, dim), dtype=STORAGE_DTYPES[storage])
+        self.scales = np.empty(capacity, dtype=np.float32) if storage == 'int8' else None
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.kinds = np.empty(capacity, dtype=np.int8)
+        self.rows = {}  # (kind code, item id) -> row
+
+    @property
+    def nbytes(self) -> int:
+        scale_bytes = self.scales.nbytes if self.scales is not None else 0
+        return self.matrix.nbytes + scale_bytes + self.ids.nbytes + self.kinds.nbytes
+
+    def _grow(self):
+        capacity = self.matrix.shape[0] * 2
+        matrix = np.empty((capacity, self.dim), dtype=self.matrix.dtype)
+        matrix[:self.size] = self.matrix[:self.size]
+        if self.scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:self.size] = self.scales[:self.size]
+            self.scales = scales
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        kinds = np.empty(capacity, dtype=np.int8)
+        kinds[:self.size] = self.kinds[:self.size]
+        self.matrix, self.ids, self.kinds = matrix, ids, kinds
+
+    def add(self, kind_code: int, item_id: int, unit_vector: np.ndarray):
+        key = (kind_code, item_id)
+        row = self.rows.get(key)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.rows[key] = row
+        codes, scale = quantize(unit_vector, self.storage)
+        self.matrix[row] = codes
+        if self.scales is not None:
+            self.scales[row] = scale
+        self.ids[row] = item_id
+        self.kinds[row] = kind_code
+
+    def vector(self, row: int) -> np.ndarray:
+        """Return one row as float32."""
+        return dequantize(self.matrix[row], self.scales[row] if self.scales is not None else None)
+
+    def remove(self, kind_code: int, item_id: int):
+        row = self.rows.pop((kind_code, item_id), None)
+        if row is None:
+            return
+        # Move the last row into the hole so the live rows stay contiguous
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            if self.scales is not None:
+                self.scales[row] = self.scales[last]
+            self.ids[row] = self.ids[last]
+            self.kinds[row] = self.kinds[last]
+            self.rows[(int(self.kinds[row]), int(self.ids[row]))] = row
+        self.size = last
+
+    def top_k(self, query: np.ndarray, k: int, exclude=None) -> List[Tuple[str, int, float]]:
+        if self.size == 0:
+            return []
+        scales = self.scales[:self.size] if self.scales is not None else None
+        scores = score_query(query, self.matrix[:self.size], scales)
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = -np.inf
+        rows, best = top_k(scores, k)
+        return [
+            (_KIND_NAMES[self.kinds[row]], int(self.ids[row]), float(score))
+            for row, score in zip(rows, best)
+            if np.isfinite(score)
+        ]
+
+
+class VectorIndex:
+    """
+    In-memory per-user vector index for top-k cosine queries.
+
+    Each user's Direction and Reference embeddings are loaded lazily into one
+    pre-normalized matrix, so a query is a single matrix-vector product
+    followed by argpartition. The matrix is held in the storage format
+    (float32, float16 or int8 with per-row scales), so quantized storage also
+    fits more users in the memory budget. Users are evicted
+    least-recently-used first once the index grows past its memory budget.
+
+    Every worker process has its own index, so a matrix is reloaded when the
+    user's content_version has moved since it was loaded (an edit or delete
+    served by another process). Embeddings are stored after that bump by
+    whichever process runs the job, so a matrix loaded while some items had
+    no embedding yet is also reloaded once it is pending_ttl seconds old.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, storage: str = 'float32', pending_ttl: float = 5.0):
+        self.max_bytes = max_bytes
+        self.storage = storage
+        self.pending_ttl = pending_ttl
+        self._users = OrderedDict()  # user id -> _UserMatrix
+        self._sizes = {}  # user id -> bytes counted in _bytes (matrices grow in place)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        logger.info(f"Initialized {storage} vector index with a {max_bytes / 1024 / 1024:.0f} MB budget")
+
+    def _load_user(self, user_id: int, version: Optional[int]) -> Optional[_UserMatrix]:
+        """Build the matrix for a user from the stored embeddings."""
+        rows = []
+        pending = 0
+        for kind, model in KINDS.items():
+            query = db.session.query(
+                model.id, model.embedding, model.embedding_dtype, model.embedding_scale
+            ).filter(model.user_id == user_id)
+            if hasattr(model, 'is_latest'):
+                query = query.filter(model.is_latest.is_(True))
+            pending += query.filter(model.embedding.is_(None)).count()
+            rows.extend((kind,) + tuple(row) for row in query.filter(model.embedding.isnot(None)))
+
+        user_matrix = None
+        for kind, item_id, blob, dtype, scale in rows:
+            # Stored float32 embeddings are already unit length, so this does not copy
+            vector = _normalize(dequantize(decode_embedding(blob, dtype), scale))
+            if vector is None:
+                continue
+            if user_matrix is None:
+                user_matrix = _UserMatrix(vector.size, capacity=max(16, len(rows)), storage=self.storage)
+            if vector.size != user_matrix.dim:
+                logger.warning(f"Skipping {kind} {item_id}: dimension {vector.size} != {user_matrix.dim}")
+                continue
+            user_matrix.add(_KIND_CODES[kind], item_id, vector)
+
+        if user_matrix is not None:
+            user_matrix.version = version
+            user_matrix.pending = pending
+        logger.debug(f"Loaded {user_matrix.size if user_matrix else 0} vectors for user {user_id} "
+                     f"({pending} not embedded yet)")
+        return user_matrix
+
+    def _account(self, user_id: int, user_matrix: Optional[_UserMatrix]):
+        """Record a user's matrix, mark it most recently used and enforce the budget."""
+        self._users.pop(user_id, None)
+        self._bytes -= self._sizes.pop(user_id, 0)
+        if user_matrix is None:
+            return
+        self._users[user_id] = user_matrix
+        self._sizes[user_id] = user_matrix.nbytes
+        self._bytes += user_matrix.nbytes
+        while self._bytes > self.max_bytes and len(self._users) > 1:
+            evicted_id, _ = self._users.popitem(last=False)
+            self._bytes -= self._sizes.pop(evicted_id)
+            logger.debug(f"Evicted vectors of user {evicted_id} from the index")
+
+    def _is_current(self, user_matrix: _UserMatrix, version: Optional[int]) -> bool:
+        if user_matrix.version != version:
+            return False
+        return not user_matrix.pending or time.monotonic() - user_matrix.loaded_at < self.pending_ttl
+
+    def _get_user(self, user_id: int) -> Optional[_UserMatrix]:
+        version = db.session.query(User.content_version).filter(User.id == user_id).scalar()
+        user_matrix = self._users.get(user_id)
+        if user_matrix is None or not self._is_current(user_matrix, version):
+            user_matrix = self._load_user(user_id, version)
+        self._account(user_id, user_matrix)
+        return user_matrix
+
+    def add(self, user_id: int, kind: str, item_id: int, embedding):
+        """Insert or replace an item's vector if the user is currently loaded."""
+        vector = _normalize(embedding) if embedding is not None else None
+        with self._lock:
+            user_matrix = self._users.get(user_id)
+            if user_matrix is None:
+                # Not resident; the next query loads it from the database
+                return
+            if vector is None or vector.size != user_matrix.dim:
+                user_matrix.remove(_KIND_CODES[kind], item_id)
+                return
+            if (_KIND_CODES[kind], item_id) not in user_matrix.rows and user_matrix.pending:
+                user_matrix.pending -= 1
+            user_matrix.add(_KIND_CODES[kind], item_id, vector)
+            self._account(user_id, user_matrix)
+
+    def remove(self, user_id: int, kind: str, item_id: int):
+        """Drop an item's vector from the index."""
+        with self._lock:
+            user_matrix = self._users.get(user_id)
+            if user_matrix is not None:
+                user_matrix.remove(_KIND_CODES[kind], item_id)
+
+    def search(self, user_id: int, embedding, k: int = 5, exclude=None) -> List[Tuple[str, int, float]]:
+        """Return the user's k items most similar to the embedding as (kind, id, score)."""
+        query = _normalize(embedding)
+        if query is None:
+            return []
+        exclude_key = (_KIND_CODES[exclude[0]], exclude[1]) if exclude else None
+        with self._lock:
+            user_matrix = self._get_user(user_id)
+            if user_matrix is None or user_matrix.dim != query.size:
+                return []
+            return user_matrix.top_k(query, k, exclude=exclude_key)
+
+    def similar(self, user_id: int, kind: str, item_id: int, k: int = 5) -> List[Tuple[str, int, float]]:
+        """Return the k items of the user most similar to one of their items."""
+        with self._lock:
+            user_matrix = self._get_user(user_id)
+            if user_matrix is None:
+                return []
+            row = user_matrix.rows.get((_KIND_CODES[kind], item_id))
+            if row is None:
+                return []
+            query = _normalize(user_matrix.vector(row))
+            if query is None:
+                return []
+            return user_matrix.top_k(query, k, exclude=(_KIND_CODES[kind], item_id))
+
+    def stats(self) -> dict:
+        """Return the number of resident users and the bytes they occupy."""
+        with self._lock:
+            return {'users': len(self._users), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+def create_vector_index():
+    """Create and return a VectorIndex sized from VECTOR_INDEX_MAX_MB, in the EMBEDDING_STORAGE format."""
+    max_mb = float(os.getenv('VECTOR_INDEX_MAX_MB', '64'))
+    return VectorIndex(max_bytes=int(max_mb * 1024 * 1024), storage=os.getenv('EMBEDDING_STORAGE', 'float32'))
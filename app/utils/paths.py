@@ -0,0 +1,17 @@
+import os
+
+BASEDIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def instance_path(*parts: str) -> str:
+    """
+    Return a path inside the application's instance folder, creating its parent directory.
+
+    Args:
+        *parts (str): Path components relative to the instance folder
+
+    Returns:
+        str: The absolute path
+    """
+    path = os.path.join(BASEDIR, 'instance', *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,101 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# Embeddings are persisted as raw little-endian float32 so they can be read
+# back without parsing and without depending on the host byte order.
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+# Storage formats for persisted embeddings. float16 halves the size; int8
+# quarters it and needs a per-vector scale to map the codes back to floats.
+STORAGE_DTYPES = {
+    'float32': EMBEDDING_DTYPE,
+    'float16': np.dtype('<f2'),
+    'int8': np.dtype('i1'),
+}
+INT8_MAX = 127
+
+def encode_embedding(embedding_array) -> bytes:
+    """
+    Serialize an embedding to a compact binary blob.
+
+    Args:
+        embedding_array: Any array-like of floats (1-D)
+
+    Returns:
+        bytes: The vector as little-endian float32
+    """
+    vector = np.asarray(embedding_array, dtype=EMBEDDING_DTYPE).ravel()
+    return vector.tobytes()
+
+def decode_embedding(blob: bytes, storage: Optional[str] = None) -> np.ndarray:
+    """
+    Deserialize a blob produced by encode_embedding or quantize_embedding.
+
+    The returned array is a zero-copy, read-only view over the blob in its
+    storage dtype; use dequantize to turn int8 codes back into floats.
+
+    Args:
+        blob (bytes): The stored embedding
+        storage (str): Storage format of the blob (float32 when None)
+
+    Returns:
+        np.ndarray: A 1-D array of the storage dtype
+    """
+    return np.frombuffer(blob, dtype=STORAGE_DTYPES[storage or 'float32'])
+
+def embedding_dimension(blob: bytes, storage: Optional[str] = None) -> int:
+    """Return the number of components stored in an embedding blob."""
+    return len(blob) // STORAGE_DTYPES[storage or 'float32'].itemsize
+
+def quantize(vectors, storage: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert a vector, or every row of a matrix, to a storage format.
+
+    int8 uses symmetric per-vector scaling: each row is divided by
+    max(|x|) / 127 and rounded, so its largest component maps to +/-127.
+
+    Args:
+        vectors: A 1-D vector or 2-D matrix of floats
+        storage (str): One of STORAGE_DTYPES
+
+    Returns:
+        tuple: (codes, scales); scales is None except for int8, where it holds
+            one float32 per row (a 0-d array for a single vector)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if storage != 'int8':
+        return vectors.astype(STORAGE_DTYPES[storage], copy=False), None
+    scales = (np.abs(vectors).max(axis=-1) / INT8_MAX).astype(np.float32)
+    scaled = np.divide(vectors, scales[..., None], out=np.zeros_like(vectors), where=scales[..., None] > 0)
+    return np.rint(scaled).astype(np.int8), scales
+
+def dequantize(codes: np.ndarray, scales=None) -> np.ndarray:
+    """Return quantized codes as float32, applying the int8 scales when given."""
+    vectors = np.asarray(codes).astype(np.float32, copy=False)
+    if scales is not None:
+        vectors = vectors * np.asarray(scales, dtype=np.float32)[..., None]
+    return vectors
+
+def quantize_embedding(embedding_array, storage: str = 'float32') -> Tuple[bytes, Optional[float]]:
+    """
+    Serialize an embedding in the given storage format.
+
+    Returns:
+        tuple: (blob, scale); scale is None unless storage is int8
+    """
+    codes, scale = quantize(np.asarray(embedding_array).ravel(), storage)
+    blob = codes.astype(STORAGE_DTYPES[storage], copy=False).tobytes()
+    return blob, float(scale) if scale is not None else None
+
+def normalize(vectors) -> np.ndarray:
+    """
+    Scale a vector, or every row of a matrix, to unit length as float32.
+
+    Zero vectors are left as zeros. Input that is already unit-length float32
+    is returned without copying.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    if np.allclose(norms, 1.0, atol=1e-4):
+        return vectors
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
@@ -0,0 +1,11 @@
+import os
+from dotenv import load_dotenv
+from app import create_app
+from app.asgi import create_asgi_app
+
+# Get absolute path to .env file
+env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(dotenv_path=env_path, override=True)
+
+# ASGI entry point, e.g. `uvicorn asgi:app --workers 2`
+app = create_asgi_app(create_app())
@@ -0,0 +1,84 @@
+"""Measure recall@10 and query latency of the IVF ANN index against exact search.
+
+Vectors are drawn from a synthetic clustered corpus (a Gaussian mixture of
+unit vectors), indexed on disk in a temporary directory and queried through
+the memory-mapped files, exactly as the web workers do.
+
+    python benchmarks/ann_index.py --sizes 10000 100000 1000000 --nprobe 8
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tempfile
+import time
+import numpy as np
+
+from app.services.ann_index import IVFIndex
+
+def synthetic_corpus(size, dim, clusters, rng):
+    """Generate unit vectors scattered around random cluster centres."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, 100000):
+        end = min(size, start + 100000)
+        labels = rng.integers(0, clusters, end - start)
+        vectors[start:end] = centres[labels] + 1.5 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def exact_top_k(vectors, queries, k, block=100000):
+    """Brute-force top-k ids for each query, scanning the corpus in blocks."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        scores = queries @ vectors[start:start + block].T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        merged_scores = np.hstack([best_scores, scores])
+        merged_ids = np.hstack([best_ids, ids])
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+    return best_ids
+
+def run(size, dim, queries, k, nprobe, nlist, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = synthetic_corpus(size, dim, clusters=max(16, size // 1000), rng=rng)
+    query_vectors = vectors[rng.choice(size, queries, replace=False)] + \
+        0.03 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        index = IVFIndex.build(path, np.arange(size), vectors, nlist=nlist)
+        build_seconds = time.perf_counter() - start
+
+        truth = exact_top_k(vectors, query_vectors, k)
+        index.search(query_vectors[0], k=k, nprobe=nprobe)  # map the files before timing
+
+        latencies, hits = [], 0
+        for query, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            found = index.search(query, k=k, nprobe=nprobe)
+            latencies.append(time.perf_counter() - start)
+            hits += len({item_id for item_id, _ in found} & set(expected.tolist()))
+
+    latencies = np.array(latencies) * 1000
+    print(f"{size:>10}{build_seconds:>10.1f}{hits / (queries * k):>12.3f}"
+          f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--nlist', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"dim={args.dim} nprobe={args.nprobe} queries={args.queries}")
+    print(f"{'vectors':>10}{'build s':>10}{'recall@' + str(args.k):>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.k, args.nprobe, args.nlist)
@@ -0,0 +1,162 @@
+"""Load test: concurrent streamed conversations with threads versus coroutines.
+
+A stand-in for the Groq endpoint (running in its own process) streams every
+completion as --chunks chunks spaced --interval seconds apart, like a slow
+LLM. For each concurrency level, a fresh process holds that many
+conversations open at once:
+
+- threads: one thread per conversation running the sync chat_stream(), as a
+  threaded WSGI worker does
+- async: one coroutine per conversation running achat_stream() on one event loop
+
+Peak resident memory above the idle baseline is sampled while the
+conversations are in flight. From it the benchmark derives how many
+concurrent conversations fit in --budget-mb.
+
+    python benchmarks/async_chat.py --concurrency 50 200 800 --budget-mb 256
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def _rss_bytes():
+    with open('/proc/self/statm') as handle:
+        return int(handle.read().split()[1]) * PAGE_SIZE
+
+async def _serve_connection(reader, writer, chunks, interval):
+    """Answer keep-alive POSTs with a chunked server-sent event stream."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n')
+            for position in range(chunks):
+                await asyncio.sleep(interval)
+                delta = json.dumps({'choices': [{'delta': {'content': f'word{position} '}}]})
+                event = f"data: {delta}\n\n".encode()
+                writer.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                await writer.drain()
+            done = b"data: [DONE]\n\n"
+            writer.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+def _stand_in_server(port_queue, chunks, interval):
+    async def main():
+        server = await asyncio.start_server(
+            lambda reader, writer: _serve_connection(reader, writer, chunks, interval),
+            '127.0.0.1', 0, backlog=4096
+        )
+        port_queue.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    asyncio.run(main())
+
+def _chat_service(url, concurrency):
+    # The pool must admit every conversation at once so neither mode queues on connections
+    os.environ.setdefault('GROQ_API_KEY', 'gsk_benchmark')
+    os.environ['HTTP_MAX_CONNECTIONS'] = os.environ['HTTP_MAX_KEEPALIVE'] = str(concurrency)
+    os.environ['HTTP_POOL_TIMEOUT'] = '120'
+    os.environ['HTTP2_ENABLED'] = 'false'
+    from app.services.chat_service import create_chat_service
+    service = create_chat_service('growth')
+    service.base_url = url
+    return service
+
+def _measure(mode, concurrency, url, result_queue):
+    """Hold `concurrency` conversations open at once and report time and memory."""
+    service = _chat_service(url, concurrency)
+    baseline = _rss_bytes()
+    peak = [baseline]
+    running = threading.Event()
+    running.set()
+
+    def sample():
+        while running.is_set():
+            peak[0] = max(peak[0], _rss_bytes())
+            time.sleep(0.01)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    completed = []
+    start = time.perf_counter()
+
+    if mode == 'threads':
+        def converse():
+            for event, data in service.chat_stream('hello', []):
+                if event == 'done':
+                    completed.append(data)
+        threads = [threading.Thread(target=converse) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        async def converse():
+            async for event, data in service.achat_stream('hello', []):
+                if event == 'done':
+                    completed.append(data)
+
+        async def main():
+            await asyncio.gather(*(converse() for _ in range(concurrency)))
+        asyncio.run(main())
+
+    elapsed = time.perf_counter() - start
+    running.clear()
+    sampler.join()
+    ok = sum(1 for response, _, full_conversation, _ in completed if full_conversation)
+    result_queue.put({'elapsed': elapsed, 'extra_bytes': peak[0] - baseline, 'ok': ok})
+
+def run(levels, chunks, interval, budget_mb):
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=_stand_in_server, args=(port_queue, chunks, interval), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{port_queue.get()}/openai/v1/chat/completions"
+
+    print(f"Stand-in completion: {chunks} chunks every {interval * 1000:.0f} ms "
+          f"({chunks * interval:.1f} s per reply); memory budget {budget_mb} MB")
+    print(f"{'mode':<9}{'open':>7}{'ok':>7}{'wall s':>9}{'extra MB':>10}{'KB/conv':>9}{'fit in budget':>15}")
+    for concurrency in levels:
+        for mode in ('threads', 'async'):
+            result_queue = context.Queue()
+            worker = context.Process(target=_measure, args=(mode, concurrency, url, result_queue))
+            worker.start()
+            result = result_queue.get()
+            worker.join()
+            per_conversation = max(result['extra_bytes'], 1) / concurrency
+            capacity = int(budget_mb * 1024 * 1024 / per_conversation)
+            print(f"{mode:<9}{concurrency:>7}{result['ok']:>7}{result['elapsed']:>9.2f}"
+                  f"{result['extra_bytes'] / 1024 / 1024:>10.1f}{per_conversation / 1024:>9.0f}{capacity:>15}")
+    server.terminate()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 800])
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1)
+    parser.add_argument('--budget-mb', type=int, default=256)
+    args = parser.parse_args()
+    run(args.concurrency, args.chunks, args.interval, args.budget_mb)
@@ -0,0 +1,130 @@
+"""Home page latency as a user's directions, versions and references pile up.
+
+Seeds one user in a throwaway SQLite database with --directions directions
+(each edited --versions times, so most rows are superseded versions) and
+--references references, all with embeddings and transcripts, then times
+rendering the first and the last page of the home page. For comparison it also
+times loading every row through the User.directions/User.references
+relationships, which is what the page used to do. The query plans of the page
+queries are printed so index use can be checked.
+
+    python benchmarks/dashboard.py --directions 300 --versions 3 --references 300
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+def _median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)) * 1000
+
+def _seed(db, User, Direction, Reference, directions, versions, references, dim):
+    user = User(username='benchmark', email='benchmark@example.com')
+    user.set_password('benchmark-password')
+    db.session.add(user)
+    db.session.flush()
+    rng = np.random.default_rng(0)
+    transcript = "You: I want to grow.\n\nAI Counselor: Tell me more. " * 40
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = []
+    for number in range(directions):
+        for version in range(1, versions + 1):
+            rows.append(dict(
+                title=f"Direction {number} v{version}", description="A growth direction. " * 10,
+                timestamp=start + timedelta(minutes=number * versions + version), user_id=user.id,
+                raw_response=transcript, version=version, is_latest=version == versions,
+                **Direction.embedding_values(rng.standard_normal(dim), model='benchmark', storage='float32')))
+    db.session.bulk_insert_mappings(Direction, rows)
+    db.session.bulk_insert_mappings(Reference, [dict(
+        title=f"Reference {number}", description="Someone who inspires me. " * 10,
+        timestamp=start + timedelta(minutes=number), user_id=user.id, raw_response=transcript,
+        **Reference.embedding_values(rng.standard_normal(dim), model='benchmark', storage='float32'))
+        for number in range(references)])
+    db.session.commit()
+    return user
+
+def run(directions, versions, references, dim, repeats):
+    workdir = tempfile.mkdtemp(prefix='campfire-dashboard-')
+    os.environ.setdefault('GROQ_API_KEY', 'gsk_benchmark')
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'hf_benchmark')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+    os.environ['EMBEDDING_PROVIDER'] = 'hashing'
+    os.environ['EMBEDDING_CACHE_PATH'] = os.path.join(workdir, 'embedding_cache.sqlite3')
+    os.chdir(workdir)  # app.log goes to the working directory
+    from app import create_app, db
+    from app.models import User, Direction, Reference
+    from app.services.dashboard import direction_page, reference_page
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ('counsel_windsurf', 'werkzeug'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        user = _seed(db, User, Direction, Reference, directions, versions, references, dim)
+        user_id = user.id
+        page_size = app.config['DASHBOARD_PAGE_SIZE']
+
+        # Walk to the last page to time the deepest cursor
+        cursors = {'directions': None, 'references': None}
+        for key, page in (('directions', direction_page), ('references', reference_page)):
+            result = page(user_id, None, page_size)
+            while result.next_cursor:
+                cursors[key] = result.next_cursor
+                result = page(user_id, cursors[key], page_size)
+
+        def load_everything():
+            db.session.expire_all()
+            return len(user.directions.all()) + len(user.references.all())
+
+        relationship_ms = _median_ms(load_everything, repeats)
+
+        with db.engine.connect() as connection:
+            for label, sql in (
+                ('directions', "SELECT id FROM direction WHERE user_id = ? AND is_latest = 1 AND (timestamp, id) < (?, ?) "
+                               "ORDER BY timestamp DESC, id DESC LIMIT 21"),
+                ('references', "SELECT id FROM reference WHERE user_id = ? AND (timestamp, id) < (?, ?) "
+                               "ORDER BY timestamp DESC, id DESC LIMIT 21"),
+            ):
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", (user_id, '2100-01-01', 0)).fetchall()
+                print(f"{label} page plan: " + '; '.join(row[-1] for row in plan))
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'benchmark', 'password': 'benchmark-password'})
+    first_ms = _median_ms(lambda: client.get('/index'), repeats)
+    last_ms = _median_ms(lambda: client.get('/index', query_string=cursors), repeats)
+    html = client.get('/index').get_data(as_text=True)
+    shown = len(re.findall(r'View Details', html))
+
+    rows = directions * versions + references
+    print(f"{directions} directions x {versions} versions + {references} references = {rows} rows, "
+          f"page size {page_size} ({shown} items rendered)")
+    print(f"{'measurement':<52}{'median ms':>10}")
+    print(f"{'GET /index, first page':<52}{first_ms:>10.1f}")
+    print(f"{'GET /index, last page':<52}{last_ms:>10.1f}")
+    print(f"{'load all rows via User.directions/references':<52}{relationship_ms:>10.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--directions', type=int, default=300)
+    parser.add_argument('--versions', type=int, default=3)
+    parser.add_argument('--references', type=int, default=300)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    run(args.directions, args.versions, args.references, args.dim, args.repeats)
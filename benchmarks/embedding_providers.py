@@ -0,0 +1,64 @@
+"""Compare per-text latency and batch throughput of the embedding providers.
+
+Each provider is called directly (no cache). Providers that cannot run here,
+for example the HuggingFace API without HUGGINGFACE_API_KEY or the local model
+without sentence-transformers installed, are reported as skipped.
+
+    python benchmarks/embedding_providers.py --texts 256 --batch-size 32
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+
+from app.services.embedding_providers import PROVIDERS
+
+SAMPLE_SENTENCES = [
+    "I want to become a more patient and attentive listener",
+    "Learning to lead a small engineering team with empathy",
+    "My grandmother taught me resilience through hard times",
+    "Building the discipline to run a marathon next spring",
+    "Becoming comfortable speaking in front of large audiences",
+    "I admire how Marie Curie pursued science despite every obstacle",
+]
+
+def corpus(size):
+    return [f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} ({i})" for i in range(size)]
+
+def run(provider_name, texts, batch_size, single_calls):
+    try:
+        provider = PROVIDERS[provider_name]()
+        provider.embed(texts[:1])  # load models / warm connections
+    except Exception as e:
+        print(f"{provider_name:<12}skipped: {e}")
+        return
+
+    latencies = []
+    for text in texts[:single_calls]:
+        start = time.perf_counter()
+        provider.embed([text])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        provider.embed(texts[offset:offset + batch_size])
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1000
+    print(f"{provider_name:<12}{np.percentile(latencies, 50):>12.2f}{np.percentile(latencies, 95):>12.2f}{throughput:>16.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--providers', nargs='+', default=list(PROVIDERS), choices=list(PROVIDERS))
+    parser.add_argument('--texts', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--single-calls', type=int, default=20)
+    args = parser.parse_args()
+
+    texts = corpus(args.texts)
+    print(f"{'provider':<12}{'p50 ms':>12}{'p95 ms':>12}{'texts/sec':>16}")
+    for name in args.providers:
+        run(name, texts, args.batch_size, args.single_calls)
@@ -0,0 +1,65 @@
+"""Measure memory saved and top-10 recall lost by quantized embedding storage.
+
+A synthetic clustered corpus of unit vectors is stored as float32, float16 and
+int8 with per-vector scales. Every query is ranked with the same kernel the
+vector index uses, directly on the quantized matrix, and compared with the
+exact float32 ranking.
+
+    python benchmarks/embedding_quantization.py --rows 100000 --dim 384 --queries 200
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from app.services.similarity import score_query, top_k
+from app.utils.vectors import STORAGE_DTYPES, quantize
+
+def synthetic_corpus(size, dim, clusters, rng):
+    """Generate unit vectors scattered around random cluster centres."""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centres[labels] + 1.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def run(rows, dim, queries, k=10, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = synthetic_corpus(rows, dim, clusters=max(16, rows // 1000), rng=rng)
+    query_vectors = vectors[rng.choice(rows, queries, replace=False)] + \
+        0.03 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    truth = [set(top_k(vectors @ query, k)[0]) for query in query_vectors]
+    json_bytes = np.mean([len(json.dumps(vector.tolist())) for vector in vectors[:1000]])
+    baseline = vectors.nbytes
+
+    print(f"Corpus: {rows} x {dim}, queries: {queries}, recall@{k} against exact float32 search")
+    print(f"JSON text (legacy column): {json_bytes:.0f} bytes/row")
+    print(f"{'format':<10}{'bytes/row':>11}{'matrix MB':>11}{'saved':>8}{'recall':>9}{'ms/query':>10}")
+    for storage in STORAGE_DTYPES:
+        codes, scales = quantize(vectors, storage)
+        nbytes = codes.nbytes + (scales.nbytes if scales is not None else 0)
+
+        hits = 0
+        start = time.perf_counter()
+        for query, expected in zip(query_vectors, truth):
+            found, _ = top_k(score_query(query, codes, scales), k)
+            hits += len(expected.intersection(found))
+        elapsed = (time.perf_counter() - start) / queries
+
+        print(f"{storage:<10}{nbytes / rows:>11.0f}{nbytes / 1024 / 1024:>11.1f}"
+              f"{1 - nbytes / baseline:>8.0%}{hits / (queries * k):>9.4f}{elapsed * 1e3:>10.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+    run(args.rows, args.dim, args.queries, k=args.k)
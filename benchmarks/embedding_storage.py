@@ -0,0 +1,49 @@
+"""Compare JSON text and binary float32 embedding storage.
+
+Reports the on-disk size of a stored vector and the time needed to decode it
+back into a numpy array, for the legacy JSON column and the binary blob.
+
+    python benchmarks/embedding_storage.py --rows 10000 --dim 384
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+import numpy as np
+
+from app.utils.vectors import encode_embedding, decode_embedding
+
+def _time_per_row(fn, payloads):
+    start = time.perf_counter()
+    for payload in payloads:
+        fn(payload)
+    return (time.perf_counter() - start) / len(payloads)
+
+def run(rows, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim))
+
+    json_payloads = [json.dumps(vector.tolist()) for vector in vectors]
+    blob_payloads = [encode_embedding(vector) for vector in vectors]
+
+    json_size = sum(len(payload.encode('utf-8')) for payload in json_payloads) / rows
+    blob_size = sum(len(payload) for payload in blob_payloads) / rows
+
+    json_decode = _time_per_row(lambda payload: np.array(json.loads(payload)), json_payloads)
+    blob_decode = _time_per_row(decode_embedding, blob_payloads)
+
+    print(f"Rows: {rows}, dimension: {dim}")
+    print(f"{'format':<10}{'bytes/row':>12}{'decode us/row':>16}")
+    print(f"{'json':<10}{json_size:>12.0f}{json_decode * 1e6:>16.2f}")
+    print(f"{'float32':<10}{blob_size:>12.0f}{blob_decode * 1e6:>16.2f}")
+    print(f"Size reduction: {json_size / blob_size:.1f}x, decode speedup: {json_decode / blob_decode:.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--dim', type=int, default=384)
+    args = parser.parse_args()
+    run(args.rows, args.dim)
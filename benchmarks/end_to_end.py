@@ -0,0 +1,165 @@
+"""End-to-end latency of the real Flask routes under concurrent simulated users.
+
+The app runs in its own process on werkzeug's threaded server, with a
+throwaway SQLite database and caches, talking to the local Groq/HuggingFace
+stand-ins from benchmarks/stand_ins.py. Each simulated user registers, logs
+in, creates --directions growth directions through the chat (turn after turn
+until the counselor completes the direction), confirms them, and opens the
+index and profile pages, parsing CSRF tokens from the pages like a browser.
+The client-side latency of every request is reported per route as
+p50/p95/p99, along with the time to confirmation: from a direction's first
+chat turn until its confirmation returns.
+
+    python benchmarks/end_to_end.py --users 20 --directions 2 --chat-latency lognormal:400,0.5
+
+To measure the fast model tier, give the fast model its own latency and run
+once more with GROQ_FAST_MODEL=mixtral-8x7b-32768 (every task on the large model):
+
+    python benchmarks/end_to_end.py --chat-latency lognormal:900,0.4 --model-latency llama-3.1-8b-instant=lognormal:150,0.3
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import multiprocessing
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import httpx
+import numpy as np
+
+from benchmarks.stand_ins import add_behaviour_arguments, behaviour_from_args, start as start_stand_ins
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+def _serve_app(workdir, port_queue):
+    """Run the app on a free port (in a child process, configured through the environment)."""
+    os.chdir(workdir)  # app.log goes to the working directory
+    from werkzeug.serving import make_server
+    from app import create_app, db
+    app = create_app()
+    # Request logging to stdout would dominate the measurement
+    for name in ('', 'counsel_windsurf', 'werkzeug'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    app.logger.setLevel(logging.WARNING)
+    with app.app_context():
+        db.create_all()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+class SimulatedUser:
+    """One browser session walking through the main flows and timing each request."""
+
+    def __init__(self, base_url, name, directions, max_turns, timings, errors):
+        self.client = httpx.Client(base_url=base_url, timeout=120)
+        self.name = name
+        self.directions = directions
+        self.max_turns = max_turns
+        self.timings = timings
+        self.errors = errors
+
+    def request(self, label, method, path, **kwargs):
+        start = time.perf_counter()
+        response = self.client.request(method, path, **kwargs)
+        self.timings[label].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def csrf(self, label, path):
+        match = CSRF_TOKEN.search(self.request(label, 'GET', path).text)
+        return match.group(1) if match else ''
+
+    def run(self):
+        password = 'benchmark-password'
+        token = self.csrf('GET /register', '/register')
+        self.request('POST /register', 'POST', '/register', data={
+            'csrf_token': token, 'username': self.name, 'email': f'{self.name}@example.com',
+            'password': password, 'password2': password})
+        token = self.csrf('GET /login', '/login')
+        self.request('POST /login', 'POST', '/login', data={
+            'csrf_token': token, 'username': self.name, 'password': password})
+
+        for number in range(self.directions):
+            token = self.csrf('GET /create_direction', '/create_direction')
+            started = time.perf_counter()
+            for turn in range(self.max_turns):
+                response = self.request('POST /create_direction (chat turn)', 'POST', '/create_direction', data={
+                    'csrf_token': token, 'message': f'{self.name}, direction {number}, thought {turn}: I want to grow.'})
+                if response.status_code == 200 and 'confirm_direction' in response.text:
+                    break
+                token = self.csrf('GET /create_direction', '/create_direction')
+            self.request('POST /confirm_direction', 'POST', '/confirm_direction')
+            self.timings['time to confirmation'].append(time.perf_counter() - started)
+            self.request('GET /index', 'GET', '/index')
+        self.request('GET /profile', 'GET', '/profile')
+        self.client.close()
+
+def _percentiles(samples):
+    milliseconds = np.asarray(samples) * 1000
+    return np.percentile(milliseconds, [50, 95, 99]).tolist() + [milliseconds.max()]
+
+def run(users, directions, max_turns, args):
+    workdir = tempfile.mkdtemp(prefix='campfire-bench-')
+    stand_ins, stand_in_url = start_stand_ins(behaviour_from_args(args))
+    os.environ.update({
+        'GROQ_API_KEY': 'gsk_benchmark',
+        'HUGGINGFACE_API_KEY': 'hf_benchmark',
+        'GROQ_BASE_URL': f'{stand_in_url}/openai/v1',
+        'HUGGINGFACE_BASE_URL': stand_in_url,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'EMBEDDING_CACHE_PATH': os.path.join(workdir, 'embedding_cache.sqlite3'),
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.sqlite3'),
+        'CONTEXT_SUMMARY_PATH': os.path.join(workdir, 'context_summaries.sqlite3'),
+        'SINGLE_FLIGHT_PATH': os.path.join(workdir, 'single_flight.sqlite3'),
+        'ANN_INDEX_DIR': os.path.join(workdir, 'ann'),
+        'EMBEDDING_PROVIDER': 'huggingface',
+    })
+    if not args.keep_quota:
+        # Measure the app rather than our own client-side Groq quota
+        os.environ.update({'GROQ_REQUESTS_PER_MINUTE': '0', 'GROQ_TOKENS_PER_MINUTE': '0'})
+
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=_serve_app, args=(workdir, port_queue), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get(timeout=60)}"
+
+    timings, errors = defaultdict(list), defaultdict(int)
+    simulated = [SimulatedUser(base_url, f'user{number}', directions, max_turns, timings, errors)
+                 for number in range(users)]
+    threads = [threading.Thread(target=user.run) for user in simulated]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for label, samples in timings.items() if label != 'time to confirmation')
+    print(f"{users} users x {directions} directions: {total} requests in {elapsed:.1f} s "
+          f"({total / elapsed:.1f} req/s); stand-ins served {stand_ins.RequestHandlerClass.behaviour.counters}, "
+          f"chat requests per model {stand_ins.RequestHandlerClass.behaviour.models}")
+    print(f"{'route':<38}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for label, samples in timings.items():
+        p50, p95, p99, worst = _percentiles(samples)
+        print(f"{label:<38}{len(samples):>7}{errors[label]:>8}{p50:>9.0f}{p95:>9.0f}{p99:>9.0f}{worst:>9.0f}")
+
+    server.terminate()
+    stand_ins.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--directions', type=int, default=2)
+    parser.add_argument('--max-turns', type=int, default=6, help='Give up on a direction after this many chat turns')
+    parser.add_argument('--keep-quota', action='store_true', help='Keep the client-side Groq token buckets enabled')
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+    run(args.users, args.directions, args.max_turns, args)
@@ -0,0 +1,104 @@
+"""Compare per-call latency of a fresh httpx.Client per request and the shared pool.
+
+A local stand-in for the Groq chat endpoint answers with a canned completion
+over HTTPS (a throwaway self-signed certificate is generated with the openssl
+CLI; pass --plain to use HTTP). The "fresh" mode opens a client per call, as
+the chat service used to, so every call pays the TCP and TLS handshakes; the
+"pooled" mode reuses the process-wide client from app.services.http_client.
+
+    python benchmarks/http_client.py --calls 200
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import numpy as np
+
+from app.services.http_client import close_http_client, get_http_client
+
+COMPLETION = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': 'Tell me more.'}}]}).encode()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this, delayed ACKs add ~40 ms per call
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+def start_server(tls_dir=None):
+    """Start the stand-in server on a free port. Returns (server, base url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    scheme = 'http'
+    if tls_dir:
+        cert, key = os.path.join(tls_dir, 'cert.pem'), os.path.join(tls_dir, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                        '-keyout', key, '-out', cert],
+                       check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        # Both modes trust the throwaway certificate through the standard variable
+        os.environ['SSL_CERT_FILE'] = cert
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+
+def _time_calls(post, url, calls):
+    payload = {'model': 'stand-in', 'messages': [{'role': 'user', 'content': 'hello'}]}
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = post(url, payload)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1e3
+
+def run(calls, plain=False):
+    # The stand-in server only speaks HTTP/1.1
+    os.environ.setdefault('HTTP2_ENABLED', 'false')
+    with tempfile.TemporaryDirectory() as tls_dir:
+        server, url = start_server(None if plain else tls_dir)
+
+        def fresh(url, payload):
+            with httpx.Client(timeout=30.0) as client:
+                return client.post(url, json=payload)
+
+        def pooled(url, payload):
+            return get_http_client().post(url, json=payload)
+
+        results = {'fresh client': _time_calls(fresh, url, calls), 'shared pool': _time_calls(pooled, url, calls)}
+        server.shutdown()
+        close_http_client()
+
+    print(f"Stand-in server: {url}, calls per mode: {calls}")
+    print(f"{'mode':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, latencies in results.items():
+        print(f"{mode:<14}{latencies.mean():>10.2f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 95):>10.2f}")
+    print(f"Speedup: {results['fresh client'].mean() / results['shared pool'].mean():.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--plain', action='store_true', help='Serve plain HTTP instead of HTTPS.')
+    args = parser.parse_args()
+    run(args.calls, plain=args.plain)
@@ -0,0 +1,100 @@
+"""Profile prompt size as a user's history grows.
+
+Seeds users with --sizes directions (each edited --versions times) and as many
+references in a throwaway SQLite database, gives each a profile, then makes
+--changes edits and builds the next profile prompt. Prints the estimated prompt
+tokens of that incremental update, of a full rebuild, and of the old prompt
+that listed every direction version and reference. No Groq calls are made.
+
+    python benchmarks/profile_prompt.py --sizes 10 100 1000 --versions 3 --changes 3
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROFILE_TEXT = "A thoughtful person working on patience, craft and health, inspired by mentors who teach by example. " * 3
+
+def _seed(db, User, Direction, Reference, UserProfile, size, versions):
+    user = User(username=f'benchmark{size}', email=f'benchmark{size}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime.utcnow() - timedelta(days=365)
+    description = "I want to keep showing up for this, even on the hard days, and notice what it changes. " * 3
+    db.session.bulk_insert_mappings(Direction, [dict(
+        title=f"Direction {number} v{version}", description=description, user_id=user.id,
+        timestamp=start + timedelta(minutes=number * versions + version), version=version, is_latest=version == versions)
+        for number in range(size) for version in range(1, versions + 1)])
+    db.session.bulk_insert_mappings(Reference, [dict(
+        title=f"Reference {number}", description="Someone whose steadiness I admire. " * 5, user_id=user.id,
+        timestamp=start + timedelta(minutes=number)) for number in range(size)])
+    db.session.add(UserProfile(user_id=user.id, description=PROFILE_TEXT, updates_since_rebuild=0))
+    db.session.commit()
+    return user
+
+def _legacy_prompt(user, Direction, Reference):
+    """The prompt as built before incremental updates: every direction version and every reference."""
+    prompt = "Create a concise profile summary for a person based on their growth directions and references. Here's their data:\n\n"
+    prompt += "Growth Directions:\n" + ''.join(f"- {item.title}: {item.description}\n" for item in
+                                               Direction.query.filter_by(author=user).order_by(Direction.timestamp.desc()))
+    prompt += "\nReferences:\n" + ''.join(f"- {item.title}: {item.description}\n" for item in
+                                          Reference.query.filter_by(author=user).order_by(Reference.timestamp.desc()))
+    return prompt
+
+def run(sizes, versions, changes):
+    workdir = tempfile.mkdtemp(prefix='campfire-profile-')
+    os.environ.setdefault('GROQ_API_KEY', 'gsk_benchmark')
+    os.environ.setdefault('HUGGINGFACE_API_KEY', 'hf_benchmark')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'app.db')}"
+    os.environ['EMBEDDING_PROVIDER'] = 'hashing'
+    os.chdir(workdir)  # app.log goes to the working directory
+    from app import create_app, db
+    from app.models import User, Direction, Reference, UserProfile
+    from app.services.context_window import estimate_tokens
+    from app.services.profile_service import create_profile_service
+
+    app = create_app()
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ('counsel_windsurf', 'werkzeug'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        service = create_profile_service()
+        print(f"prompt budget ~{service.prompt_tokens} tokens, rebuild every {service.rebuild_every} updates")
+        print(f"{'items':>7}{'rows':>8}{'legacy tokens':>15}{'rebuild tokens':>16}{'update tokens':>15}{'update ms':>11}")
+        for size in sizes:
+            user = _seed(db, User, Direction, Reference, UserProfile, size, versions)
+            for number in range(changes):
+                # Edit the newest directions the way the edit page does
+                current = Direction.query.filter_by(user_id=user.id, is_latest=True)\
+                    .order_by(Direction.timestamp.desc()).offset(number).first()
+                current.is_latest = False
+                db.session.add(Direction(title=f"{current.title} (edited)", description=current.description,
+                                         user_id=user.id, original_id=current.original_id or current.id,
+                                         version=current.version + 1))
+                db.session.commit()
+
+            previous = service.get_latest_profile(user)
+            start = time.perf_counter()
+            update, updates, _ = service._build_prompt(user, previous)
+            update_ms = (time.perf_counter() - start) * 1000
+            assert updates == 1, "expected an incremental update"
+            rebuild = service._generate_profile_prompt(user)
+            legacy = _legacy_prompt(user, Direction, Reference)
+            rows = size * versions + changes + size
+            print(f"{size:>7}{rows:>8}{estimate_tokens(legacy):>15}{estimate_tokens(rebuild):>16}"
+                  f"{estimate_tokens(update):>15}{update_ms:>11.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--versions', type=int, default=3)
+    parser.add_argument('--changes', type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.versions, args.changes)
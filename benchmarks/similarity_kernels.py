@@ -0,0 +1,62 @@
+"""Compare per-pair cosine similarity with the vectorized kernels.
+
+Ranks a corpus against a set of queries three ways: the legacy Python loop that
+normalizes both vectors for every pair, one matrix-vector product per query
+over pre-normalized rows, and a blocked matrix-matrix product for the whole
+query batch.
+
+    python benchmarks/similarity_kernels.py --rows 20000 --queries 100 --dim 384
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+
+from app.services.similarity import normalize, score_query, top_k, top_k_matrix
+
+def _legacy_cosine(vector1, vector2):
+    return np.dot(vector1, vector2) / (np.linalg.norm(vector1) * np.linalg.norm(vector2))
+
+def run(rows, queries, dim, k=10, loop_queries=5, seed=0):
+    rng = np.random.default_rng(seed)
+    corpus = rng.standard_normal((rows, dim)).astype(np.float32)
+    query_batch = rng.standard_normal((queries, dim)).astype(np.float32)
+    unit_corpus = normalize(corpus)
+    unit_queries = normalize(query_batch)
+
+    # The loop is orders of magnitude slower, so it is timed on a few queries only
+    loop_queries = min(loop_queries, queries)
+    start = time.perf_counter()
+    for query in query_batch[:loop_queries]:
+        scores = np.array([_legacy_cosine(query, row) for row in corpus])
+        np.argsort(-scores)[:k]
+    loop_time = (time.perf_counter() - start) / loop_queries
+
+    start = time.perf_counter()
+    single = [top_k(score_query(query, unit_corpus), k)[0] for query in unit_queries]
+    vector_time = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    batched, _ = top_k_matrix(unit_queries, unit_corpus, k)
+    batch_time = (time.perf_counter() - start) / queries
+
+    agree = np.mean([np.array_equal(a, b) for a, b in zip(single, batched)])
+
+    print(f"Corpus: {rows} x {dim}, queries: {queries}, k: {k}")
+    print(f"{'method':<16}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'python loop':<16}{loop_time * 1e3:>12.3f}{1:>10.1f}")
+    print(f"{'matrix-vector':<16}{vector_time * 1e3:>12.3f}{loop_time / vector_time:>10.1f}")
+    print(f"{'matrix-matrix':<16}{batch_time * 1e3:>12.3f}{loop_time / batch_time:>10.1f}")
+    print(f"Top-{k} agreement between kernels: {agree:.3f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+    run(args.rows, args.queries, args.dim, k=args.k)
@@ -0,0 +1,220 @@
+"""Local stand-ins for the Groq chat-completions and HuggingFace feature-extraction APIs.
+
+One HTTP server answers both APIs, so the app can be load-tested without
+spending real quota:
+
+- POST /openai/v1/chat/completions (plain and streamed): the assistant asks a
+  follow-up question until the conversation has --turns-to-complete user
+  messages, then answers with the completion token found in the system
+  prompt ([DIRCOMP], [IDOLCOMP], [PROFCOMP]) and a summary. Short requests
+  (titles, rolling summaries) get a short answer.
+- GET /openai/v1/models/<id>: the health probe.
+- POST /pipeline/feature-extraction/<model>: deterministic unit vectors derived
+  from a hash of each input.
+
+Latencies are drawn from a distribution given as none, fixed:MS,
+uniform:LO_MS,HI_MS or lognormal:MEDIAN_MS,SIGMA; --model-latency MODEL=SPEC
+gives one chat model its own distribution (e.g. a small, fast model). --error-rate and
+--rate-limit-rate make that fraction of calls fail with 503 or with 429 and a
+Retry-After header.
+
+    python benchmarks/stand_ins.py --port 8900 --chat-latency lognormal:400,0.5 --error-rate 0.01
+
+then start the app with
+    GROQ_BASE_URL=http://127.0.0.1:8900/openai/v1 HUGGINGFACE_BASE_URL=http://127.0.0.1:8900
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+COMPLETION_TOKEN = re.compile(r'\[([A-Z]+COMP)\]')
+EMBEDDING_DIMENSION = 384
+
+def parse_latency(spec: str):
+    """Return a function sampling one latency in seconds from a distribution spec."""
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',')] if args else []
+    if kind == 'none':
+        return lambda rng: 0.0
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median / 1000), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class Behaviour:
+    """How the stand-ins answer: latencies, failure rates and when conversations complete."""
+
+    def __init__(self, chat_latency='lognormal:400,0.5', embedding_latency='lognormal:80,0.3',
+                 stream_interval=0.02, error_rate=0.0, rate_limit_rate=0.0, turns_to_complete=2, seed=0,
+                 model_latency=None):
+        self.chat_latency = parse_latency(chat_latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.embedding_latency = parse_latency(embedding_latency)
+        self.stream_interval = stream_interval
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.turns_to_complete = turns_to_complete
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {'chat': 0, 'embedding': 0, 'errors': 0, 'rate_limited': 0}
+        self.models = {}  # Chat requests per model
+
+    def sample(self, distribution) -> float:
+        with self._lock:
+            return distribution(self._rng)
+
+    def failure(self):
+        """Return (status, headers) of an injected failure, or None."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            self.counters['rate_limited'] += 1
+            return 429, {'Retry-After': '1'}
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counters['errors'] += 1
+            return 503, {}
+        return None
+
+
+def _reply(request: dict, behaviour: Behaviour) -> str:
+    """Pick the assistant's answer for a chat request."""
+    messages = request.get('messages', [])
+    system = ' '.join(message['content'] for message in messages if message['role'] == 'system')
+    token = COMPLETION_TOKEN.search(system)
+    if token is None or request.get('max_tokens', 1024) <= 64:
+        # Title and rolling-summary requests
+        return "Steady personal growth"
+    user_turns = [message['content'] for message in messages if message['role'] == 'user']
+    if token.group(1) == 'PROFCOMP' or len(user_turns) >= behaviour.turns_to_complete:
+        # Echo the user so every conversation yields a distinct summary, as real ones would
+        return (f"[{token.group(1)}] You said: \"{user_turns[-1][:120]}\" You want to keep growing steadily, "
+                "building habits that last and taking on challenges one step at a time.")
+    return "That sounds meaningful. What would success look like for you a year from now?"
+
+def _embedding(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this, delayed ACKs add ~40 ms per call
+    disable_nagle_algorithm = True
+    behaviour: Behaviour = None
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_GET(self):
+        if '/models/' in self.path:
+            self._send_json(200, {'id': self.path.rsplit('/', 1)[-1], 'object': 'model'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        behaviour = self.behaviour
+        if self.path.endswith('/chat/completions'):
+            behaviour.counters['chat'] += 1
+            model = request.get('model', '')
+            behaviour.models[model] = behaviour.models.get(model, 0) + 1
+            latency = behaviour.model_latency.get(model, behaviour.chat_latency)
+        elif '/pipeline/feature-extraction/' in self.path:
+            behaviour.counters['embedding'] += 1
+            latency = behaviour.embedding_latency
+        else:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        time.sleep(behaviour.sample(latency))
+        failure = behaviour.failure()
+        if failure is not None:
+            status, headers = failure
+            self._send_json(status, {'error': {'message': 'injected failure'}}, headers)
+            return
+
+        if 'inputs' in request:
+            inputs = request['inputs'] if isinstance(request['inputs'], list) else [request['inputs']]
+            self._send_json(200, [_embedding(text) for text in inputs])
+            return
+
+        reply = _reply(request, behaviour)
+        if not request.get('stream'):
+            self._send_json(200, {'choices': [{'message': {'role': 'assistant', 'content': reply}}]})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for word in re.findall(r'\S+\s*', reply):
+            time.sleep(behaviour.stream_interval)
+            delta = json.dumps({'choices': [{'delta': {'content': word}}]})
+            self._write_chunk(f"data: {delta}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+def start(behaviour: Behaviour, port: int = 0):
+    """Start the stand-ins on a background thread. Returns (server, base url)."""
+    handler = type('BoundStandInHandler', (StandInHandler,), {'behaviour': behaviour})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stand-ins', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def add_behaviour_arguments(parser):
+    parser.add_argument('--chat-latency', default='lognormal:400,0.5')
+    parser.add_argument('--embedding-latency', default='lognormal:80,0.3')
+    parser.add_argument('--stream-interval', type=float, default=0.02, help='Seconds between streamed words')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--turns-to-complete', type=int, default=2)
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SPEC',
+                        help='Chat latency of one model, e.g. llama-3.1-8b-instant=lognormal:120,0.3 (repeatable)')
+
+def behaviour_from_args(args) -> Behaviour:
+    model_latency = dict(entry.split('=', 1) for entry in args.model_latency)
+    return Behaviour(args.chat_latency, args.embedding_latency, args.stream_interval,
+                     args.error_rate, args.rate_limit_rate, args.turns_to_complete, model_latency=model_latency)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8900)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+    server, url = start(behaviour_from_args(args), args.port)
+    print(f"Stand-ins listening: GROQ_BASE_URL={url}/openai/v1 HUGGINGFACE_BASE_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
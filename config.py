@@ -12,3 +12,26 @@ class Config:
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+    
+    # Background embedding worker
+    EMBEDDING_WORKERS = int(os.environ.get('EMBEDDING_WORKERS', '2'))
+    EMBEDDING_JOB_MAX_ATTEMPTS = int(os.environ.get('EMBEDDING_JOB_MAX_ATTEMPTS', '8'))
+    EMBEDDING_JOB_POLL_SECONDS = float(os.environ.get('EMBEDDING_JOB_POLL_SECONDS', '5'))
+    
+    # Background profile regeneration, debounced per user
+    PROFILE_WORKERS = int(os.environ.get('PROFILE_WORKERS', '1'))
+    PROFILE_DEBOUNCE_SECONDS = float(os.environ.get('PROFILE_DEBOUNCE_SECONDS', '10'))
+    PROFILE_MAX_DEBOUNCE_SECONDS = float(os.environ.get('PROFILE_MAX_DEBOUNCE_SECONDS', '60'))
+    PROFILE_JOB_MAX_ATTEMPTS = int(os.environ.get('PROFILE_JOB_MAX_ATTEMPTS', '5'))
+    PROFILE_JOB_POLL_SECONDS = float(os.environ.get('PROFILE_JOB_POLL_SECONDS', '5'))
+    
+    # Format new embeddings are stored in: float32, float16 or int8
+    EMBEDDING_STORAGE = os.environ.get('EMBEDDING_STORAGE', 'float32')
+    
+    # Background health probes served by /health
+    HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', '60'))
+    HEALTH_CHECK_TTL = float(os.environ.get('HEALTH_CHECK_TTL', '180'))
+    HEALTH_PROBE_TIMEOUT = float(os.environ.get('HEALTH_PROBE_TIMEOUT', '5'))
+    
+    # Directions and references per page of the home page
+    DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '20'))
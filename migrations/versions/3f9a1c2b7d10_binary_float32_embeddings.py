@@ -0,0 +1,111 @@
+"""Store embeddings as binary float32 blobs
+
+Revision ID: 3f9a1c2b7d10
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+EMBEDDING_DTYPE = np.dtype('<f4')
+# Every embedding written before this migration came from the HuggingFace pipeline
+LEGACY_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+TABLES = ('direction', 'reference')
+
+
+def _embedding_table(name):
+    return sa.table(
+        name,
+        sa.column('id', sa.Integer),
+        sa.column('embedding', sa.Text),
+        sa.column('embedding_blob', sa.LargeBinary),
+        sa.column('embedding_dim', sa.Integer),
+        sa.column('embedding_model', sa.String),
+    )
+
+
+def _iter_batches(bind, table, source_column):
+    """Yield rows with a non-null source column in id-ordered batches."""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, source_column)
+            .where(table.c.id > last_id)
+            .where(source_column.isnot(None))
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    for name in TABLES:
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.add_column(sa.Column('embedding_blob', sa.LargeBinary(), nullable=True))
+            batch_op.add_column(sa.Column('embedding_dim', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('embedding_model', sa.String(length=128), nullable=True))
+
+        table = _embedding_table(name)
+        update = table.update().where(table.c.id == sa.bindparam('row_id')).values(
+            embedding_blob=sa.bindparam('blob'),
+            embedding_dim=sa.bindparam('dim'),
+            embedding_model=sa.bindparam('model'),
+        )
+        for rows in _iter_batches(bind, table, table.c.embedding):
+            params = []
+            for row_id, embedding in rows:
+                vector = np.asarray(json.loads(embedding), dtype=EMBEDDING_DTYPE).ravel()
+                params.append({
+                    'row_id': row_id,
+                    'blob': vector.tobytes(),
+                    'dim': int(vector.size),
+                    'model': LEGACY_MODEL,
+                })
+            bind.execute(update, params)
+
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('embedding')
+            batch_op.alter_column('embedding_blob', new_column_name='embedding',
+                                  existing_type=sa.LargeBinary())
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in TABLES:
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.alter_column('embedding', new_column_name='embedding_blob',
+                                  existing_type=sa.LargeBinary())
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.add_column(sa.Column('embedding', sa.Text(), nullable=True))
+
+        table = _embedding_table(name)
+        update = table.update().where(table.c.id == sa.bindparam('row_id')).values(
+            embedding=sa.bindparam('payload'),
+        )
+        for rows in _iter_batches(bind, table, table.c.embedding_blob):
+            params = [
+                {'row_id': row_id,
+                 'payload': json.dumps(np.frombuffer(blob, dtype=EMBEDDING_DTYPE).tolist())}
+                for row_id, blob in rows
+            ]
+            bind.execute(update, params)
+
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('embedding_blob')
+            batch_op.drop_column('embedding_dim')
+            batch_op.drop_column('embedding_model')
@@ -0,0 +1,38 @@
+"""Add durable embedding job queue
+
+Revision ID: 7b2e4d9c1a35
+Revises: 3f9a1c2b7d10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4d9c1a35'
+down_revision = '3f9a1c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'embedding_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('claimed_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'item_id', name='uq_embedding_job_item')
+    )
+    op.create_index(op.f('ix_embedding_job_run_after'), 'embedding_job', ['run_after'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_embedding_job_run_after'), table_name='embedding_job')
+    op.drop_table('embedding_job')
@@ -0,0 +1,52 @@
+"""Add server-side conversation store
+
+Revision ID: a4f2c6e8b913
+Revises: e1a7b3c5d802
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f2c6e8b913'
+down_revision = 'e1a7b3c5d802'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'conversation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('turn_count', sa.Integer(), nullable=False),
+        sa.Column('pending_summary', sa.Text(), nullable=True),
+        sa.Column('pending_title', sa.String(length=140), nullable=True),
+        sa.Column('pending_raw_response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_conversation_user_id'), 'conversation', ['user_id'], unique=False)
+    op.create_table(
+        'conversation_turn',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('conversation_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=16), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['conversation_id'], ['conversation.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('conversation_id', 'position', name='uq_conversation_turn_position')
+    )
+
+
+def downgrade():
+    op.drop_table('conversation_turn')
+    op.drop_index(op.f('ix_conversation_user_id'), table_name='conversation')
+    op.drop_table('conversation')
@@ -0,0 +1,26 @@
+"""Add composite indexes for the dashboard pages
+
+Revision ID: b7d3e9f1a265
+Revises: a4f2c6e8b913
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9f1a265'
+down_revision = 'a4f2c6e8b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_direction_user_latest_timestamp', 'direction', ['user_id', 'is_latest', 'timestamp'], unique=False)
+    op.create_index('ix_reference_user_timestamp', 'reference', ['user_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reference_user_timestamp', table_name='reference')
+    op.drop_index('ix_direction_user_latest_timestamp', table_name='direction')
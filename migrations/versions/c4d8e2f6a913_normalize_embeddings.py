@@ -0,0 +1,55 @@
+"""Store embeddings pre-normalized to unit length
+
+Revision ID: c4d8e2f6a913
+Revises: 7b2e4d9c1a35
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2f6a913'
+down_revision = '7b2e4d9c1a35'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+EMBEDDING_DTYPE = np.dtype('<f4')
+TABLES = ('direction', 'reference')
+
+
+def upgrade():
+    bind = op.get_bind()
+    for name in TABLES:
+        table = sa.table(
+            name,
+            sa.column('id', sa.Integer),
+            sa.column('embedding', sa.LargeBinary),
+        )
+        last_id = 0
+        while True:
+            rows = bind.execute(
+                sa.select(table.c.id, table.c.embedding)
+                .where(table.c.id > last_id)
+                .where(table.c.embedding.isnot(None))
+                .order_by(table.c.id)
+                .limit(BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            for item_id, blob in rows:
+                vector = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+                norm = np.linalg.norm(vector)
+                if norm == 0 or not np.isfinite(norm) or abs(norm - 1.0) < 1e-4:
+                    continue
+                unit = (vector / norm).astype(EMBEDDING_DTYPE)
+                bind.execute(table.update().where(table.c.id == item_id).values(embedding=unit.tobytes()))
+            last_id = rows[-1][0]
+
+
+def downgrade():
+    # Cosine similarity ignores magnitude, so the original norms are not needed
+    pass
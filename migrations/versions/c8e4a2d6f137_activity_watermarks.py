@@ -0,0 +1,61 @@
+"""Add user activity watermarks for profile staleness
+
+Revision ID: c8e4a2d6f137
+Revises: b7d3e9f1a265
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a2d6f137'
+down_revision = 'b7d3e9f1a265'
+branch_labels = None
+depends_on = None
+
+
+def _latest(bind, name):
+    """Return {user_id: newest timestamp} of a table."""
+    table = sa.table(name, sa.column('user_id', sa.Integer), sa.column('timestamp', sa.DateTime))
+    rows = bind.execute(sa.select(table.c.user_id, sa.func.max(table.c.timestamp)).group_by(table.c.user_id))
+    return {user_id: timestamp for user_id, timestamp in rows if user_id is not None}
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_version', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_content_change_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('profile_version', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_profile_at', sa.DateTime(), nullable=True))
+
+    # Backfill from the newest rows, which is what staleness was judged by so far;
+    # a profile at least as new as the latest content counts as current (version 0)
+    bind = op.get_bind()
+    directions, references, profiles = (_latest(bind, name) for name in ('direction', 'reference', 'user_profile'))
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('last_content_change_at', sa.DateTime),
+        sa.column('profile_version', sa.Integer),
+        sa.column('last_profile_at', sa.DateTime),
+    )
+    for user_id in set(directions) | set(references) | set(profiles):
+        changes = [timestamp for timestamp in (directions.get(user_id), references.get(user_id)) if timestamp is not None]
+        changed_at = max(changes) if changes else None
+        profiled_at = profiles.get(user_id)
+        current = profiled_at is not None and (changed_at is None or profiled_at >= changed_at)
+        bind.execute(user.update().where(user.c.id == user_id).values(
+            last_content_change_at=changed_at,
+            profile_version=0 if current else None,
+            last_profile_at=profiled_at,
+        ))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('last_profile_at')
+        batch_op.drop_column('profile_version')
+        batch_op.drop_column('last_content_change_at')
+        batch_op.drop_column('content_version')
@@ -0,0 +1,38 @@
+"""Add debounced profile regeneration jobs
+
+Revision ID: d2f6b8a4c159
+Revises: c8e4a2d6f137
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6b8a4c159'
+down_revision = 'c8e4a2d6f137'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'profile_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('requested_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id')
+    )
+    op.create_index(op.f('ix_profile_job_run_after'), 'profile_job', ['run_after'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_profile_job_run_after'), table_name='profile_job')
+    op.drop_table('profile_job')
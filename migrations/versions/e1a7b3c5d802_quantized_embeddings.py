@@ -0,0 +1,53 @@
+"""Add quantized embedding storage columns
+
+Revision ID: e1a7b3c5d802
+Revises: c4d8e2f6a913
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7b3c5d802'
+down_revision = 'c4d8e2f6a913'
+branch_labels = None
+depends_on = None
+
+TABLES = ('direction', 'reference')
+
+
+def upgrade():
+    # Existing rows keep a NULL dtype, which means float32
+    for name in TABLES:
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('embedding_dtype', sa.String(length=16), nullable=True))
+            batch_op.add_column(sa.Column('embedding_scale', sa.Float(), nullable=True))
+
+
+def downgrade():
+    # Older code reads every blob as float32, so convert quantized rows back first
+    bind = op.get_bind()
+    dtypes = {'float16': np.dtype('<f2'), 'int8': np.dtype('i1')}
+    for name in TABLES:
+        table = sa.table(
+            name,
+            sa.column('id', sa.Integer),
+            sa.column('embedding', sa.LargeBinary),
+            sa.column('embedding_dtype', sa.String),
+            sa.column('embedding_scale', sa.Float),
+        )
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.embedding, table.c.embedding_dtype, table.c.embedding_scale)
+            .where(table.c.embedding_dtype.in_(list(dtypes)))
+        ).fetchall()
+        for item_id, blob, dtype, scale in rows:
+            vector = np.frombuffer(blob, dtype=dtypes[dtype]).astype('<f4')
+            if scale is not None:
+                vector *= scale
+            bind.execute(table.update().where(table.c.id == item_id).values(embedding=vector.tobytes()))
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_column('embedding_scale')
+            batch_op.drop_column('embedding_dtype')
@@ -0,0 +1,42 @@
+"""Add the content change log for incremental profile updates
+
+Revision ID: f5a9c3e7b240
+Revises: d2f6b8a4c159
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a9c3e7b240'
+down_revision = 'd2f6b8a4c159'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'content_change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('action', sa.String(length=20), nullable=False),
+        sa.Column('title', sa.String(length=140), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_content_change_user_id'), 'content_change', ['user_id'], unique=False)
+    # Existing profiles stay NULL, so each user's next profile is a full rebuild
+    with op.batch_alter_table('user_profile', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updates_since_rebuild', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_profile', schema=None) as batch_op:
+        batch_op.drop_column('updates_since_rebuild')
+    op.drop_index(op.f('ix_content_change_user_id'), table_name='content_change')
+    op.drop_table('content_change')
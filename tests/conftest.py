@@ -0,0 +1,31 @@
+import os
+import pytest
+from flask import Flask
+from app import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A bare application with an empty SQLite database, without blueprints or services."""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp_path, 'test.db')}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    from app.models import User
+    user = User(username='tester', email='tester@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+from app import db
+from app.models import Direction, User
+from app.services.ann_index import CrossUserIndex, IVFIndex
+
+
+def add_direction(user, vector):
+    direction = Direction(title='Direction', description='A direction', user_id=user.id)
+    direction.set_embedding(vector, model='test')
+    db.session.add(direction)
+    db.session.commit()
+    return direction
+
+
+def test_search_without_index_scans_every_embedding(user, tmp_path, caplog):
+    other = User(username='other', email='other@example.com')
+    db.session.add(other)
+    db.session.commit()
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(16)
+    close = add_direction(other, query + 0.1 * rng.standard_normal(16))
+    far = add_direction(user, -query)
+    add_direction(other, rng.standard_normal(8))  # another model's dimension is skipped
+
+    index = CrossUserIndex(str(tmp_path / 'ann'))
+    with caplog.at_level(logging.WARNING, logger='counsel_windsurf'):
+        results = index.search('direction', query, k=5)
+        index.add('direction', close.id, query)
+        index.search('direction', query, k=5)
+
+    assert [item_id for item_id, _ in results] == [close.id, far.id]
+    assert results[0][1] > 0.9 and results[1][1] < -0.9
+    assert sum('flask embeddings build-index' in record.message for record in caplog.records) == 1
+
+
+def test_search_uses_index_once_built(user, tmp_path):
+    rng = np.random.default_rng(1)
+    directions = [add_direction(user, rng.standard_normal(16)) for _ in range(20)]
+    index = CrossUserIndex(str(tmp_path / 'ann'))
+    assert index.build('direction', nlist=2) == 20
+
+    added = Direction(title='Direction', description='A direction', user_id=user.id)
+    db.session.add(added)
+    db.session.commit()
+    vector = rng.standard_normal(16)
+    index.add('direction', added.id, vector)
+    assert index.search('direction', vector, k=1)[0][0] == added.id
+    assert len(index.search('direction', directions[0].get_embedding(), k=20)) == 20
+
+
+def build_index(path, rng, count=20):
+    return IVFIndex.build(str(path), np.arange(1, count + 1), rng.standard_normal((count, 16)), nlist=2)
+
+
+def test_compaction_keeps_the_previous_generation(tmp_path):
+    rng = np.random.default_rng(2)
+    index = build_index(tmp_path / 'ann', rng)
+    for item_id in (100, 101):
+        index.append(item_id, rng.standard_normal(16))
+        index.compact()
+    assert index._generations() == [2, 3]
+
+
+def test_reader_retries_when_its_generation_was_removed(tmp_path):
+    rng = np.random.default_rng(3)
+    path = tmp_path / 'ann'
+    writer = build_index(path, rng)
+    stale = writer._read_manifest()
+    for item_id in (100, 101):
+        writer.append(item_id, rng.standard_normal(16))
+        writer.compact()
+
+    reader = IVFIndex(str(path))
+    manifests = iter([stale])
+    reader._read_manifest = lambda: next(manifests, None) or IVFIndex._read_manifest(reader)
+    assert len(reader) == 22
+    assert reader.manifest['generation'] == 3
+
+
+def test_search_falls_back_to_exact_scan_when_index_cannot_be_read(user, tmp_path, monkeypatch):
+    rng = np.random.default_rng(4)
+    query = rng.standard_normal(16)
+    direction = add_direction(user, query)
+    index = CrossUserIndex(str(tmp_path / 'ann'))
+    index.build('direction', nlist=1)
+
+    def vanished(*args, **kwargs):
+        raise FileNotFoundError("gen-000001/vectors.npy")
+
+    monkeypatch.setattr(IVFIndex, 'search', vanished)
+    assert [item_id for item_id, _ in index.search('direction', query, k=1)] == [direction.id]
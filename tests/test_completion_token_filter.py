@@ -0,0 +1,53 @@
+import pytest
+from app.services.chat_service import CompletionTokenFilter
+
+TOKEN = "[DIRCOMP]"
+
+
+def stream(chunks, token=TOKEN):
+    token_filter = CompletionTokenFilter(token)
+    return ''.join(token_filter.feed(chunk) for chunk in chunks) + token_filter.flush()
+
+
+def test_text_without_token_passes_through():
+    assert stream(["Tell me ", "more about ", "that."]) == "Tell me more about that."
+
+
+def test_token_in_one_chunk_is_hidden_with_following_whitespace():
+    assert stream([f"Great work. {TOKEN}  \nSummary here"]) == "Great work. Summary here"
+
+
+@pytest.mark.parametrize('split', range(1, len(TOKEN)))
+def test_token_split_across_chunks_is_never_shown(split):
+    token_filter = CompletionTokenFilter(TOKEN)
+    shown = [token_filter.feed("Done " + TOKEN[:split]), token_filter.feed(TOKEN[split:] + " Summary")]
+    shown.append(token_filter.flush())
+    assert all(TOKEN[:2] not in part for part in shown)
+    assert ''.join(shown) == "Done Summary"
+
+
+def test_token_split_into_single_characters():
+    assert stream(list(f"a{TOKEN}b")) == "ab"
+
+
+def test_prefix_is_held_back_until_decided():
+    token_filter = CompletionTokenFilter(TOKEN)
+    assert token_filter.feed("See [DIR") == "See "
+    assert token_filter.feed("ECTIONS] below") == "[DIRECTIONS] below"
+
+
+def test_unfinished_prefix_is_released_by_flush():
+    token_filter = CompletionTokenFilter(TOKEN)
+    assert token_filter.feed("Ends with [DIRC") == "Ends with "
+    assert token_filter.flush() == "[DIRC"
+
+
+def test_whitespace_after_token_is_skipped_across_chunks():
+    assert stream(["x", TOKEN, "  ", "\n", " y"]) == "xy"
+
+
+def test_nothing_is_held_back_after_token():
+    token_filter = CompletionTokenFilter(TOKEN)
+    token_filter.feed(TOKEN + " ")
+    assert token_filter.feed("[DIR") == "[DIR"
+    assert token_filter.flush() == ""
@@ -0,0 +1,80 @@
+import numpy as np
+from app import db
+from app.models import ContentChange, Direction, Reference, User
+
+
+def content_version(user):
+    return db.session.query(User.content_version).filter_by(id=user.id).scalar()
+
+
+def logged(user):
+    return [(change.kind, change.action, change.title)
+            for change in ContentChange.query.filter_by(user_id=user.id).order_by(ContentChange.id)]
+
+
+def add(item):
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def edit(direction, title):
+    """Save a new version the way the edit page does."""
+    new_version = Direction(title=title, description=direction.description, user_id=direction.user_id,
+                            original_id=direction.original_id or direction.id, version=direction.version + 1)
+    direction.is_latest = False
+    return add(new_version)
+
+
+def test_added_items_are_logged(user):
+    add(Direction(title='Patience', description='Slow down', user_id=user.id))
+    add(Reference(title='Grandmother', description='Always calm', user_id=user.id))
+    assert logged(user) == [('direction', 'added', 'Patience'), ('reference', 'added', 'Grandmother')]
+    assert content_version(user) == 2
+    assert db.session.get(User, user.id).last_content_change_at is not None
+
+
+def test_new_version_is_logged_once_as_an_edit(user):
+    original = add(Direction(title='Patience', description='Slow down', user_id=user.id))
+    edit(original, 'More patience')
+    assert logged(user) == [('direction', 'added', 'Patience'), ('direction', 'edited', 'More patience')]
+    assert content_version(user) == 2
+
+
+def test_in_place_edit_is_logged(user):
+    reference = add(Reference(title='Grandmother', description='Always calm', user_id=user.id))
+    reference.description = 'Calm and kind'
+    db.session.commit()
+    assert logged(user)[-1] == ('reference', 'edited', 'Grandmother')
+    assert content_version(user) == 2
+
+
+def test_deleting_the_latest_version_is_logged(user):
+    original = add(Direction(title='Patience', description='Slow down', user_id=user.id))
+    latest = edit(original, 'More patience')
+    db.session.delete(original)
+    db.session.commit()
+    assert content_version(user) == 2  # Superseded versions do not count
+
+    db.session.delete(latest)
+    db.session.commit()
+    assert logged(user)[-1] == ('direction', 'deleted', 'More patience')
+    assert content_version(user) == 3
+
+
+def test_superseding_alone_bumps_version_without_a_log_entry(user):
+    direction = add(Direction(title='Patience', description='Slow down', user_id=user.id))
+    direction.is_latest = False
+    db.session.commit()
+    assert logged(user) == [('direction', 'added', 'Patience')]
+    assert content_version(user) == 2
+
+
+def test_embedding_updates_do_not_count(user):
+    direction = add(Direction(title='Patience', description='Slow down', user_id=user.id))
+    reference = add(Reference(title='Grandmother', description='Always calm', user_id=user.id))
+    direction.set_embedding(np.ones(8), model='test')
+    reference.set_embedding(np.ones(8), model='test')
+    db.session.commit()
+    assert len(logged(user)) == 2
+    assert content_version(user) == 2
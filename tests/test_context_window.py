@@ -0,0 +1,61 @@
+from app.services.cache import TieredCache
+from app.services.context_window import ContextWindow, estimate_message_tokens
+
+
+def conversation(turns, tag='a'):
+    return [{'role': 'user' if number % 2 == 0 else 'assistant', 'content': f"{tag} message {number:03d} ".ljust(40, '.')}
+            for number in range(turns)]
+
+
+def window(tmp_path, **kwargs):
+    store = TieredCache(str(tmp_path / 'summaries.sqlite3'), version='test')
+    return ContextWindow(**{'max_tokens': 200, 'summary_tokens': 20, 'step': 4, 'store': store, **kwargs})
+
+
+def fold_all(context, plan):
+    for number, (digest, turns) in enumerate(plan.folds):
+        context.remember(digest, f"summary up to fold {number}")
+
+
+def test_short_conversation_is_sent_verbatim(tmp_path):
+    plan = window(tmp_path).plan('system', conversation(4), 'hello')
+    assert (plan.boundary, plan.start, plan.summary, plan.folds) == (0, 0, '', [])
+
+
+def test_long_conversation_is_summarized_in_whole_steps(tmp_path):
+    context = window(tmp_path)
+    history = conversation(30)
+    plan = context.plan('system', history, 'hello')
+
+    assert plan.boundary % context.step == 0 and 0 < plan.boundary < len(history)
+    messages = context.messages('system', 'x' * 4 * context.summary_tokens, history[plan.boundary:], 'hello')
+    assert estimate_message_tokens(messages) <= context.max_tokens
+    assert plan.start == 0 and plan.summary == ''
+    assert [len(turns) for _, turns in plan.folds] == [context.step] * (plan.boundary // context.step)
+    assert [turn for _, turns in plan.folds for turn in turns] == history[:plan.boundary]
+
+
+def test_next_turn_only_folds_new_messages(tmp_path):
+    context = window(tmp_path)
+    history = conversation(30)
+    first = context.plan('system', history, 'hello')
+    fold_all(context, first)
+
+    second = context.plan('system', history + conversation(32)[30:], 'hello')
+    assert second.start == first.boundary
+    assert second.summary == f"summary up to fold {len(first.folds) - 1}"
+    assert [turn for _, turns in second.folds for turn in turns] == history[first.boundary:second.boundary]
+
+
+def test_summaries_are_keyed_on_the_whole_prefix(tmp_path):
+    context = window(tmp_path)
+    history = conversation(30)
+    fold_all(context, context.plan('system', history, 'hello'))
+
+    # Another conversation with the same opening shares the summary of that prefix
+    shared = context.plan('system', history[:8] + conversation(22, tag='b'), 'hello')
+    assert shared.start == 8
+
+    # Changing the first message invalidates every later digest
+    edited = [{'role': 'user', 'content': 'edited'.ljust(40, '.')}] + history[1:]
+    assert context.plan('system', edited, 'hello').start == 0
@@ -0,0 +1,23 @@
+import numpy as np
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_disk_tier_keeps_newest_entries(tmp_path):
+    path = str(tmp_path / 'embeddings.sqlite3')
+    cache = EmbeddingCache('test-model', path, max_items=1, max_disk_items=3)
+    texts = [f"text {number}" for number in range(5)]
+    for number, text in enumerate(texts):
+        cache.set(text, np.full(4, number, dtype=np.float32))
+    cache.store.prune()
+
+    reopened = EmbeddingCache('test-model', path, max_items=1, max_disk_items=3)
+    assert [reopened.get(text) is not None for text in texts] == [False, False, True, True, True]
+    np.testing.assert_array_equal(reopened.get('text  4'), np.full(4, 4, dtype=np.float32))
+
+
+def test_pruned_every_few_writes(tmp_path):
+    cache = EmbeddingCache('test-model', str(tmp_path / 'embeddings.sqlite3'), max_items=1, max_disk_items=10)
+    for number in range(cache.store.PRUNE_EVERY):
+        cache.set(f"text {number}", np.zeros(4, dtype=np.float32))
+    count = cache.store._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+    assert count == 10
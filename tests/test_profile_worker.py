@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import ProfileJob
+from app.services.profile_worker import ProfileWorker
+
+
+@pytest.fixture
+def worker():
+    return ProfileWorker(profile_service=None, debounce_seconds=10, max_debounce_seconds=60)
+
+
+def job_of(user):
+    jobs = ProfileJob.query.filter_by(user_id=user.id).all()
+    assert len(jobs) == 1
+    return jobs[0]
+
+
+def seconds_until(moment):
+    return (moment - datetime.utcnow()).total_seconds()
+
+
+def test_schedule_waits_for_the_debounce_delay(worker, user):
+    worker.schedule(user.id)
+    job = job_of(user)
+    assert job.attempts == 0
+    assert 9 < seconds_until(job.run_after) <= 10
+
+
+def test_each_change_pushes_the_run_back_up_to_the_cap(worker, user):
+    worker.schedule(user.id)
+    job = job_of(user)
+    job.requested_at = job.run_after = datetime.utcnow() - timedelta(seconds=55)
+    db.session.commit()
+
+    worker.schedule(user.id)
+    job = job_of(user)
+    assert 4 < seconds_until(job.run_after) <= 5  # Capped at max_debounce after the first request
+
+
+def test_schedule_without_debounce_is_due_now(worker, user):
+    worker.schedule(user.id)
+    worker.schedule(user.id, debounce=False)
+    assert seconds_until(job_of(user).run_after) <= 0
+    assert worker._wake.is_set()
+
+
+def test_schedule_without_debounce_keeps_backoff(worker, user):
+    worker.schedule(user.id)
+    job = job_of(user)
+    job.attempts = 2
+    retry_at = job.run_after = datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+
+    worker.schedule(user.id, debounce=False)
+    assert job_of(user).run_after == retry_at
+
+
+def test_new_change_resets_backoff(worker, user):
+    worker.schedule(user.id)
+    job = job_of(user)
+    job.attempts = 2
+    job.requested_at = datetime.utcnow() - timedelta(hours=1)
+    job.run_after = datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+
+    worker.schedule(user.id)
+    job = job_of(user)
+    assert job.attempts == 0
+    assert 9 < seconds_until(job.run_after) <= 10
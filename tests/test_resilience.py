@@ -0,0 +1,136 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.services import resilience
+from app.services.resilience import (CircuitBreaker, CircuitOpenError, RateLimitError, ResiliencePolicy,
+                                     TokenBucket, UpstreamUnavailableError)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the monotonic clock the module reads with one the test advances."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(resilience, 'time', SimpleNamespace(monotonic=lambda: now.value, time=time.time,
+                                                            sleep=lambda seconds: None))
+    return now
+
+
+def open_breaker(reset_timeout=0.0):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    return breaker
+
+
+def test_token_bucket_books_capacity_ahead(clock):
+    bucket = TokenBucket('test', per_minute=60, max_wait=2)
+    assert [bucket.reserve() for _ in range(60)] == [0.0] * 60
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+    with pytest.raises(RateLimitError) as raised:
+        bucket.reserve()
+    assert raised.value.retry_after == pytest.approx(3.0)
+
+    bucket.refund(2)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.value += 60
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket('test', per_minute=60, max_wait=5)
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3.0)
+    bucket.pause(10)
+    with pytest.raises(RateLimitError):
+        bucket.reserve()
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_half_open_admits_one_trial(clock):
+    breaker = open_breaker(reset_timeout=30)
+    clock.value += 30
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock.value += 30
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+
+
+def test_send_retries_then_gives_up(clock):
+    policy = ResiliencePolicy('test', CircuitBreaker('test', failure_threshold=10), max_retries=2)
+    responses = iter([httpx.Response(503), httpx.Response(200)])
+    assert policy.send(lambda: next(responses)).status_code == 200
+
+    calls = []
+    with pytest.raises(UpstreamUnavailableError):
+        policy.send(lambda: calls.append(1) or httpx.Response(502))
+    assert len(calls) == 3
+    with pytest.raises(RateLimitError):
+        policy.send(lambda: httpx.Response(429, headers={'retry-after': '60'}))
+
+
+def test_unexpected_error_during_trial_reopens_circuit():
+    breaker = open_breaker()
+    policy = ResiliencePolicy('test', breaker, max_retries=0)
+
+    def broken():
+        raise httpx.DecodingError("bad gzip")
+
+    with pytest.raises(httpx.DecodingError):
+        policy.send(broken)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert policy.send(lambda: httpx.Response(200)).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_frees_the_slot():
+    async def scenario():
+        breaker = open_breaker()
+        policy = ResiliencePolicy('test', breaker, max_retries=0)
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(policy.asend(hang))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        async def healthy():
+            return httpx.Response(200)
+
+        assert (await policy.asend(healthy)).status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
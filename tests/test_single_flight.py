@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fn))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.stats()['calls'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['result'] * 4 and len(calls) == 1
+
+
+def test_leader_error_reaches_followers():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream said no")
+
+        return await asyncio.gather(flight.ado('key', fail), flight.ado('key', fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        started = asyncio.Event()
+
+        async def fn():
+            calls.append(1)
+            started.set()
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        leader = asyncio.ensure_future(flight.ado('key', fn))
+        await started.wait()
+        followers = [asyncio.ensure_future(flight.ado('key', fn)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers), len(calls)
+
+    assert asyncio.run(scenario()) == (['result', 'result'], 2)
+
+
+def test_cancelled_follower_leaves_leader_running():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fn():
+            await asyncio.sleep(0.05)
+            return 'result'
+
+        leader = asyncio.ensure_future(flight.ado('key', fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado('key', fn))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == 'result'
+
+
+def test_cross_process_lookups_run_off_the_event_loop(tmp_path):
+    async def scenario():
+        flight = SingleFlight(str(tmp_path / 'leases.sqlite3'))
+        loop_thread = threading.get_ident()
+        recheck_threads = []
+
+        def recheck():
+            recheck_threads.append(threading.get_ident())
+            return None
+
+        async def fn():
+            return 'result'
+
+        result = await flight.ado('key', fn, recheck=recheck)
+        return result, recheck_threads, loop_thread, flight._held('key')
+
+    result, recheck_threads, loop_thread, held = asyncio.run(scenario())
+    assert result == 'result' and not held
+    assert recheck_threads and loop_thread not in recheck_threads
+
+
+def test_lease_is_released_when_leader_is_cancelled_while_acquiring(tmp_path):
+    async def scenario():
+        flight = SingleFlight(str(tmp_path / 'leases.sqlite3'))
+
+        async def fn():
+            return 'result'
+
+        leader = asyncio.ensure_future(flight.ado('key', fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        for _ in range(100):
+            if not flight._held('key'):
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from app import db
+from app.models import Direction, User
+from app.services.vector_index import VectorIndex
+
+
+def add_direction(user, rng, embedded=True):
+    direction = Direction(title='Direction', description='A direction', user_id=user.id)
+    if embedded:
+        direction.set_embedding(rng.standard_normal(16), model='test')
+    db.session.add(direction)
+    db.session.commit()
+    return direction
+
+
+def similar_ids(index, user, direction):
+    return {item_id for _, item_id, _ in index.similar(user.id, 'direction', direction.id, k=10)}
+
+
+def test_delete_in_another_process_reloads_matrix(user):
+    rng = np.random.default_rng(0)
+    directions = [add_direction(user, rng) for _ in range(3)]
+    here, elsewhere = VectorIndex(), VectorIndex()
+    assert similar_ids(here, user, directions[0]) == {directions[1].id, directions[2].id}
+
+    # Served by the other process: it updates its own index only
+    removed = directions[1].id
+    db.session.delete(directions[1])
+    db.session.commit()
+    elsewhere.remove(user.id, 'direction', removed)
+
+    assert similar_ids(here, user, directions[0]) == {directions[2].id}
+
+
+def test_embedding_stored_elsewhere_appears_after_pending_ttl(user):
+    rng = np.random.default_rng(1)
+    first = add_direction(user, rng)
+    index = VectorIndex(pending_ttl=0.2)
+    pending = add_direction(user, rng, embedded=False)
+    assert similar_ids(index, user, first) == set()
+
+    pending.set_embedding(rng.standard_normal(16), model='test')
+    db.session.commit()
+    assert similar_ids(index, user, first) == set()
+    time.sleep(0.25)
+    assert similar_ids(index, user, first) == {pending.id}
+
+
+def test_current_matrix_is_not_reloaded(user, monkeypatch):
+    rng = np.random.default_rng(2)
+    directions = [add_direction(user, rng) for _ in range(2)]
+    index = VectorIndex()
+    similar_ids(index, user, directions[0])
+    monkeypatch.setattr(index, '_load_user', lambda *args: (_ for _ in ()).throw(AssertionError("reloaded")))
+    assert similar_ids(index, user, directions[0]) == {directions[1].id}
+
+
+def test_growth_counts_against_the_budget(user):
+    rng = np.random.default_rng(3)
+    directions = [add_direction(user, rng) for _ in range(2)]
+    index = VectorIndex()
+    similar_ids(index, user, directions[0])
+    loaded = index.stats()['bytes']
+
+    for item_id in range(1000, 1020):
+        index.add(user.id, 'direction', item_id, rng.standard_normal(16))
+    grown = index.stats()['bytes']
+    assert grown > loaded and grown == index._users[user.id].nbytes
+
+    # A second user that does not fit next to the first evicts it, leaving only its own bytes
+    other = User(username='other', email='other@example.com')
+    db.session.add(other)
+    db.session.commit()
+    other_directions = [add_direction(other, rng) for _ in range(2)]
+    index.max_bytes = grown + 1
+    similar_ids(index, other, other_directions[0])
+    assert index.stats() == {'users': 1, 'bytes': index._users[other.id].nbytes, 'max_bytes': grown + 1}